@@ -0,0 +1,130 @@
+"""
+后台文本分析
+
+AnalysisWorker 在独立线程中运行增量分析，界面线程只负责提交文本快照和取回结果：
+- 只分析最新的快照，分析过程中有新快照提交时，当前任务在块边界处放弃
+- 结果放入队列，由界面通过 root.after 轮询取回
+
+LatencyProbe 记录按键到界面重绘完成的耗时，用于确认分析大文档时界面仍保持流畅。
+"""
+import queue
+import threading
+import time
+from text_analyzer import IncrementalAnalyzer
+
+
+class AnalysisWorker:
+    """后台分析线程"""
+
+    def __init__(self, quote_pairs: dict, max_issues_per_type: int = None):
+        """
+        :param quote_pairs: 引号配对字典
+        :param max_issues_per_type: 每种问题最多返回的条数，None表示不限
+        """
+        self.analyzer = IncrementalAnalyzer(quote_pairs, max_issues_per_type)
+        self.results = queue.Queue()  # (快照编号, 分析结果)
+        self._cond = threading.Condition()
+        self._pending = None  # 等待分析的最新快照
+        self._generation = 0  # 最新快照的编号
+        self._running = True
+        self.completed = 0  # 完成的分析次数
+        self.superseded = 0  # 被新快照取代而放弃的次数
+        self._thread = threading.Thread(target=self._run, name='analysis-worker', daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str) -> int:
+        """
+        提交文本快照，取代尚未开始或正在进行的旧任务
+        :return: 快照编号
+        """
+        with self._cond:
+            self._generation += 1
+            self._pending = (self._generation, text)
+            self._cond.notify()
+            return self._generation
+
+    def _is_stale(self, generation: int) -> bool:
+        return generation != self._generation or not self._running
+
+    def _yield_and_check(self, generation: int) -> bool:
+        """每块分析前调用：先让出GIL，使界面线程的按键处理不必等满线程切换间隔"""
+        time.sleep(0)
+        return self._is_stale(generation)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and self._running:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                generation, text = self._pending
+                self._pending = None
+
+            result = self.analyzer.update(text, lambda: self._yield_and_check(generation))
+            if result is None or self._is_stale(generation):
+                self.superseded += 1
+                continue
+            self.completed += 1
+            self.results.put((generation, result))
+
+    def latest_result(self):
+        """取出队列中最新的结果（较旧的直接丢弃），没有结果时返回None"""
+        latest = None
+        while True:
+            try:
+                latest = self.results.get_nowait()
+            except queue.Empty:
+                return latest
+
+    def stop(self, timeout: float = 1.0):
+        """停止后台线程"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout)
+
+
+class LatencyProbe:
+    """
+    按键到重绘的延迟探针
+    按键时调用 keystroke()，界面空闲（重绘完成）时调用 repainted()
+    """
+
+    def __init__(self, budget_ms: float = 16.0, capacity: int = 1000):
+        """
+        :param budget_ms: 延迟预算（毫秒），超出的次数单独统计
+        :param capacity: 最多保留的样本数
+        """
+        self.budget_ms = budget_ms
+        self.capacity = capacity
+        self.samples = []  # 毫秒
+        self._started = None
+
+    def keystroke(self):
+        if self._started is None:
+            self._started = time.perf_counter()
+
+    def repainted(self):
+        if self._started is None:
+            return
+        self.samples.append((time.perf_counter() - self._started) * 1000)
+        self._started = None
+        if len(self.samples) > self.capacity:
+            del self.samples[:len(self.samples) - self.capacity]
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def summary(self) -> dict:
+        """延迟统计：样本数、p50/p95/最大值（毫秒）以及超出预算的次数"""
+        return {
+            'count': len(self.samples),
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'max': max(self.samples) if self.samples else 0.0,
+            'over_budget': sum(1 for s in self.samples if s > self.budget_ms)
+        }
@@ -0,0 +1,310 @@
+"""
+异步输入
+
+供基于 asyncio 的程序使用，一个进程中可以同时调度多个输入任务和其他I/O，不必为每个会话占用一个线程：
+- 发送步骤与同步接口共用（InputSimulator 的 *_steps 生成器：同一个编码器、自适应节奏控制器、
+  代价模型、指标和时间线），只是每批事件、每个字符、每块粘贴之后都让出事件循环，
+  所有等待都由事件循环的定时器完成
+- Task.cancel()、simulator.stop()、Esc 和焦点离开目标窗口都会在下一批事件之前生效，
+  进行中的等待会被立即唤醒
+- TypingSession 在后台任务中输入，可以用 async for 读取进度，用 await 取得最终结果
+
+编码缓冲区和取消令牌属于模拟器，一个 InputSimulator 同一时间只能进行一个会话；
+需要并发多个输入任务时为每个任务创建一个模拟器。
+"""
+import asyncio
+import random
+import time
+from collections import namedtuple
+from typing import Union
+from colorama import Fore
+from input_simulator import SLEEP, DEADLINE
+from pacing import DeadlineScheduler
+
+# 会话状态
+TYPING = 'typing'  # 进行中
+DONE = 'done'  # 已完成
+STOPPED = 'stopped'  # 被 stop() 或 Esc 停止
+FOCUS_LOST = 'focus_lost'  # 焦点离开了目标窗口
+FAILED = 'failed'  # 发送失败
+CANCELLED = 'cancelled'  # 任务被取消
+
+# 输入进度
+TypingProgress = namedtuple('TypingProgress', [
+    'state',  # 会话状态
+    'typed',  # 本轮已输出的字符数
+    'total',  # 本轮的字符总数
+    'passes',  # 已完成的轮数
+    'elapsed'  # 会话开始以来的秒数
+])
+
+
+class _AsyncRun:
+    """一次异步输入会话的执行状态"""
+
+    def __init__(self, simulator, progress=None):
+        """
+        :param simulator: InputSimulator
+        :param progress: 进度回调，参数为 TypingProgress
+        """
+        self.simulator = simulator
+        self.progress = progress
+        self.loop = asyncio.get_running_loop()
+        self.token = None
+        self.started = time.perf_counter()
+        self.typed = 0
+        self.total = 0
+        self.passes = 0
+        self._waiter = None  # 正在进行的等待
+
+    def begin(self):
+        """开始会话，并让取消请求唤醒事件循环中的等待"""
+        if not self.simulator._begin_session():
+            raise RuntimeError("该模拟器已有输入会话在进行，并发输入请为每个任务创建一个模拟器")
+        self.token = self.simulator.token
+        self.token.add_callback(self._wake_threadsafe)
+
+    def _wake_threadsafe(self):
+        try:
+            self.loop.call_soon_threadsafe(self._wake)
+        except RuntimeError:  # 事件循环已关闭
+            pass
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def _pause(self, seconds: float):
+        """在事件循环中等待seconds秒，取消请求会立即唤醒"""
+        waiter = self._waiter = self.loop.create_future()
+        handle = self.loop.call_later(seconds, self._wake)
+        try:
+            await waiter
+        finally:
+            handle.cancel()
+            self._waiter = None
+
+    async def sleep(self, seconds: float) -> bool:
+        """
+        可被取消打断的等待，seconds不大于0时只让出一次事件循环；耗时计入指标（与 _sleep 相同）
+        :return: 是否已被取消
+        """
+        if seconds <= 0 or self.token.cancelled:
+            await asyncio.sleep(0)
+            return self.token.cancelled
+        started = time.perf_counter()
+        await self._pause(seconds)
+        self.simulator._record_wait('sleep', started, time.perf_counter(), {'seconds': seconds})
+        return self.token.cancelled
+
+    async def wait_deadline(self, scheduler: DeadlineScheduler, delay: float) -> bool:
+        """
+        按绝对截止时间等待（不忙等，误差取决于事件循环定时器的精度）；耗时计入指标（与 _wait 相同）
+        :return: 是否已被取消
+        """
+        remaining = scheduler.advance(delay)
+        if remaining is None:
+            return await self.sleep(0)
+        started = time.perf_counter()
+        if not self.token.cancelled:
+            await self._pause(remaining / 1_000_000_000)
+        self.simulator._record_wait('wait', started, time.perf_counter(), {'delay': delay})
+        if self.token.cancelled:
+            return True
+        scheduler.arrive()
+        return False
+
+    def report(self, state: str = TYPING) -> TypingProgress:
+        """生成并发送当前进度"""
+        progress = TypingProgress(state, self.typed, self.total, self.passes,
+                                  time.perf_counter() - self.started)
+        if self.progress is not None:
+            self.progress(progress)
+        return progress
+
+    def outcome(self, ok: bool) -> str:
+        """一轮输入结束后的会话状态"""
+        if self.token.cancelled:
+            return STOPPED
+        if self.simulator._focus_lost():
+            return FOCUS_LOST
+        return DONE if ok else FAILED
+
+    async def drive(self, steps, scheduler: DeadlineScheduler = None):
+        """
+        在事件循环中执行发送步骤（InputSimulator 的 *_steps 生成器，与同步接口的 _drive 相同），
+        等待由事件循环的定时器完成，确认粘贴在线程池中等待；每一步之后报告进度
+        :param steps: 发送步骤生成器
+        :param scheduler: 逐字输入的节奏调度器（DEADLINE 请求使用）
+        :return: 生成器的返回值
+        """
+        simulator = self.simulator
+        try:
+            request = next(steps)
+            while True:
+                if simulator.sent != self.typed:
+                    self.typed = simulator.sent
+                    self.report()
+                kind, value = request
+                if kind == SLEEP:
+                    result = await self.sleep(value)
+                elif kind == DEADLINE:
+                    result = await self.wait_deadline(scheduler, value)
+                else:
+                    result = await self.loop.run_in_executor(
+                        None, simulator.backend.wait_until_idle, simulator.paste_timeout)
+                request = steps.send(result)
+        except StopIteration as stop:
+            if simulator.sent != self.typed:
+                self.typed = simulator.sent
+                self.report()
+            return stop.value
+        finally:
+            steps.close()  # 任务被取消时也执行生成器的 finally（恢复剪贴板）
+
+    async def type_pass(self, text: str, interval: Union[float, tuple], fast_mode: bool,
+                        format_text: bool, paste_mode: bool, planned: bool,
+                        scheduler: DeadlineScheduler, format_rules: dict = None) -> bool:
+        """输出一轮文本（对应同步接口的一次 type_string）"""
+        simulator = self.simulator
+        simulator.sent = 0
+        self.typed = 0
+        started = time.perf_counter()
+        try:
+            if planned:
+                plan = simulator.last_plan = simulator.plan_delivery(text, format_text, format_rules)
+                self.total = len(plan.text)
+                return await self.drive(simulator._deliver_steps(plan))
+
+            chunk_size = simulator._fast_chunk_size(interval) if fast_mode and not paste_mode else 0
+            prepared = simulator._prepared(text, format_text, chunk_size, format_rules)
+            text = prepared.text
+            self.total = len(text)
+            if paste_mode:
+                return await self.drive(simulator._paste_steps(text))
+            if fast_mode:
+                return await self.drive(simulator._fast_mode_steps(text, interval, prepared.events))
+            return await self.drive(simulator._char_steps(text, interval), scheduler)
+        finally:
+            finished = time.perf_counter()
+            simulator.metrics.output(simulator.sent, finished - started)
+            if simulator.tracer is not None:
+                simulator.tracer.record('piece', started, finished, {'chars': self.total, 'sent': simulator.sent})
+
+
+async def run_typing(simulator, text: Union[str, bytes], interval: Union[float, tuple] = 0.1,
+                     encoding: str = 'utf-8', fast_mode: bool = False, format_text: bool = True,
+                     paste_mode: bool = False, planned: bool = False, continuous: bool = False,
+                     loop: bool = True, progress=None, format_rules: dict = None) -> TypingProgress:
+    """
+    在当前事件循环中进行一次输入会话
+    :param simulator: InputSimulator
+    :param text: 要输入的文本
+    :param interval: 输入间隔，可以是固定值或者范围元组(min, max)
+    :param encoding: bytes文本的编码
+    :param fast_mode: 是否使用快速输入模式
+    :param format_text: 是否格式化文本
+    :param paste_mode: 是否通过剪贴板分块粘贴
+    :param planned: 是否由规划器为每段选择输出方式
+    :param continuous: 是否为持续输入（每轮之间按interval等待）
+    :param loop: 持续输入时是否循环，False则只输入一次
+    :param progress: 进度回调，参数为 TypingProgress
+    :param format_rules: 本次使用的格式化规则，默认 simulator.format_rules（不修改模拟器的设置）
+    :return: 最终进度（state 为 done/stopped/focus_lost/failed）
+    """
+    run = _AsyncRun(simulator, progress)
+    run.begin()
+    state = FAILED
+    try:
+        if isinstance(text, bytes):
+            text = text.decode(encoding)
+        # 持续输入每一轮的准备结果来自 simulator.plan_cache，只在第一轮格式化
+
+        scheduler = simulator.schedule = DeadlineScheduler(simulator.spin_ms)
+        while True:
+            if simulator._escape_requested():
+                state = STOPPED
+                break
+            ok = await run.type_pass(text, interval, fast_mode, format_text,
+                                     paste_mode, planned, scheduler, format_rules)
+            state = run.outcome(ok)
+            if state != DONE:
+                break
+            run.passes += 1
+            if not continuous or not loop:
+                break
+            delay = random.uniform(interval[0], interval[1]) if isinstance(interval, tuple) else interval
+            if fast_mode or paste_mode or planned:
+                interrupted = await run.sleep(delay)
+            else:
+                interrupted = await run.wait_deadline(scheduler, delay)
+            if interrupted:
+                state = run.outcome(False)
+                break
+        if state in (STOPPED, FOCUS_LOST):
+            simulator._report_interruption()
+    except asyncio.CancelledError:
+        state = CANCELLED
+        run.token.cancel('cancelled')
+        raise
+    except Exception as e:
+        state = FAILED
+        print(f"{Fore.RED}输入过程出错: {str(e)}{Fore.RESET}")
+    finally:
+        simulator._end_session(True)
+        result = run.report(state)
+    return result
+
+
+class TypingSession:
+    """
+    在后台任务中进行的异步输入会话
+    async for 读取进度：消费跟不上时跳过中间的进度，只给出最新的一条，最后一条是最终状态；
+    await 等待会话结束并返回最终进度；cancel() 取消任务
+    """
+
+    def __init__(self):
+        self.task = None
+        self.latest = None  # 最新的进度
+        self.version = 0  # 进度的更新次数
+        self._changed = asyncio.Event()
+
+    def start(self, coroutine) -> 'TypingSession':
+        """在后台任务中运行 run_typing(..., progress=session.publish)"""
+        self.task = asyncio.ensure_future(coroutine)
+        self.task.add_done_callback(lambda task: self._notify())
+        return self
+
+    def publish(self, progress: TypingProgress):
+        """记录新的进度（作为 run_typing 的进度回调）"""
+        self.latest = progress
+        self.version += 1
+        self._notify()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def cancel(self) -> bool:
+        """取消输入任务"""
+        return self.task.cancel()
+
+    def done(self) -> bool:
+        return self.task.done()
+
+    def __await__(self):
+        return self.task.__await__()
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        seen = 0
+        while True:
+            if self.version != seen:
+                seen = self.version
+                yield self.latest
+                continue
+            if self.task.done():
+                return
+            await self._changed.wait()
@@ -0,0 +1,242 @@
+"""
+稿件目录的批量格式化与分析
+
+把目录下的稿件文件分给多个进程（ProcessPoolExecutor）执行 format_text 和 analyze_text：
+- 文件按 chunk_size 个一组提交，同时在途的任务不超过进程数的两倍，几千个文件也不会一次性排满队列
+- 每个进程启动时编译一次格式化规则和引号索引，之后的文件直接复用
+- 进程自己读取稿件、写出格式化结果，主进程只接收分析结果，每完成一组就写入
+  analysis.jsonl（每个文件一行 JSON）和 manifest.jsonl 并刷新到文件
+
+manifest.jsonl 记录每个已完成文件的内容哈希（原文字节加上格式化设置）。再次运行时，
+内容和设置都没有变、输出文件也还在的文件直接跳过，中断的批处理重新运行即可从停下的地方继续。
+两个文件都只追加，同一文件有多行时以最后一行为准。
+
+只依赖标准库和 text_core，用法（在仓库根目录执行）：
+    python batch_formatter.py 稿件目录 输出目录 --workers 8
+    python batch_formatter.py 稿件目录 输出目录 --pattern "*.md" --encoding gbk --no-analyze
+
+Windows 上以脚本方式使用 run_batch 时，调用需放在 if __name__ == '__main__' 之下（子进程会重新导入主模块）。
+"""
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from quote_engine import get_quote_index
+from text_core import FORMAT_RULES, QUOTE_PAIRS, analyze_text, format_text
+from text_formatter import get_pipeline
+
+MANIFEST = 'manifest.jsonl'
+ANALYSIS = 'analysis.jsonl'
+
+# 工作进程内的设置，由 _init_worker 在进程启动时设置
+_worker = None
+
+
+def settings_key(rules: dict, quote_pairs: dict, encoding: str, analyze: bool,
+                 max_issues_per_type: int = None) -> bytes:
+    """格式化与分析设置的序列化结果，参与内容哈希：设置改变后所有文件重新处理"""
+    settings = [rules, quote_pairs, encoding, analyze, max_issues_per_type]
+    return json.dumps(settings, sort_keys=True, ensure_ascii=False).encode('utf-8')
+
+
+def find_files(source_dir: str, pattern: str = '*.txt', exclude: str = None) -> list:
+    """
+    递归查找稿件文件
+    :param exclude: 跳过的目录（输出目录位于稿件目录之下时）
+    :return: 相对于 source_dir 的路径（以 / 分隔），按路径排序
+    """
+    source_dir = os.path.abspath(source_dir)
+    exclude = os.path.abspath(exclude) if exclude else None
+    found = []
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != exclude)
+        for name in files:
+            if fnmatch.fnmatch(name, pattern):
+                path = os.path.relpath(os.path.join(root, name), source_dir)
+                found.append(path.replace(os.sep, '/'))
+    found.sort()
+    return found
+
+
+def load_manifest(path: str) -> dict:
+    """读取清单：相对路径 -> 内容哈希（最后一行为准，中断时写了一半的行忽略）"""
+    done = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                done[entry['path']] = entry['digest']
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def _init_worker(source_dir: str, output_dir: str, encoding: str, rules: dict, quote_pairs: dict,
+                 analyze: bool, max_issues_per_type: int, settings: bytes):
+    """工作进程初始化：保存设置并预先编译规则集和引号索引"""
+    global _worker
+    _worker = (source_dir, output_dir, encoding, rules, quote_pairs, analyze, max_issues_per_type,
+               settings)
+    get_pipeline(rules)
+    get_quote_index(quote_pairs)
+
+
+def _write_atomic(path: str, text: str, encoding: str):
+    """先写临时文件再替换，中断时不会留下写了一半的输出"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp = path + '.tmp'
+    with open(temp, 'w', encoding=encoding, newline='') as f:
+        f.write(text)
+    os.replace(temp, path)
+
+
+def _process_file(path: str, known: str) -> dict:
+    """在工作进程中处理一个文件，内容哈希与清单中的 known 相同且输出存在时跳过"""
+    source_dir, output_dir, encoding, rules, quote_pairs, analyze, max_issues, settings = _worker
+    output = os.path.join(output_dir, path)
+    started = time.perf_counter()
+    try:
+        with open(os.path.join(source_dir, path), 'rb') as f:
+            data = f.read()
+        digest = hashlib.blake2b(data + settings, digest_size=16).hexdigest()
+        if digest == known and os.path.exists(output):
+            return {'path': path, 'digest': digest, 'skipped': True}
+        text = data.decode(encoding)
+        _write_atomic(output, format_text(text, rules, quote_pairs), encoding)
+        result = {'path': path, 'digest': digest, 'skipped': False, 'chars': len(text)}
+        if analyze:
+            result['analysis'] = analyze_text(text, quote_pairs, max_issues)
+    except (OSError, UnicodeError) as e:
+        return {'path': path, 'error': f'{type(e).__name__}: {e}'}
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def _process_chunk(chunk: list) -> list:
+    """处理一组 (相对路径, 清单中的哈希)"""
+    return [_process_file(path, known) for path, known in chunk]
+
+
+def run_batch(source_dir: str, output_dir: str, pattern: str = '*.txt', encoding: str = 'utf-8',
+              rules: dict = None, quote_pairs: dict = None, workers: int = None,
+              chunk_size: int = None, analyze: bool = True, max_issues_per_type: int = 100,
+              resume: bool = True, progress=None) -> dict:
+    """
+    批量格式化并分析目录下的稿件
+    :param source_dir: 稿件目录（递归查找）
+    :param output_dir: 输出目录，格式化结果按相对路径写在这里，另有 analysis.jsonl 和 manifest.jsonl
+    :param pattern: 文件名通配符
+    :param encoding: 稿件编码，格式化结果使用相同的编码
+    :param rules: 格式化规则，默认 FORMAT_RULES
+    :param quote_pairs: 引号配对字典，默认 QUOTE_PAIRS
+    :param workers: 进程数，默认为 CPU 核数
+    :param chunk_size: 每个任务包含的文件数，默认按文件数和进程数自动选择（1~16）
+    :param analyze: 是否分析
+    :param max_issues_per_type: 每种问题最多记录的条数，None表示不限
+    :param resume: 是否跳过清单中已完成且未改变的文件，False 则全部重新处理
+    :param progress: 可选的回调 progress(完成的文件数, 文件总数, 文件结果)
+    :return: 统计：文件总数、处理数、跳过数、失败列表、字符数、耗时
+    """
+    source_dir = os.path.abspath(source_dir)
+    output_dir = os.path.abspath(output_dir)
+    rules = FORMAT_RULES if rules is None else rules
+    quote_pairs = QUOTE_PAIRS if quote_pairs is None else quote_pairs
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+
+    files = find_files(source_dir, pattern, exclude=output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST)
+    done = load_manifest(manifest_path) if resume else {}
+    if chunk_size is None:
+        chunk_size = max(1, min(16, len(files) // (workers * 4)))
+    chunks = [[(path, done.get(path)) for path in files[i:i + chunk_size]]
+              for i in range(0, len(files), chunk_size)]
+
+    summary = {'files': len(files), 'processed': 0, 'skipped': 0, 'failed': [], 'chars': 0}
+    settings = settings_key(rules, quote_pairs, encoding, analyze, max_issues_per_type)
+    completed = 0
+    with open(manifest_path, 'a', encoding='utf-8') as manifest, \
+            open(os.path.join(output_dir, ANALYSIS), 'a', encoding='utf-8') as analysis, \
+            ProcessPoolExecutor(workers, initializer=_init_worker,
+                                initargs=(source_dir, output_dir, encoding, rules, quote_pairs,
+                                          analyze, max_issues_per_type, settings)) as pool:
+        pending = set()
+        queued = iter(chunks)
+        while True:
+            # 在途任务不超过进程数的两倍
+            for chunk in queued:
+                pending.add(pool.submit(_process_chunk, chunk))
+                if len(pending) >= workers * 2:
+                    break
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                for result in future.result():
+                    completed += 1
+                    if 'error' in result:
+                        summary['failed'].append((result['path'], result['error']))
+                    elif result['skipped']:
+                        summary['skipped'] += 1
+                    else:
+                        summary['processed'] += 1
+                        summary['chars'] += result['chars']
+                        if analyze:
+                            analysis.write(json.dumps({'path': result['path'],
+                                                       'analysis': result['analysis']},
+                                                      ensure_ascii=False) + '\n')
+                        manifest.write(json.dumps({'path': result['path'], 'digest': result['digest'],
+                                                   'chars': result['chars'],
+                                                   'seconds': round(result['seconds'], 6)},
+                                                  ensure_ascii=False) + '\n')
+                    if progress is not None:
+                        progress(completed, len(files), result)
+                # 分析结果先于清单落盘：清单中有记录的文件，分析结果一定已经写入
+                analysis.flush()
+                manifest.flush()
+
+    summary['elapsed'] = time.perf_counter() - started
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='稿件目录的批量格式化与分析')
+    parser.add_argument('source', help='稿件目录')
+    parser.add_argument('output', help='输出目录')
+    parser.add_argument('--pattern', default='*.txt', help='文件名通配符（默认 *.txt）')
+    parser.add_argument('--encoding', default='utf-8', help='稿件编码（默认 utf-8）')
+    parser.add_argument('--workers', type=int, default=None, help='进程数（默认 CPU 核数）')
+    parser.add_argument('--chunk-size', type=int, default=None, help='每个任务的文件数（默认自动）')
+    parser.add_argument('--max-issues', type=int, default=100, help='每种问题最多记录的条数（默认 100）')
+    parser.add_argument('--no-analyze', action='store_true', help='只格式化，不分析')
+    parser.add_argument('--restart', action='store_true', help='忽略清单，全部重新处理')
+    args = parser.parse_args(argv)
+
+    def progress(completed, total, result):
+        if 'error' in result:
+            print(f"[{completed}/{total}] 失败 {result['path']}: {result['error']}", file=sys.stderr)
+        elif completed % 100 == 0 or completed == total:
+            print(f'[{completed}/{total}]')
+
+    summary = run_batch(args.source, args.output, args.pattern, args.encoding,
+                        workers=args.workers, chunk_size=args.chunk_size,
+                        analyze=not args.no_analyze, max_issues_per_type=args.max_issues,
+                        resume=not args.restart, progress=progress)
+    elapsed = summary['elapsed']
+    print(f"共 {summary['files']} 个文件：处理 {summary['processed']}，跳过 {summary['skipped']}，"
+          f"失败 {len(summary['failed'])}；{summary['chars']} 字符，用时 {elapsed:.2f} 秒"
+          + (f"（{summary['chars'] / elapsed:,.0f} 字符/秒）" if elapsed > 0 else ''))
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+导入耗时测试
+
+在新的解释器中用 python -X importtime 导入各个入口模块，报告累计导入耗时和最耗时的依赖，
+并检查轻量入口（text_core）没有导入 GUI/Win32 相关的模块。
+
+用法（在仓库根目录执行）：
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --modules text_core,input_simulator --repeat 10 --top 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# 轻量入口不允许导入的模块
+HEAVY_MODULES = ('colorama', 'pyautogui', 'keyboard', 'win32api', 'win32gui', 'win32clipboard',
+                 'asyncio', 'tkinter', 'PyQt5', 'input_simulator', 'output_backends')
+CORE_MODULES = ('text_core',)
+
+
+def import_profile(module: str = None) -> dict:
+    """
+    在新的解释器中导入module（None表示只启动解释器）
+    :return: {模块名: 累计导入耗时(微秒)}
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = f'import {module}' if module else 'pass'
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=root, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'导入 {module} 失败:\n{result.stderr}')
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        profile[name.strip()] = int(cumulative)
+    return profile
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='导入耗时测试')
+    parser.add_argument('--modules', default='text_core,input_simulator,typing_daemon',
+                        help='逗号分隔的入口模块')
+    parser.add_argument('--repeat', type=int, default=5, help='每个模块导入的次数（取中位数）')
+    parser.add_argument('--top', type=int, default=8, help='列出最耗时的依赖数')
+    args = parser.parse_args(argv)
+
+    startup = set(import_profile())  # 解释器启动时就已导入的模块（site、encodings等）
+    failed = False
+    for module in args.modules.split(','):
+        profiles = [import_profile(module) for _ in range(args.repeat)]
+        total = statistics.median(p[module] for p in profiles) / 1000
+        print(f'\n{module}: {total:.1f} ms（{args.repeat} 次的中位数）')
+
+        last = profiles[-1]
+        heaviest = sorted((name for name in last
+                           if name != module and '.' not in name and name not in startup),
+                          key=lambda name: last[name], reverse=True)[:args.top]
+        for name in heaviest:
+            print(f'    {name:<24} {last[name] / 1000:>8.1f} ms')
+
+        if module in CORE_MODULES:
+            loaded = sorted(name for name in last if name.split('.')[0] in HEAVY_MODULES)
+            if loaded:
+                failed = True
+                print(f'    错误: 轻量入口导入了 {", ".join(loaded)}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+引号配对引擎的规模测试
+
+在 10KB 到 50MB 的对白密集文本上测量 _check_quote_pairs / _match_quotes 的耗时，
+检查每字符耗时是否保持平稳（线性增长）。
+
+用法（在仓库根目录执行）：
+    python -m benchmarks.quote_scaling
+    python -m benchmarks.quote_scaling --sizes 10K,1M,10M
+"""
+import argparse
+import random
+import sys
+import time
+
+from quote_engine import find_unmatched_quotes, match_quotes
+from text_core import QUOTE_PAIRS
+
+_UNITS = {'K': 1000, 'M': 1000 ** 2}
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().upper()
+    if value[-1] in _UNITS:
+        return int(float(value[:-1]) * _UNITS[value[-1]])
+    return int(value)
+
+
+def dialogue_block(rng: random.Random, length: int = 10000) -> str:
+    """生成一段嵌套对白密集的文本，其中夹杂少量不匹配的引号"""
+    words = '他说我们今天去哪里吧好的没问题你看这件事情怎么办'
+    parts = []
+    size = 0
+    while size < length:
+        line = ''.join(rng.choice(words) for _ in range(rng.randint(4, 12)))
+        kind = rng.random()
+        if kind < 0.3:
+            line = f'「{line}『{line[:3]}』{line[3:]}」'
+        elif kind < 0.5:
+            line = f'“{line}”'
+        elif kind < 0.55:
+            line = f'」{line}'  # 多余的右引号
+        elif kind < 0.6:
+            line = f'『{line}'  # 未闭合的左引号
+        parts.append(line + '。\n')
+        size += len(line) + 2
+    return ''.join(parts)[:length]
+
+
+def make_corpus(size: int, seed: int = 0) -> str:
+    block = dialogue_block(random.Random(seed))
+    repeat, rest = divmod(size, len(block))
+    return block * repeat + block[:rest]
+
+
+def measure(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='引号配对引擎规模测试')
+    parser.add_argument('--sizes', default='10K,100K,1M,10M,50M',
+                        help='逗号分隔的文本规模（字符数），支持K/M后缀')
+    parser.add_argument('--tolerance', type=float, default=3.0,
+                        help='最大规模与最小规模每字符耗时之比的上限')
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(s) for s in args.sizes.split(',')]
+    print(f"{'规模':>12} {'check(s)':>10} {'match(s)':>10} {'check ns/字':>12} {'match ns/字':>12}")
+    per_char = []
+    for size in sizes:
+        text = make_corpus(size)
+        check = measure(find_unmatched_quotes, text, QUOTE_PAIRS)
+        match = measure(match_quotes, text, QUOTE_PAIRS)
+        per_char.append(((check / size) * 1e9, (match / size) * 1e9))
+        print(f'{size:>12} {check:>10.4f} {match:>10.4f} {per_char[-1][0]:>12.1f} {per_char[-1][1]:>12.1f}')
+        del text
+
+    first, last = per_char[0], per_char[-1]
+    ratio = max(last[0] / first[0], last[1] / first[1])
+    linear = ratio <= args.tolerance
+    print(f"\n每字符耗时增长倍数: {ratio:.2f} ({'线性' if linear else '超出容差'})")
+    return 0 if linear else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
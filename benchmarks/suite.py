@@ -0,0 +1,333 @@
+"""
+热点路径基准测试
+
+在合成文本上测量 format_text、analyze_text、_check_quote_pairs、_match_quotes 和
+_send_text_fast 的 INPUT 编码步骤的吞吐量（字符/秒）与峰值内存（tracemalloc），
+结果保存为 JSON；对比模式在吞吐量或峰值内存比基线差超过阈值时返回非零退出码。
+
+语料：
+- cjk：纯中文
+- mixed：中英文混排，带数字、省略号和标点
+- dialogue：对白密集，嵌套的「」『』“”，夹杂少量不匹配的引号
+- repeats：病态重复，长串相同字符、空格、省略号和未闭合的左引号
+
+用法（在仓库根目录执行，不需要 Windows）：
+    python -m benchmarks.suite run --output baseline.json
+    python -m benchmarks.suite run --sizes 1K,1M,50M --ops format,check_quotes --output current.json
+    python -m benchmarks.suite compare baseline.json current.json --threshold 0.1
+    python -m benchmarks.suite run --baseline baseline.json   # 测量后直接与基线对比
+"""
+import argparse
+import functools
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from input_simulator import InputSimulator
+from output_backends import RecordingBackend
+
+_UNITS = {'K': 1000, 'M': 1000 ** 2}
+_BLOCK = 100000  # 语料按这个长度的块生成后重复到目标规模
+
+_HANZI = ('的一是了我不人在他有这个上们来到时大地为子中你说生国年着就那和要她出也得里后自以会家可下而过天去能对小多然于心学么之都好看起发当没成只如事把'
+          '还用第样道想作种开美总从无情己面最女但现前些所同日手又行意动方期它头经长儿回位分爱老因很给名法间斯知世什两次使身者被高已亲其进此话常与活正感')
+_WORDS = ('hello', 'world', 'Python', 'input', 'simulator', 'API', 'Windows', 'text', 'format', 'OK')
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().upper()
+    if value[-1] in _UNITS:
+        return int(float(value[:-1]) * _UNITS[value[-1]])
+    return int(value)
+
+
+def _hanzi(rng: random.Random, low: int, high: int) -> str:
+    return ''.join(rng.choice(_HANZI) for _ in range(rng.randint(low, high)))
+
+
+def cjk_block(rng: random.Random) -> str:
+    """纯中文段落"""
+    parts = []
+    size = 0
+    while size < _BLOCK:
+        sentence = _hanzi(rng, 6, 30) + rng.choice('，。；！？') + ('\n\n' if rng.random() < 0.1 else '')
+        parts.append(sentence)
+        size += len(sentence)
+    return ''.join(parts)
+
+
+def mixed_block(rng: random.Random) -> str:
+    """中英文混排"""
+    parts = []
+    size = 0
+    while size < _BLOCK:
+        kind = rng.random()
+        if kind < 0.4:
+            piece = _hanzi(rng, 3, 12)
+        elif kind < 0.7:
+            piece = ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(1, 4)))
+        elif kind < 0.8:
+            piece = str(rng.randint(0, 99999))
+        elif kind < 0.9:
+            piece = rng.choice(('...', '。。。', '……', ',', '.', '!', '?', '，', '。', '  '))
+        else:
+            piece = rng.choice(('\n', '\n\n', ' ', '\t'))
+        parts.append(piece)
+        size += len(piece)
+    return ''.join(parts)
+
+
+def dialogue_block(rng: random.Random) -> str:
+    """对白密集，三层嵌套的引号，夹杂少量不匹配的引号"""
+    parts = []
+    size = 0
+    while size < _BLOCK:
+        line = _hanzi(rng, 4, 16)
+        kind = rng.random()
+        if kind < 0.3:
+            line = f'「{line}『{line[:3]}“{line[3:6]}”』{line[6:]}」'
+        elif kind < 0.5:
+            line = f'“{line}「{line[:2]}」”'
+        elif kind < 0.6:
+            line = f'『{line}』'
+        elif kind < 0.65:
+            line = f'」{line}'  # 多余的右引号
+        elif kind < 0.7:
+            line = f'「{line}'  # 未闭合的左引号
+        line = _hanzi(rng, 0, 4) + '说：' + line + '。\n'
+        parts.append(line)
+        size += len(line)
+    return ''.join(parts)
+
+
+def repeats_block(rng: random.Random) -> str:
+    """病态重复：长串相同字符、空格、省略号、叹号和未闭合的左引号"""
+    parts = []
+    size = 0
+    while size < _BLOCK:
+        kind = rng.random()
+        if kind < 0.25:
+            piece = rng.choice(_HANZI + 'a!！。.') * rng.randint(4, 200)
+        elif kind < 0.45:
+            piece = ' ' * rng.randint(2, 100)
+        elif kind < 0.6:
+            piece = '.' * rng.randint(3, 60) + '。' * rng.randint(0, 20)
+        elif kind < 0.75:
+            piece = rng.choice('「『“（【《') * rng.randint(1, 50)
+        elif kind < 0.85:
+            piece = '\n' * rng.randint(1, 20)
+        else:
+            piece = _hanzi(rng, 1, 8)
+        parts.append(piece)
+        size += len(piece)
+    return ''.join(parts)
+
+
+CORPORA = {
+    'cjk': cjk_block,
+    'mixed': mixed_block,
+    'dialogue': dialogue_block,
+    'repeats': repeats_block,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _block(kind: str, seed: int) -> str:
+    return CORPORA[kind](random.Random(seed))
+
+
+def make_corpus(kind: str, size: int, seed: int = 0) -> str:
+    """生成指定规模的语料（按块重复，大规模语料的生成时间与规模成正比）"""
+    block = _block(kind, seed)
+    repeat, rest = divmod(size, len(block))
+    return block * repeat + block[:rest]
+
+
+OPS = ('format', 'analyze', 'check_quotes', 'match_quotes', 'encode')
+
+
+def operations(simulator: InputSimulator) -> dict:
+    """被测的热点路径"""
+    return {
+        'format': simulator.format_text,
+        'analyze': simulator.analyze_text,
+        'check_quotes': simulator._check_quote_pairs,
+        'match_quotes': simulator._match_quotes,
+        # _send_text_fast 的 INPUT 编码步骤；缓冲区在多次编码之间复用，峰值内存不含已分配的缓冲区
+        'encode': simulator.encoder.encode,
+    }
+
+
+def measure_time(func, text: str, repeat: int, min_time: float = 0.05) -> float:
+    """每次调用的耗时（秒）：调用次数自动增加到单次测量不少于min_time，取repeat次测量的最小值"""
+    start = time.perf_counter()
+    func(text)
+    elapsed = time.perf_counter() - start
+    number = max(1, int(min_time / elapsed)) if elapsed > 0 else 1000
+    best = elapsed
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func(text)
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def measure_memory(func, text: str) -> int:
+    """一次调用的峰值内存分配（字节，不含输入文本本身）"""
+    tracemalloc.start()
+    try:
+        func(text)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(sizes: list, corpora: list, ops: list, repeat: int, rounds: int = 3, seed: int = 0) -> dict:
+    """
+    运行基准测试
+    :param repeat: 每轮中每项的测量次数
+    :param rounds: 轮数，每项取各轮中最快的一次；各轮在时间上分散，可以避开机器负载的短时波动
+    """
+    simulator = InputSimulator(RecordingBackend())
+    funcs = operations(simulator)
+    results = {}
+    for round_index in range(rounds):
+        for size in sizes:
+            for kind in corpora:
+                text = make_corpus(kind, size, seed)
+                for op in ops:
+                    seconds = measure_time(funcs[op], text, repeat)
+                    entry = results.get((op, kind, size))
+                    if entry is None:
+                        results[op, kind, size] = {
+                            'op': op,
+                            'corpus': kind,
+                            'size': size,
+                            'seconds': seconds,
+                            'peak_bytes': measure_memory(funcs[op], text),  # 峰值内存每轮相同，只测一次
+                        }
+                    else:
+                        entry['seconds'] = min(entry['seconds'], seconds)
+                del text
+        print(f'第 {round_index + 1}/{rounds} 轮完成')
+
+    print(f"\n{'操作':<14}{'语料':<10}{'规模':>10}{'耗时(s)':>12}{'M字符/s':>10}{'峰值内存(MB)':>14}")
+    for entry in results.values():
+        seconds = entry['seconds']
+        entry['chars_per_sec'] = entry['size'] / seconds if seconds > 0 else 0.0
+        print(f"{entry['op']:<14}{entry['corpus']:<10}{entry['size']:>10}{seconds:>12.5f}"
+              f"{entry['chars_per_sec'] / 1e6:>10.2f}{entry['peak_bytes'] / 1e6:>14.2f}")
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'repeat': repeat,
+            'rounds': rounds,
+            'seed': seed,
+        },
+        'results': list(results.values()),
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float, memory_threshold: float,
+            memory_floor: int = 64 * 1024) -> list:
+    """
+    对比两次结果
+    :param threshold: 吞吐量允许下降的比例
+    :param memory_threshold: 峰值内存允许增加的比例
+    :param memory_floor: 峰值内存增加不到这个字节数时不算退化（小规模语料的分配有零星波动）
+    :return: 超出阈值的项目说明
+    """
+    base = {(r['op'], r['corpus'], r['size']): r for r in baseline['results']}
+    regressions = []
+    print(f"{'操作':<14}{'语料':<10}{'规模':>10}{'吞吐量变化':>12}{'峰值内存变化':>14}")
+    for r in current['results']:
+        key = (r['op'], r['corpus'], r['size'])
+        old = base.get(key)
+        if old is None:
+            continue
+        speed = r['chars_per_sec'] / old['chars_per_sec'] - 1 if old['chars_per_sec'] else 0.0
+        memory = r['peak_bytes'] / old['peak_bytes'] - 1 if old['peak_bytes'] else 0.0
+        flags = []
+        if speed < -threshold:
+            flags.append(f'吞吐量下降 {-speed:.1%}')
+        if memory > memory_threshold and r['peak_bytes'] - old['peak_bytes'] > memory_floor:
+            flags.append(f'峰值内存增加 {memory:.1%}')
+        print(f'{key[0]:<14}{key[1]:<10}{key[2]:>10}{speed:>+12.1%}{memory:>+14.1%}'
+              f"{'  <- ' + '，'.join(flags) if flags else ''}")
+        if flags:
+            regressions.append(f"{key[0]}/{key[1]}/{key[2]}: {'，'.join(flags)}")
+    return regressions
+
+
+def _load(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _report(regressions: list) -> int:
+    if regressions:
+        print(f'\n{len(regressions)} 项超出阈值:')
+        for line in regressions:
+            print(f'    {line}')
+        return 1
+    print('\n没有超出阈值的退化')
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='热点路径基准测试')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='运行基准测试')
+    run_parser.add_argument('--sizes', default='1K,100K,1M',
+                            help='逗号分隔的语料规模（字符数），支持K/M后缀，最大可到50M')
+    run_parser.add_argument('--corpora', default=','.join(CORPORA), help='逗号分隔的语料类型')
+    run_parser.add_argument('--ops', default=','.join(OPS), help='逗号分隔的操作')
+    run_parser.add_argument('--repeat', type=int, default=5, help='每轮中每项的测量次数')
+    run_parser.add_argument('--rounds', type=int, default=3, help='轮数（每项取各轮中最快的一次）')
+    run_parser.add_argument('--seed', type=int, default=0, help='语料的随机种子')
+    run_parser.add_argument('--output', help='保存结果的JSON文件')
+    run_parser.add_argument('--baseline', help='测量后与这个基线对比')
+
+    compare_parser = commands.add_parser('compare', help='对比两次结果')
+    compare_parser.add_argument('baseline', help='基线结果')
+    compare_parser.add_argument('current', help='当前结果')
+
+    for sub in (run_parser, compare_parser):
+        sub.add_argument('--threshold', type=float, default=0.1, help='吞吐量允许下降的比例')
+        sub.add_argument('--memory-threshold', type=float, default=0.1, help='峰值内存允许增加的比例')
+        sub.add_argument('--memory-floor', type=int, default=64 * 1024,
+                         help='峰值内存增加不到这个字节数时不算退化')
+    args = parser.parse_args(argv)
+
+    if args.command == 'compare':
+        return _report(compare(_load(args.baseline), _load(args.current),
+                               args.threshold, args.memory_threshold, args.memory_floor))
+
+    ops = args.ops.split(',')
+    corpora = args.corpora.split(',')
+    unknown = [name for name in ops if name not in OPS] + [name for name in corpora if name not in CORPORA]
+    if unknown:
+        parser.error(f'未知的操作或语料: {", ".join(unknown)}')
+
+    result = run([parse_size(s) for s in args.sizes.split(',')], corpora, ops, args.repeat, args.rounds,
+                 args.seed)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f'\n结果已保存到 {args.output}')
+    if args.baseline:
+        print()
+        return _report(compare(_load(args.baseline), result, args.threshold, args.memory_threshold,
+                               args.memory_floor))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""
+输入取消
+
+CancellationToken 在一次输入会话中传递取消请求：
+- 发送循环在每批 SendInput 之前、每个字符之前读取 cancelled 属性（不产生系统调用）
+- 所有等待都通过 token.sleep() 进行，取消时立即返回，不必等满整个延迟
+- 记录取消请求的时刻，会话结束时据此计算停止延迟
+- 异步输入通过 add_callback() 注册唤醒函数，取消时唤醒事件循环中正在进行的等待
+"""
+import threading
+import time
+
+
+class CancellationToken:
+    """一次输入会话的取消令牌"""
+
+    def __init__(self):
+        self.cancelled = False
+        self.reason = None  # 取消原因，例如 'stop'、'esc'
+        self.cancelled_at = None  # 取消请求的时刻（perf_counter_ns）
+        self._event = threading.Event()
+        self._callbacks = []
+
+    def cancel(self, reason: str = 'stop'):
+        """请求取消（可在任意线程中重复调用，只有第一次生效）"""
+        if self.cancelled:
+            return
+        self.reason = reason
+        self.cancelled_at = time.perf_counter_ns()
+        self.cancelled = True
+        self._event.set()
+        for callback in list(self._callbacks):
+            callback()
+
+    def add_callback(self, callback):
+        """
+        注册取消时调用的函数（在调用cancel的线程中执行）
+        已经取消时立即调用
+        """
+        self._callbacks.append(callback)
+        if self.cancelled:
+            callback()
+
+    def sleep(self, seconds: float) -> bool:
+        """
+        可被取消打断的sleep
+        :return: 是否已被取消
+        """
+        if seconds > 0:
+            return self._event.wait(seconds)
+        return self.cancelled
+
+    def latency_ms(self) -> float:
+        """从取消请求到现在经过的毫秒数，未取消时为0"""
+        if self.cancelled_at is None:
+            return 0.0
+        return (time.perf_counter_ns() - self.cancelled_at) / 1_000_000
@@ -0,0 +1,218 @@
+"""
+命令行入口
+
+    python -m input_simulator format [文件 ...]    格式化，结果写到标准输出
+    python -m input_simulator analyze [文件 ...]   分析，每个输入一行 JSON {"path": ..., "analysis": ...}
+    python -m input_simulator type [文件 ...]      模拟键盘输入
+
+没有给出文件或文件为 - 时读取标准输入。输入按块读取、增量解码、按窗口处理（见 text_stream、
+text_analyzer.StreamAnalyzer），内存占用与输入长度无关，format 每准备好一个窗口就写出，可以放在管道中间：
+
+    cat 稿件.txt | python -m input_simulator format --rule max_consecutive_chars=2 | less
+    python -m input_simulator analyze --encoding gbk 第*.txt > 分析.jsonl
+    python -m input_simulator type 稿件.txt --interval 0.05,0.1 --delay 5
+
+格式化规则以 FORMAT_RULES 为基础，依次用 --profile 文件（JSON，可含 format_rules 和 quote_pairs）
+和 --rule 名称=值 覆盖。format 的输出与 type 实际输入的文本相同（格式化并去掉不匹配的引号）。
+用时等统计写到标准错误，--quiet 关闭。
+
+format 和 analyze 只依赖标准库和文本处理模块；type 才创建 InputSimulator（Windows 上导入 pywin32 等）。
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from text_analyzer import StreamAnalyzer
+from text_core import FORMAT_RULES, QUOTE_PAIRS
+from text_stream import READ_SIZE, WINDOW, iter_decoded, prepare_stream
+
+STDIN = '-'
+
+
+def load_settings(profile: str = None, rule_options: list = None) -> tuple:
+    """
+    合成格式化规则和引号配对
+    :param profile: JSON 文件路径，可含 format_rules（覆盖部分规则）和 quote_pairs（替换配对）
+    :param rule_options: "名称=值" 列表，值按 JSON 解析（true、2），不是 JSON 时作为字符串
+    :return: (规则, 引号配对)
+    :raises ValueError: 文件格式不对或规则名称未知
+    """
+    rules = dict(FORMAT_RULES)
+    quote_pairs = QUOTE_PAIRS
+    if profile:
+        with open(profile, 'r', encoding='utf-8') as f:
+            settings = json.load(f)
+        if not isinstance(settings, dict):
+            raise ValueError(f'{profile} 必须是 JSON 对象')
+        unknown = set(settings) - {'format_rules', 'quote_pairs'}
+        if unknown:
+            raise ValueError(f'{profile} 中有未知的项: {", ".join(sorted(unknown))}')
+        rules.update(settings.get('format_rules', {}))
+        quote_pairs = settings.get('quote_pairs', quote_pairs)
+    for option in rule_options or ():
+        name, sep, value = option.partition('=')
+        if not sep:
+            raise ValueError(f'规则应写成 名称=值: {option}')
+        try:
+            value = json.loads(value)
+        except ValueError:
+            pass
+        rules[name.strip()] = value
+    unknown = set(rules) - set(FORMAT_RULES)
+    if unknown:
+        raise ValueError(f'未知的格式化规则: {", ".join(sorted(unknown))}')
+    return rules, quote_pairs
+
+
+def _open(path: str):
+    """以二进制方式打开输入，- 为标准输入"""
+    if path == STDIN:
+        return sys.stdin.buffer
+    return open(path, 'rb')
+
+
+def _pieces(paths: list, encoding: str, read_size: int, counter: list):
+    """依次读取各个输入并解码为字符串片段，counter[0] 累计读到的字符数"""
+    for path in paths:
+        source = _open(path)
+        try:
+            for piece in iter_decoded(source, encoding, read_size):
+                counter[0] += len(piece)
+                yield piece
+        finally:
+            if source is not sys.stdin.buffer:
+                source.close()
+
+
+def _report(args, action: str, chars_in: int, elapsed: float, chars_out: int = None):
+    """在标准错误输出用时和速度"""
+    if args.quiet:
+        return
+    output = f'，输出 {chars_out} 字符' if chars_out is not None else ''
+    rate = f'，{chars_in / elapsed:,.0f} 字符/秒' if elapsed > 0 else ''
+    print(f'{action}：读取 {chars_in} 字符{output}，用时 {elapsed:.3f} 秒{rate}', file=sys.stderr)
+
+
+def cmd_format(args, rules: dict, quote_pairs: dict) -> int:
+    out = sys.stdout.buffer
+    counter = [0]
+    written = 0
+    started = time.perf_counter()
+    pieces = _pieces(args.files, args.encoding, args.read_size, counter)
+    for text in prepare_stream(pieces, rules, quote_pairs, not args.no_format, args.window):
+        out.write(text.encode(args.encoding))
+        out.flush()  # 每个窗口立即交给管道的下游
+        written += len(text)
+    _report(args, '格式化', counter[0], time.perf_counter() - started, written)
+    return 0
+
+
+def cmd_analyze(args, rules: dict, quote_pairs: dict) -> int:
+    out = sys.stdout
+    total = 0
+    started = time.perf_counter()
+    for path in args.files:
+        counter = [0]
+        analyzer = StreamAnalyzer(quote_pairs, args.max_issues)
+        for piece in _pieces([path], args.encoding, args.read_size, counter):
+            analyzer.feed(piece)
+        out.write(json.dumps({'path': path, 'analysis': analyzer.finish()}, ensure_ascii=False) + '\n')
+        out.flush()
+        total += counter[0]
+    _report(args, '分析', total, time.perf_counter() - started)
+    return 0
+
+
+def cmd_type(args, rules: dict, quote_pairs: dict) -> int:
+    from input_simulator import InputSimulator
+    from output_backends import RecordingBackend
+
+    simulator = InputSimulator(RecordingBackend() if args.dry_run else None)
+    simulator.format_rules = rules
+    simulator.quote_pairs = quote_pairs
+    simulator.stream_window = args.window
+    if args.delay > 0 and not args.dry_run:
+        print(f'{args.delay:g} 秒后开始输入，请切换到目标窗口...', file=sys.stderr)
+        time.sleep(args.delay)
+    counter = [0]
+    started = time.perf_counter()
+    simulator.type_string(_pieces(args.files, args.encoding, args.read_size, counter), args.interval,
+                          args.encoding, fast_mode=args.fast, format_text=not args.no_format,
+                          paste_mode=args.paste)
+    elapsed = time.perf_counter() - started
+    session = simulator.metrics.last_session or {}
+    _report(args, '输入', counter[0], elapsed, session.get('chars', 0))
+    if not args.quiet and session:
+        print(f"事件：请求 {session['events_requested']}，接受 {session['events_accepted']}；"
+              f"格式化 {session['format_seconds']:.3f} 秒，发送 {session['send_seconds']:.3f} 秒，"
+              f"等待 {session['sleep_seconds']:.3f} 秒", file=sys.stderr)
+    return 0
+
+
+def _interval(value: str):
+    """输入间隔：一个数，或 最小,最大"""
+    low, sep, high = value.partition(',')
+    try:
+        return (float(low), float(high)) if sep else float(low)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'输入间隔应为数字或 最小,最大: {value}')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m input_simulator',
+                                     description='格式化、分析或模拟键盘输入文本')
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('files', nargs='*', default=[STDIN], help='输入文件，- 或不给出时读取标准输入')
+    common.add_argument('--encoding', default='utf-8', help='输入（以及 format 输出）的编码，默认 utf-8')
+    common.add_argument('--profile', help='JSON 设置文件，可含 format_rules 和 quote_pairs')
+    common.add_argument('--rule', action='append', default=[], metavar='名称=值',
+                        help='覆盖一条格式化规则，可重复，如 --rule trim_spaces=false')
+    common.add_argument('--read-size', type=int, default=READ_SIZE, help='每次读取的字节数')
+    common.add_argument('--quiet', action='store_true', help='不在标准错误输出用时统计')
+
+    commands = parser.add_subparsers(dest='command', required=True)
+    formatting = commands.add_parser('format', parents=[common],
+                                     help='格式化文本并去掉不匹配的引号，结果写到标准输出')
+    analyze = commands.add_parser('analyze', parents=[common], help='分析文本，每个输入输出一行 JSON')
+    analyze.add_argument('--max-issues', type=int, default=100, help='每种问题最多记录的条数（默认 100）')
+    typing = commands.add_parser('type', parents=[common], help='模拟键盘输入文本')
+    for sub in (formatting, typing):
+        sub.add_argument('--window', type=int, default=WINDOW, help=f'格式化窗口的字符数（默认 {WINDOW}）')
+        sub.add_argument('--no-format', action='store_true', help='不格式化，只去掉不匹配的引号')
+    typing.add_argument('--interval', type=_interval, default=0.1, help='输入间隔（秒），或 最小,最大')
+    typing.add_argument('--delay', type=float, default=3.0, help='开始输入前等待的秒数（默认 3）')
+    mode = typing.add_mutually_exclusive_group()
+    mode.add_argument('--fast', action='store_true', help='快速模式')
+    mode.add_argument('--paste', action='store_true', help='粘贴模式')
+    typing.add_argument('--dry-run', action='store_true', help='只记录事件不发送按键（RecordingBackend），用于测量')
+    return parser
+
+
+COMMANDS = {'format': cmd_format, 'analyze': cmd_analyze, 'type': cmd_type}
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        rules, quote_pairs = load_settings(args.profile, args.rule)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    try:
+        return COMMANDS[args.command](args, rules, quote_pairs)
+    except BrokenPipeError:
+        # 下游提前关闭（如 | head）：之后的写出都丢弃，避免退出时再报错
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+    except (OSError, UnicodeError) as e:
+        print(f'错误: {e}', file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+输出方式规划
+
+把准备好的文本切分成若干段，为每段选择代价最低的输出方式：
+- unicode：SendInput 批量发送（换行、空格、Tab 以虚拟键事件混在同一缓冲区中）
+- vk：逐个 keybd_event 发送虚拟键，只用于换行/空格/Tab 组成的段
+- paste：写入剪贴板后 Ctrl+V 粘贴，适合长段文本
+
+代价模型按目标窗口分别学习：每种方式的耗时 = 每次调用的固定开销 + 每单位的开销
+（unicode/vk 的单位是事件数，paste 的单位是字符数），两项参数由实测耗时做带遗忘的最小二乘拟合。
+规划在发送之前完成，可以先查看预计的事件数和耗时。
+"""
+import re
+from collections import namedtuple
+
+UNICODE = 'unicode'
+VK = 'vk'
+PASTE = 'paste'
+METHODS = (UNICODE, VK, PASTE)
+
+_WHITESPACE_RUN = re.compile('[\n \t]+')
+_ASTRAL_PATTERN = re.compile('[\U00010000-\U0010ffff]')
+
+# 一段连续的文本及其输出方式；events 为发送的事件数，seconds 为预计耗时
+Segment = namedtuple('Segment', ['method', 'start', 'end', 'events', 'seconds'])
+
+
+class CostModel:
+    """单个目标窗口的输出代价模型"""
+
+    # 默认参数 (每次调用的开销秒数, 每单位的开销秒数)，在没有实测数据时使用
+    DEFAULTS = {
+        UNICODE: (0.0005, 0.00002),
+        VK: (0.0, 0.0006),
+        PASTE: (0.03, 0.0000005),
+    }
+
+    def __init__(self, decay: float = 0.9, paste_chunk_size: int = 65536):
+        """
+        :param decay: 旧观测的权重衰减系数，越小越快适应目标的变化
+        :param paste_chunk_size: 每次粘贴的字符数，长段会拆成多次粘贴
+        """
+        self.decay = decay
+        self.paste_chunk_size = paste_chunk_size
+        self.params = dict(self.DEFAULTS)
+        # 每种方式的加权统计：权重和、Σx、Σy、Σx²、Σxy
+        self._stats = {method: [0.0, 0.0, 0.0, 0.0, 0.0] for method in METHODS}
+        self.observations = 0
+
+    def cost(self, method: str, units: int, new_call: bool = True) -> float:
+        """
+        预计耗时（秒）
+        :param method: 输出方式
+        :param units: 事件数（paste为字符数）
+        :param new_call: 是否需要新的一次调用（与上一段方式相同时并入同一次调用）
+        """
+        per_call, per_unit = self.params[method]
+        seconds = per_unit * units
+        if method == PASTE:
+            # 超过一次粘贴的长度时，每多一块多一次调用开销
+            seconds += per_call * (units / self.paste_chunk_size)
+            if new_call:
+                seconds += per_call
+        elif new_call:
+            seconds += per_call
+        return seconds
+
+    def observe(self, method: str, units: int, seconds: float):
+        """记录一次实测：发送units个单位用了seconds秒"""
+        if units <= 0:
+            return
+        self.observations += 1
+        stats = self._stats[method]
+        for i in range(5):
+            stats[i] *= self.decay
+        stats[0] += 1
+        stats[1] += units
+        stats[2] += seconds
+        stats[3] += units * units
+        stats[4] += units * seconds
+
+        n, sx, sy, sxx, sxy = stats
+        per_call = self.params[method][0]
+        spread = n * sxx - sx * sx
+        fitted = False
+        if n >= 2 and spread > 1e-9 * n * sxx:
+            per_unit = (n * sxy - sx * sy) / spread
+            intercept = (sy - per_unit * sx) / n
+            if per_unit >= 0 and intercept >= 0:
+                per_call = intercept
+                fitted = True
+        if not fitted:
+            # 观测规模相近或拟合出负值时无法区分两项开销：保持固定开销，只校准每单位开销
+            per_unit = max(0.0, (sy - per_call * n) / sx)
+        self.params[method] = (per_call, per_unit)
+
+    def summary(self) -> dict:
+        """各方式当前的 (每次调用开销, 每单位开销)"""
+        return dict(self.params)
+
+
+class DeliveryPlan:
+    """规划结果：按顺序排列的各段"""
+
+    def __init__(self, text: str, segments: list):
+        self.text = text
+        self.segments = segments
+        self.events = sum(segment.events for segment in segments)
+        self.seconds = sum(segment.seconds for segment in segments)
+
+    def __iter__(self):
+        return iter(self.segments)
+
+    def __len__(self):
+        return len(self.segments)
+
+    def summary(self) -> dict:
+        """预计的事件数、耗时以及各方式负责的字符数"""
+        chars = {method: 0 for method in METHODS}
+        for segment in self.segments:
+            chars[segment.method] += segment.end - segment.start
+        return {
+            'segments': len(self.segments),
+            'events': self.events,
+            'seconds': self.seconds,
+            'chars': chars
+        }
+
+
+def _runs(text: str) -> list:
+    """把文本拆成交替的 (起点, 终点, 是否为空白段)"""
+    runs = []
+    last = 0
+    for match in _WHITESPACE_RUN.finditer(text):
+        if match.start() > last:
+            runs.append((last, match.start(), False))
+        runs.append((match.start(), match.end(), True))
+        last = match.end()
+    if last < len(text):
+        runs.append((last, len(text), False))
+    return runs
+
+
+def _units(text: str, start: int, end: int) -> int:
+    """一段文本的 UTF-16 码元数"""
+    return end - start + len(_ASTRAL_PATTERN.findall(text, start, end))
+
+
+def plan_delivery(text: str, model: CostModel) -> DeliveryPlan:
+    """
+    为文本规划输出方式
+    以空白段/非空白段为单位做动态规划：相邻段选用同一方式时合并为一次调用，
+    只节省调用开销；切换方式时付出新方式的调用开销。
+    :param text: 准备好的（已格式化、已去除不匹配引号的）文本
+    :param model: 目标窗口的代价模型
+    :return: 规划结果
+    """
+    runs = _runs(text)
+    if not runs:
+        return DeliveryPlan(text, [])
+
+    infinity = float('inf')
+    count = len(METHODS)
+    # best[m]：到当前段为止、当前段使用方式m时的最低总耗时
+    best = [0.0] * count
+    choices = []  # 每段每种方式对应的上一段方式
+    unit_counts = []
+    for index, (start, end, is_space) in enumerate(runs):
+        units = _units(text, start, end)
+        unit_counts.append(units)
+        current = [infinity] * count
+        previous_choice = [0] * count
+        for m, method in enumerate(METHODS):
+            if method == VK and not is_space:
+                continue
+            size = end - start if method == PASTE else units * 2
+            if index == 0:
+                current[m] = model.cost(method, size)
+                continue
+            for p in range(count):
+                if best[p] == infinity:
+                    continue
+                total = best[p] + model.cost(method, size, new_call=p != m)
+                if total < current[m]:
+                    current[m] = total
+                    previous_choice[m] = p
+        best = current
+        choices.append(previous_choice)
+
+    # 回溯每段的方式
+    m = min(range(count), key=lambda i: best[i])
+    picked = [0] * len(runs)
+    for index in range(len(runs) - 1, -1, -1):
+        picked[index] = m
+        m = choices[index][m]
+
+    # 合并相邻的同方式段
+    segments = []
+    seg_start = runs[0][0]
+    seg_units = 0
+    for index, (start, end, _) in enumerate(runs):
+        seg_units += unit_counts[index]
+        if index + 1 < len(runs) and picked[index + 1] == picked[index]:
+            continue
+        method = METHODS[picked[index]]
+        if method == PASTE:
+            size = end - seg_start
+            events = 4 * -(-size // model.paste_chunk_size)
+        else:
+            size = events = seg_units * 2
+        segments.append(Segment(method, seg_start, end, events, model.cost(method, size)))
+        seg_start = end
+        seg_units = 0
+    return DeliveryPlan(text, segments)
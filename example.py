@@ -12,11 +12,10 @@ def main():
         print("\n请选择要测试的功能：")
         print("1. 固定间隔输入文本")
         print("2. 随机间隔输入文本")
-        print("3. 模拟组合键")
-        print("4. 持续输入模式")
+        print("3. 持续输入模式")
         print("0. 退出程序")
         
-        choice = input("\n请输入选项（0-4）: ")
+        choice = input("\n请输入选项（0-3）: ")
         
         if choice == "1":
             text = input("请输入要模拟输入的文本: ")
@@ -31,13 +30,6 @@ def main():
             simulator.type_string(text, (0.1, 0.3))
             
         elif choice == "3":
-            print("可用的组合键示例：ctrl+c, ctrl+v, alt+tab")
-            keys = input("请输入组合键（用+号分隔，如ctrl+c）: ").split("+")
-            print("3秒后执行...")
-            time.sleep(3)
-            simulator.simulate_hotkey(*keys)
-            
-        elif choice == "4":
             text = input("请输入要持续输入的文本: ")
             print("3秒后开始持续输入，按ESC键停止...")
             time.sleep(3)
@@ -0,0 +1,127 @@
+"""
+前台窗口监视
+
+输入过程中需要在焦点离开目标窗口时立即停止。原来的做法是每输入一个字符就调用一次
+GetForegroundWindow；这里改为订阅前台窗口变化通知，由通知回调设置 moved 标志，
+发送循环只读取这个属性，不再产生系统调用：
+- Win32FocusWatcher：后台线程中通过 SetWinEventHook(EVENT_SYSTEM_FOREGROUND) 接收通知
+- FocusWatcher：通知由外部调用 notify() 送入，RecordingBackend 用它模拟窗口切换
+- PollingFocusWatcher：没有通知源的后端，检查时查询前台窗口（与原来的行为相同）
+"""
+import ctypes
+import threading
+from ctypes import wintypes
+
+EVENT_SYSTEM_FOREGROUND = 0x0003
+WINEVENT_OUTOFCONTEXT = 0x0000
+WM_QUIT = 0x0012
+
+
+class FocusWatcher:
+    """
+    前台窗口监视器
+    arm() 记录目标窗口后，任何切换到其他窗口的通知都会使 moved 变为True（之后切回也保持True）
+    """
+
+    def __init__(self):
+        self.expected = None  # 目标窗口
+        self.current = None  # 最近一次通知的前台窗口
+        self.armed = False
+        self.moved = False
+        self.changes = 0  # 收到的通知数
+
+    def start(self):
+        """开始接收通知"""
+
+    def stop(self):
+        """停止接收通知"""
+
+    def arm(self, window):
+        """开始监视：window 为输入的目标窗口"""
+        self.expected = window
+        self.current = window
+        self.moved = False
+        self.armed = True
+
+    def disarm(self):
+        """结束监视"""
+        self.armed = False
+        self.moved = False
+        self.expected = None
+
+    def notify(self, window):
+        """前台窗口变为window（由通知源调用，可以在任意线程中调用）"""
+        self.current = window
+        self.changes += 1
+        if self.armed and window != self.expected:
+            self.moved = True
+
+
+class PollingFocusWatcher(FocusWatcher):
+    """没有通知源时的替代实现：读取 moved 时查询后端的前台窗口"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._moved = False
+        super().__init__()
+
+    @property
+    def moved(self) -> bool:
+        if self.armed and not self._moved:
+            self._moved = self.backend.foreground_window() != self.expected
+        return self._moved
+
+    @moved.setter
+    def moved(self, value: bool):
+        self._moved = value
+
+
+class Win32FocusWatcher(FocusWatcher):
+    """通过 SetWinEventHook 接收前台窗口变化通知的监视器"""
+
+    def __init__(self):
+        super().__init__()
+        self._thread = None
+        self._thread_id = None
+        self._ready = threading.Event()
+        self._callback = None  # 保持回调对象的引用，避免被回收
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='focus-watcher', daemon=True)
+        self._thread.start()
+        self._ready.wait(1.0)
+
+    def _run(self):
+        user32 = ctypes.windll.user32
+        kernel32 = ctypes.windll.kernel32
+        WinEventProc = ctypes.WINFUNCTYPE(
+            None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+            wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD
+        )
+        self._callback = WinEventProc(
+            lambda hook, event, hwnd, obj, child, thread, time: self.notify(hwnd)
+        )
+        user32.SetWinEventHook.restype = wintypes.HANDLE
+        hook = user32.SetWinEventHook(EVENT_SYSTEM_FOREGROUND, EVENT_SYSTEM_FOREGROUND,
+                                      0, self._callback, 0, 0, WINEVENT_OUTOFCONTEXT)
+        self._thread_id = kernel32.GetCurrentThreadId()
+        self._ready.set()
+        try:
+            # 钩子回调在本线程的消息循环中执行
+            msg = wintypes.MSG()
+            while user32.GetMessageW(ctypes.byref(msg), 0, 0, 0) > 0:
+                user32.TranslateMessage(ctypes.byref(msg))
+                user32.DispatchMessageW(ctypes.byref(msg))
+        finally:
+            if hook:
+                user32.UnhookWinEvent(hook)
+
+    def stop(self):
+        if self._thread is None:
+            return
+        if self._thread_id is not None:
+            ctypes.windll.user32.PostThreadMessageW(self._thread_id, WM_QUIT, 0, 0)
+        self._thread.join(1.0)
+        self._thread = None
@@ -6,6 +6,7 @@ from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
 from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QIcon, QFont
 from qt_material import apply_stylesheet
+from colorama import Fore
 from input_simulator import InputSimulator
 import time
 
@@ -13,6 +14,7 @@ class InputSimulatorGUI(QMainWindow):
     def __init__(self):
         super().__init__()
         self.simulator = InputSimulator()
+        print(f"{Fore.GREEN}输入模拟器初始化完成{Fore.RESET}")
         self.initUI()
         
     def initUI(self):
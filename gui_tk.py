@@ -1,7 +1,9 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from ttkthemes import ThemedTk
+from colorama import Fore
 from input_simulator import InputSimulator
+from analysis_worker import AnalysisWorker, LatencyProbe
 import time
 import threading
 import keyboard
@@ -72,12 +74,22 @@ class HotkeyDialog(tk.Toplevel):
         self.destroy()
 
 class InputSimulatorGUI:
+    ANALYSIS_DEBOUNCE_MS = 150  # 停止输入多久后提交分析
+    ANALYSIS_POLL_MS = 50  # 轮询分析结果的间隔
+    STOP_POLL_MS = 10  # 停止输入后轮询发送循环是否已停止的间隔
+    MAX_ISSUES_SHOWN = 200  # 每种问题最多显示的条数
+
     def __init__(self):
         self.root = ThemedTk(theme="arc")
         self.root.title("输入模拟器")
         self.root.geometry("800x600")
         
         self.simulator = InputSimulator()
+        print(f"{Fore.GREEN}输入模拟器初始化完成{Fore.RESET}")
+        # 文本分析在后台线程中进行，避免大文档卡住界面
+        self.analysis_worker = AnalysisWorker(self.simulator.quote_pairs, self.MAX_ISSUES_SHOWN)
+        self.latency_probe = LatencyProbe()
+        self._analysis_after = None
         self.is_running = False
         
         # 加载配置
@@ -88,6 +100,7 @@ class InputSimulatorGUI:
         self.register_hotkeys()
         
         self.setup_ui()
+        self.root.after(self.ANALYSIS_POLL_MS, self.poll_analysis)
         
     def load_config(self):
         default_config = {
@@ -185,6 +198,15 @@ class InputSimulatorGUI:
         )
         self.use_ime_check.grid(row=0, column=2, sticky=tk.W, padx=20)
         
+        # 粘贴模式：通过剪贴板分块粘贴，适合大段文本
+        self.paste_mode_var = tk.BooleanVar(value=False)
+        self.paste_mode_check = ttk.Checkbutton(
+            mode_frame,
+            text="剪贴板粘贴",
+            variable=self.paste_mode_var
+        )
+        self.paste_mode_check.grid(row=0, column=3, sticky=tk.W, padx=5)
+        
         # 格式选项
         self.keep_format_var = tk.BooleanVar(value=True)
         self.keep_format_check = ttk.Checkbutton(
@@ -276,6 +298,10 @@ class InputSimulatorGUI:
             value_label.grid(row=i, column=1, sticky=tk.W)
             self.stats_labels[key] = value_label
         
+        ttk.Label(self.stats_frame, text='响应延迟(p95)：').grid(row=len(stats_items), column=0, sticky=tk.W)
+        self.latency_label = ttk.Label(self.stats_frame, text="0 ms")
+        self.latency_label.grid(row=len(stats_items), column=1, sticky=tk.W)
+        
         # 问题列表区域
         self.issues_frame = ttk.LabelFrame(self.right_panel, text="潜在问题", padding="5")
         self.issues_frame.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
@@ -391,19 +417,20 @@ class InputSimulatorGUI:
                 encoding = self.encoding_var.get()
                 use_ime = self.use_ime_var.get()
                 fast_mode = self.fast_mode_var.get()
+                paste_mode = self.paste_mode_var.get()
                 
                 if self.mode_var.get() == "固定间隔":
                     interval = self.interval_var.get()
                     self.simulator.start_continuous_input(text_to_input, interval, 
                                                        self.loop_var.get(), encoding, 
-                                                       use_ime, fast_mode)
+                                                       use_ime, fast_mode, paste_mode=paste_mode)
                 else:
                     min_interval = self.min_interval_var.get()
                     max_interval = self.max_interval_var.get()
                     self.simulator.start_continuous_input(text_to_input, 
                                                        (min_interval, max_interval),
                                                        self.loop_var.get(), encoding, 
-                                                       use_ime, fast_mode)
+                                                       use_ime, fast_mode, paste_mode=paste_mode)
                 
                 # 如果不是循环模式，输入完成后自动停止
                 if not self.loop_var.get():
@@ -411,13 +438,31 @@ class InputSimulatorGUI:
                     self.root.after(0, lambda: self.status_var.set("输入完成"))
                     
             except Exception as e:
-                self.root.after(0, lambda: messagebox.showerror("错误", f"输入过程出错: {str(e)}"))
+                # except 块结束后 e 会被删除，回调中不能直接引用
+                self.root.after(0, lambda error=e: messagebox.showerror("错误", f"输入过程出错: {error}"))
                 self.root.after(0, self.stop_input)
                 
         threading.Thread(target=input_thread, daemon=True).start()
         
     def stop_input(self):
-        self.simulator.stop()
+        # 不在界面线程中等待：发送循环通常在几毫秒内停止，确认停止之前不允许重新开始
+        if self.simulator.stop():
+            self.finish_stop()
+            return
+        self.start_btn.config(state=tk.DISABLED)
+        self.stop_btn.config(state=tk.DISABLED)
+        self.status_var.set("正在停止...")
+        self.root.after(self.STOP_POLL_MS, self.poll_stop)
+
+    def poll_stop(self):
+        """等待发送循环确认停止，之后再恢复界面"""
+        if self.simulator.idle:
+            self.finish_stop()
+        else:
+            self.root.after(self.STOP_POLL_MS, self.poll_stop)
+
+    def finish_stop(self):
+        """发送循环已停止，恢复界面"""
         self.is_running = False
         self.start_btn.config(text="开始输入", state=tk.NORMAL)
         self.stop_btn.config(state=tk.DISABLED)
@@ -427,10 +472,28 @@ class InputSimulatorGUI:
             self.status_var.set("已停止")
         
     def on_text_change(self, event=None):
-        """当文本内容改变时更新统计信息"""
-        text = self.text_input.get("1.0", tk.END)
-        analysis = self.simulator.analyze_text(text)
-        
+        """当文本内容改变时安排后台分析（防抖：停止输入一段时间后才提交）"""
+        self.latency_probe.keystroke()
+        self.root.after_idle(self.latency_probe.repainted)
+        if self._analysis_after is not None:
+            self.root.after_cancel(self._analysis_after)
+        self._analysis_after = self.root.after(self.ANALYSIS_DEBOUNCE_MS, self.submit_analysis)
+        
+    def submit_analysis(self):
+        """把当前文本快照交给后台分析线程"""
+        self._analysis_after = None
+        self.analysis_worker.submit(self.text_input.get("1.0", tk.END))
+        
+    def poll_analysis(self):
+        """取回后台分析的最新结果并刷新界面"""
+        latest = self.analysis_worker.latest_result()
+        if latest is not None:
+            self.show_analysis(latest[1])
+        self.latency_label.configure(text=f"{self.latency_probe.summary()['p95']:.1f} ms")
+        self.root.after(self.ANALYSIS_POLL_MS, self.poll_analysis)
+        
+    def show_analysis(self, analysis):
+        """更新统计信息和问题列表"""
         # 更新统计信息
         for key, value in analysis['stats'].items():
             if key in self.stats_labels:
@@ -439,11 +502,17 @@ class InputSimulatorGUI:
         # 更新问题列表
         self.issues_text.delete("1.0", tk.END)
         if analysis['issues']:
+            # 拼接后一次性插入，避免逐条调用Tk
+            issue_texts = []
             for issue in analysis['issues']:
                 issue_text = f"• {issue['type']} (位置 {issue['position']})\n"
                 issue_text += f"  {issue['description']}\n"
                 issue_text += f"  内容: {issue['content']}\n\n"
-                self.issues_text.insert(tk.END, issue_text)
+                issue_texts.append(issue_text)
+            hidden = sum(analysis.get('issue_counts', {}).values()) - len(analysis['issues'])
+            if hidden > 0:
+                issue_texts.append(f"……另有 {hidden} 个问题未显示\n")
+            self.issues_text.insert(tk.END, ''.join(issue_texts))
         else:
             self.issues_text.insert(tk.END, "未发现问题")
         
@@ -462,6 +531,9 @@ class InputSimulatorGUI:
     def on_closing(self):
         if self.is_running:
             self.stop_input()
+        self.analysis_worker.stop()
+        if self.simulator.focus is not None:
+            self.simulator.focus.stop()
         # 清理快捷键
         keyboard.unhook_all()
         self.root.destroy()
@@ -0,0 +1,150 @@
+"""
+文本到 INPUT 事件的批量编码器
+
+把整段文本一次性编码进一块可复用的连续缓冲区（内存布局与 INPUT 数组完全相同），
+发送时直接把缓冲区切片交给 SendInput，不再为每个字符创建 Python 对象，也不再复制。
+"""
+import ctypes
+import re
+from input_types import (
+    INPUT, INPUT_UNION, KEYBDINPUT,
+    VK_RETURN, VK_SPACE, VK_TAB, KEYEVENTF_KEYUP, KEYEVENTF_UNICODE
+)
+
+INPUT_KEYBOARD = 1
+INPUT_SIZE = ctypes.sizeof(INPUT)
+
+# 各字段在单个 INPUT 结构体中的字节偏移
+_KI_OFFSET = INPUT.union.offset + INPUT_UNION.ki.offset
+_VK_OFFSET = _KI_OFFSET + KEYBDINPUT.wVk.offset
+_SCAN_OFFSET = _KI_OFFSET + KEYBDINPUT.wScan.offset
+_FLAGS_OFFSET = _KI_OFFSET + KEYBDINPUT.dwFlags.offset
+
+# 以虚拟键发送的字符
+VK_CHARS = {
+    '\n': VK_RETURN,
+    ' ': VK_SPACE,
+    '\t': VK_TAB,
+}
+_VK_CHAR_PATTERN = re.compile('[\n \t]')
+_ASTRAL_PATTERN = re.compile('[\U00010000-\U0010ffff]')
+
+
+def _make_input(vk: int, scan: int, flags: int) -> bytes:
+    """生成单个键盘 INPUT 结构体的字节"""
+    event = INPUT()
+    event.type = INPUT_KEYBOARD
+    event.union.ki.wVk = vk
+    event.union.ki.wScan = scan
+    event.union.ki.dwFlags = flags
+    return ctypes.string_at(ctypes.addressof(event), INPUT_SIZE)
+
+
+# 虚拟键字符的按下+释放事件对，编码时整块写入
+_VK_PAIRS = {
+    char: _make_input(vk, 0, 0) + _make_input(vk, 0, KEYEVENTF_KEYUP)
+    for char, vk in VK_CHARS.items()
+}
+
+
+class InputEncoder:
+    """
+    文本到 INPUT 缓冲区的编码器
+    每个 UTF-16 码元对应一对按下/释放事件，BMP 以外的字符自然拆成代理对；
+    换行、空格、Tab 以虚拟键事件发送，与 _send_text_fast 的行为一致。
+    缓冲区只在容量不足时重新分配，多次编码之间复用。
+    """
+
+    def __init__(self, capacity: int = 0):
+        """
+        :param capacity: 预分配的事件数
+        """
+        self._buf = bytearray()
+        self.capacity = 0
+        self.count = 0  # 当前缓冲区中有效的事件数
+        self._reserve(capacity)
+
+    def _reserve(self, events: int):
+        """确保缓冲区至少能容纳 events 个事件"""
+        if events <= self.capacity:
+            return
+        capacity = max(events, self.capacity * 2, 64)
+        buf = bytearray(capacity * INPUT_SIZE)
+        # 所有槽位预先写好 type 字段，编码时只需要改写 wVk/wScan/dwFlags
+        buf[0:len(buf):INPUT_SIZE] = bytes([INPUT_KEYBOARD]) * capacity
+        self._buf = buf
+        self.capacity = capacity
+
+    def encode(self, text: str) -> int:
+        """
+        将文本编码进缓冲区
+        :param text: 要编码的文本
+        :return: 生成的事件数
+        """
+        data = text.encode('utf-16-le', errors='surrogatepass')
+        units = len(data) // 2
+        events = units * 2
+        self._reserve(events)
+        buf = self._buf
+        end = events * INPUT_SIZE
+        pair = INPUT_SIZE * 2
+        lo = data[0::2]
+        hi = data[1::2]
+        zeros = bytes(units)
+
+        # 按下事件与释放事件分别以结构体步长整列写入
+        for first, flags in ((0, KEYEVENTF_UNICODE), (INPUT_SIZE, KEYEVENTF_UNICODE | KEYEVENTF_KEYUP)):
+            buf[first + _SCAN_OFFSET:end:pair] = lo
+            buf[first + _SCAN_OFFSET + 1:end:pair] = hi
+            buf[first + _VK_OFFSET:end:pair] = zeros
+            buf[first + _VK_OFFSET + 1:end:pair] = zeros
+            buf[first + _FLAGS_OFFSET:end:pair] = bytes([flags]) * units
+
+        # 换行、空格、Tab 改写为虚拟键事件
+        astral = units != len(text)
+        last_pos = 0
+        index = 0
+        for match in _VK_CHAR_PATTERN.finditer(text):
+            pos = match.start()
+            if astral:
+                # 码元下标 = 字符下标 + 之前出现的代理对数量
+                index += pos - last_pos + len(_ASTRAL_PATTERN.findall(text, last_pos, pos))
+                last_pos = pos
+            else:
+                index = pos
+            start = index * pair
+            buf[start:start + pair] = _VK_PAIRS[match.group()]
+
+        self.count = events
+        return events
+
+    def snapshot(self) -> bytes:
+        """缓冲区中有效事件的字节副本，可以用 load 重新载入而不必再编码"""
+        return bytes(self._buf[:self.count * INPUT_SIZE])
+
+    def load(self, data: bytes) -> int:
+        """
+        载入 snapshot 保存的事件
+        :return: 事件数
+        """
+        events = len(data) // INPUT_SIZE
+        self._reserve(events)
+        self._buf[:len(data)] = data
+        self.count = events
+        return events
+
+    def view(self, start: int = 0, count: int = None):
+        """
+        获取缓冲区中一段事件的 INPUT 数组视图（零拷贝）
+        :param start: 起始事件下标
+        :param count: 事件数，默认到末尾
+        """
+        if count is None:
+            count = self.count - start
+        return (INPUT * count).from_buffer(self._buf, start * INPUT_SIZE)
+
+    def batches(self, batch_size: int):
+        """按批次依次返回 (起始下标, INPUT数组视图, 事件数)"""
+        for start in range(0, self.count, batch_size):
+            count = min(batch_size, self.count - start)
+            yield start, self.view(start, count), count
@@ -1,146 +1,235 @@
+if __name__ == "__main__":
+    # python -m input_simulator format|analyze|type ...（见 cli）
+    # 在定义任何内容之前转交 cli：type 子命令导入的 input_simulator 是进程中唯一的一份模块，
+    # 不会与 __main__ 各有一份；format 和 analyze 也不必导入 colorama、ctypes 等
+    import sys
+    from cli import main
+    sys.exit(main())
+
+import threading
 import time
-import pyautogui
-import keyboard
-from typing import Union, List
+from typing import TYPE_CHECKING, Iterable, Union
 from colorama import init, Fore
 import random
-import win32api
-import win32con
-import win32gui
-import win32clipboard
-import ctypes
-import re
-from collections import Counter
-from ctypes import wintypes
-import array
-
-class MOUSEINPUT(ctypes.Structure):
-    _fields_ = [
-        ('dx', wintypes.LONG),
-        ('dy', wintypes.LONG),
-        ('mouseData', wintypes.DWORD),
-        ('dwFlags', wintypes.DWORD),
-        ('time', wintypes.DWORD),
-        ('dwExtraInfo', ctypes.POINTER(wintypes.ULONG))
-    ]
-
-class KEYBDINPUT(ctypes.Structure):
-    _fields_ = [
-        ('wVk', wintypes.WORD),
-        ('wScan', wintypes.WORD),
-        ('dwFlags', wintypes.DWORD),
-        ('time', wintypes.DWORD),
-        ('dwExtraInfo', ctypes.POINTER(wintypes.ULONG))
-    ]
-
-class HARDWAREINPUT(ctypes.Structure):
-    _fields_ = [
-        ('uMsg', wintypes.DWORD),
-        ('wParamL', wintypes.WORD),
-        ('wParamH', wintypes.WORD)
-    ]
-
-class INPUT_UNION(ctypes.Union):
-    _fields_ = [
-        ('mi', MOUSEINPUT),
-        ('ki', KEYBDINPUT),
-        ('hi', HARDWAREINPUT)
-    ]
-
-class INPUT(ctypes.Structure):
-    _fields_ = [
-        ('type', wintypes.DWORD),
-        ('union', INPUT_UNION)
-    ]
+from input_encoder import InputEncoder
+from pacing import AdaptivePacer, DeadlineScheduler
+from cancellation import CancellationToken
+from delivery_planner import CostModel, DeliveryPlan, plan_delivery, VK, PASTE
+from quote_engine import find_unmatched_quotes, match_quotes
+from text_core import QUOTE_PAIRS, FORMAT_RULES, prepare_text, prepare_with_deletions
+from text_stream import iter_decoded, prepare_stream, WINDOW
+from manuscript import ManuscriptSource
+from plan_cache import PlanCache, PreparedPlan, content_key
+from metrics import Metrics
+from tracing import Tracer
+from text_formatter import get_pipeline
+from text_analyzer import analyze_text
+from output_backends import (
+    OutputBackend, Win32Backend, VK_TAB, VK_RETURN, VK_CONTROL, VK_SPACE, VK_V, KEYEVENTF_KEYUP
+)
+
+if TYPE_CHECKING:  # 只用于类型注解，asyncio 只在使用异步接口时导入
+    from async_input import TypingProgress, TypingSession
+
+_colorama_ready = False
+
+# 发送步骤（InputSimulator 的 *_steps 生成器）产出的等待请求 (类型, 参数)。
+# 同步接口由 _drive 阻塞等待，异步接口由事件循环等待（见 async_input），完成后把结果送回生成器
+SLEEP = 'sleep'  # 可被取消打断的等待，参数为秒数（不大于0时只让出一次）；送回是否已被取消
+DEADLINE = 'deadline'  # 按绝对截止时间等待，参数为距上一个截止时间的间隔；送回是否已被取消
+IDLE = 'idle'  # 等待前台窗口处理完输入队列（确认粘贴）；送回是否已确认
+
 
 class InputSimulator:
-    def __init__(self):
-        init()  # 初始化colorama
-        # 设置pyautogui的安全设置
-        pyautogui.FAILSAFE = True
-        pyautogui.PAUSE = 0.1
+    def __init__(self, backend: OutputBackend = None):
+        """
+        :param backend: 输出后端，默认使用Win32Backend；
+                        传入RecordingBackend可在无显示器的环境中记录事件流
+        """
+        global _colorama_ready
+        if not _colorama_ready:  # 初始化colorama（每个进程一次，重复初始化会层层包装stdout）
+            init()
+            _colorama_ready = True
+        # pywin32、keyboard、pyautogui 在创建 Win32Backend 时才导入（见 output_backends._load_win32）
+        self.backend = backend if backend is not None else Win32Backend()
+        self.encoder = InputEncoder()  # 可复用的INPUT事件缓冲区
+        self.pacer = AdaptivePacer()  # 快速模式的批量与延迟控制器
+        # 可选的回读校验：read_back(text, end) 返回目标中是否已出现 text[:end]
+        self.read_back = None
+        self.spin_ms = 2.0  # 逐字输入时忙等的时间预算（毫秒）
+        self.schedule = None  # 最近一次输入会话的 DeadlineScheduler，可查看节奏误差统计
+        self.paste_chunk_size = 65536  # 粘贴模式每次粘贴的字符数
+        self.fast_chunk_size = 16384  # 快速模式每次编码的字符数，分段编码使取消不必等待整段编码
+        self.stream_window = WINDOW  # 流式输入时每个格式化窗口的字符数
+        self.sent = 0  # 当前输出的文本片段中已确认送达的字符数（用于检查点）
+        self.plan_cache = PlanCache()  # 准备好的文本和编码好的事件，按内容和选项缓存
+        self.metrics = Metrics()  # 输入指标：事件数、各阶段耗时、速率直方图（见 metrics）
+        self.tracer: Tracer = None  # 时间线追踪，设为 Tracer() 后记录每一步的时间段（见 tracing）
+        self.paste_timeout = 5.0  # 等待目标确认一次粘贴的最长时间（秒）
+        self.cost_models = {}  # 每个目标窗口的输出代价模型
+        self.last_plan = None  # 最近一次按规划输出的 DeliveryPlan
+        self.focus = None  # 前台窗口监视器（首次输入时创建）
+        self.token = CancellationToken()  # 当前输入会话的取消令牌
+        self.stop_latencies = []  # 最近若干次从取消请求到发送循环停止的耗时（毫秒）
+        self._session_active = False
+        self._idle = threading.Event()  # 没有输入会话在进行时为set
+        self._idle.set()
+        self._escape_hook = None
         self.running = False
         self.max_retries = 3  # 最大重试次数
         
-        # 常量定义
-        self.INPUT_MOUSE = 0
-        self.INPUT_KEYBOARD = 1
-        self.INPUT_HARDWARE = 2
-        
-        # 按键标志
-        self.KEYEVENTF_KEYUP = 0x0002
-        self.KEYEVENTF_UNICODE = 0x0004
-        # 引号配对字典
-        self.quote_pairs = {
-            '"': '"',
-            "'": "'",
-            "\u201c": "\u201d",  # 中文双引号
-            "\u2018": "\u2019",  # 中文单引号
-            "\u300c": "\u300d",  # 「」
-            "\u300e": "\u300f",  # 『』
-            "\u300a": "\u300b",  # 《》
-            "\u3008": "\u3009",  # 〈〉
-            "\uff08": "\uff09",  # （）
-            "\u3010": "\u3011",  # 【】
-            "[": "]",
-            "{": "}",
-            "(": ")",
-            "<": ">"
-        }
-        
-        # 格式化规则
-        self.format_rules = {
-            'max_consecutive_chars': 3,  # 最大连续字符数
-            'max_consecutive_spaces': 1,  # 最大连续空格数
-            'add_space_between_zh_en': True,  # 中英文之间添加空格
-            'normalize_ellipsis': True,  # 规范化省略号
-            'normalize_punctuation': True,  # 规范化标点符号
-            'trim_spaces': True,  # 清理多余空格
-            'keep_original_format': False,  # 保持原格式
-            'auto_match_quotes': True,  # 自动匹配引号
-            'auto_format_paragraphs': True,  # 自动格式化段落
-            'preserve_line_breaks': True,  # 保留换行符
-            'smart_punctuation': True  # 智能标点处理
-        }
-        
-        print(f"{Fore.GREEN}输入模拟器初始化完成{Fore.RESET}")
+        # 引号配对字典与格式化规则（默认值见 text_core）
+        self.quote_pairs = dict(QUOTE_PAIRS)
+        self.format_rules = dict(FORMAT_RULES)
 
     def _get_cursor_pos(self):
         """
         获取当前光标位置
         """
-        return win32gui.GetCaretPos()
+        return self.backend.caret_pos()
 
     def _get_active_window(self):
         """
         获取当前活动窗口
         """
-        return win32gui.GetForegroundWindow()
+        return self.backend.foreground_window()
+
+    def _begin_session(self) -> bool:
+        """
+        开始一次输入会话：新建取消令牌，安装一次性的Esc钩子，监视当前前台窗口
+        :return: 是否由本次调用开始会话（已在会话中时返回False，例如持续输入中的type_string，
+                 调用方此时不应结束会话）
+        """
+        if self._session_active:
+            return False
+        self._session_active = True
+        self._idle.clear()
+        token = self.token = CancellationToken()
+        self._escape_hook = self.backend.add_escape_hook(lambda: token.cancel('esc'))
+        if self.focus is None:
+            self.focus = self.backend.focus_watcher()
+            self.focus.start()
+        self.focus.arm(self._get_active_window())
+        self.metrics.begin_session()
+        return True
+
+    def _end_session(self, owned: bool):
+        """结束 _begin_session 开始的会话，并记录停止延迟"""
+        if not owned:
+            return
+        self.focus.disarm()
+        self.backend.remove_escape_hook(self._escape_hook)
+        self._escape_hook = None
+        if self.token.cancelled:
+            self.stop_latencies.append(self.token.latency_ms())
+            del self.stop_latencies[:-100]
+        self.metrics.end_session()
+        self._session_active = False
+        self._idle.set()
+
+    def _escape_requested(self) -> bool:
+        """是否已请求停止；后端不支持Esc钩子时退回到查询Esc键状态"""
+        if self._escape_hook is None and self.backend.escape_pressed():
+            self.token.cancel('esc')
+        return self.token.cancelled
+
+    def _focus_lost(self) -> bool:
+        """输入过程中焦点是否已离开目标窗口（只读取标志，不产生系统调用）"""
+        return self.focus is not None and self.focus.moved
+
+    def _interrupted(self) -> bool:
+        """是否应当停止发送：已取消或焦点已离开目标窗口"""
+        if self.tracer is None:
+            return self.token.cancelled or self._focus_lost()
+        started = time.perf_counter()
+        interrupted = self.token.cancelled or self._focus_lost()
+        self.tracer.record('focus_check', started, time.perf_counter())
+        return interrupted
+
+    def _report_interruption(self) -> bool:
+        """输入被取消或焦点离开时打印原因并返回True"""
+        if self.token.cancelled:
+            print(f"{Fore.YELLOW}输入已停止{Fore.RESET}")
+            return True
+        if self._focus_lost():
+            print(f"{Fore.YELLOW}窗口已切换，停止输入{Fore.RESET}")
+            return True
+        return False
+
+    def _record_wait(self, name: str, started: float, finished: float, args: dict):
+        """把一次等待计入指标和时间线（同步和异步接口共用）"""
+        self.metrics.add('sleep_seconds', finished - started)
+        if self.tracer is not None:
+            self.tracer.record(name, started, finished, args)
+
+    def _sleep(self, seconds: float) -> bool:
+        """可被取消打断的等待，耗时计入指标；被打断时返回True"""
+        started = time.perf_counter()
+        interrupted = self.token.sleep(seconds)
+        self._record_wait('sleep', started, time.perf_counter(), {'seconds': seconds})
+        return interrupted
+
+    def _wait(self, scheduler: DeadlineScheduler, delay: float) -> bool:
+        """按截止时间等待，耗时计入指标"""
+        started = time.perf_counter()
+        completed = scheduler.wait(delay)
+        self._record_wait('wait', started, time.perf_counter(), {'delay': delay})
+        return completed
+
+    def _drive(self, steps, scheduler: DeadlineScheduler = None):
+        """
+        在当前线程中执行发送步骤（*_steps 生成器），按产出的请求阻塞等待
+        :param steps: 发送步骤生成器
+        :param scheduler: 逐字输入的节奏调度器（DEADLINE 请求使用）
+        :return: 生成器的返回值
+        """
+        try:
+            request = next(steps)
+            while True:
+                kind, value = request
+                if kind == SLEEP:
+                    result = self._sleep(value) if value > 0 else self.token.cancelled
+                elif kind == DEADLINE:
+                    result = not self._wait(scheduler, value) if value > 0 else self.token.cancelled
+                else:
+                    result = self.backend.wait_until_idle(self.paste_timeout)
+                request = steps.send(result)
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            steps.close()
 
     def _send_char_direct(self, char: str):
         """
         使用win32api直接发送字符（备选方案）
         """
         try:
+            started = time.perf_counter()
             if char == '\n':
-                win32api.keybd_event(win32con.VK_RETURN, 0, 0, 0)
+                self.backend.keybd_event(VK_RETURN, 0)
                 time.sleep(0.001)
-                win32api.keybd_event(win32con.VK_RETURN, 0, win32con.KEYEVENTF_KEYUP, 0)
+                self.backend.keybd_event(VK_RETURN, KEYEVENTF_KEYUP)
             elif char == ' ':
-                win32api.keybd_event(win32con.VK_SPACE, 0, 0, 0)
+                self.backend.keybd_event(VK_SPACE, 0)
                 time.sleep(0.001)
-                win32api.keybd_event(win32con.VK_SPACE, 0, win32con.KEYEVENTF_KEYUP, 0)
+                self.backend.keybd_event(VK_SPACE, KEYEVENTF_KEYUP)
             elif char == '\t':
-                win32api.keybd_event(win32con.VK_TAB, 0, 0, 0)
+                self.backend.keybd_event(VK_TAB, 0)
                 time.sleep(0.001)
-                win32api.keybd_event(win32con.VK_TAB, 0, win32con.KEYEVENTF_KEYUP, 0)
+                self.backend.keybd_event(VK_TAB, KEYEVENTF_KEYUP)
             else:
-                # 使用SendInput发送Unicode字符
-                inputs = [
-                    self._create_unicode_input(char, False),
-                    self._create_unicode_input(char, True)
-                ]
-                return self._send_inputs(inputs)
+                # 使用SendInput发送Unicode字符（BMP以外的字符按代理对发送）
+                self.encoder.encode(char)
+                if not self._send_encoded():
+                    return False
+                started = None  # 已由 _send_batch 记录
+            if started is not None:
+                # keybd_event 没有返回值，按一批两个事件记录
+                finished = time.perf_counter()
+                self.metrics.batch(2, 2, started, finished)
+                if self.tracer is not None:
+                    self.tracer.record('keybd_event', started, finished, {'char': char})
+            self.sent += 1
             return True
         except Exception as e:
             print(f"{Fore.RED}直接输入出错: {str(e)}{Fore.RESET}")
@@ -153,15 +242,7 @@ class InputSimulator:
         """
         for i in range(self.max_retries):
             try:
-                # 保存当前剪贴板内容
-                win32clipboard.OpenClipboard()
-                try:
-                    old_clipboard = win32clipboard.GetClipboardData(win32con.CF_UNICODETEXT)
-                except:
-                    old_clipboard = None
-                win32clipboard.EmptyClipboard()
-                win32clipboard.SetClipboardText(text)
-                win32clipboard.CloseClipboard()
+                self.backend.set_clipboard_text(text)
                 return True
             except Exception as e:
                 if i < self.max_retries - 1:
@@ -170,11 +251,6 @@ class InputSimulator:
                     continue
                 print(f"{Fore.RED}剪贴板访问失败: {str(e)}{Fore.RESET}")
                 return False
-            finally:
-                try:
-                    win32clipboard.CloseClipboard()
-                except:
-                    pass
         return False
 
     def _paste_at_cursor(self) -> bool:
@@ -183,561 +259,656 @@ class InputSimulator:
         :return: 是否成功
         """
         try:
-            win32api.keybd_event(win32con.VK_CONTROL, 0, 0, 0)
-            win32api.keybd_event(ord('V'), 0, 0, 0)
-            win32api.keybd_event(ord('V'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            win32api.keybd_event(win32con.VK_CONTROL, 0, win32con.KEYEVENTF_KEYUP, 0)
+            self.backend.keybd_event(VK_CONTROL, 0)
+            self.backend.keybd_event(VK_V, 0)
+            self.backend.keybd_event(VK_V, KEYEVENTF_KEYUP)
+            self.backend.keybd_event(VK_CONTROL, KEYEVENTF_KEYUP)
             return True
         except Exception as e:
             print(f"{Fore.RED}粘贴操作失败: {str(e)}{Fore.RESET}")
             return False
 
-    def _create_unicode_input(self, char: str, up: bool = False) -> INPUT:
-        """创建Unicode字符输入事件"""
-        input_union = INPUT_UNION()
-        input_union.ki.wVk = 0
-        input_union.ki.wScan = ord(char)
-        input_union.ki.dwFlags = self.KEYEVENTF_UNICODE | (self.KEYEVENTF_KEYUP if up else 0)
-        input_union.ki.time = 0
-        input_union.ki.dwExtraInfo = ctypes.pointer(wintypes.ULONG(0))
-
-        input_struct = INPUT()
-        input_struct.type = self.INPUT_KEYBOARD
-        input_struct.union = input_union
-        return input_struct
-
-    def _create_virtual_input(self, vk_code: int, up: bool = False) -> INPUT:
-        """创建虚拟键码输入事件"""
-        input_union = INPUT_UNION()
-        input_union.ki.wVk = vk_code
-        input_union.ki.wScan = 0
-        input_union.ki.dwFlags = self.KEYEVENTF_KEYUP if up else 0
-        input_union.ki.time = 0
-        input_union.ki.dwExtraInfo = ctypes.pointer(wintypes.ULONG(0))
-
-        input_struct = INPUT()
-        input_struct.type = self.INPUT_KEYBOARD
-        input_struct.union = input_union
-        return input_struct
-
-    def _send_inputs(self, inputs: List[INPUT]) -> bool:
-        """批量发送输入事件"""
+    def _confirm_steps(self, text: str, end: int):
+        """
+        确认目标已经处理完一次粘贴（发送步骤）
+        设置了 read_back 时每10毫秒检查一次目标中是否出现 text[:end]，否则等待前台窗口处理完输入队列
+        :return: 是否已确认
+        """
+        if self.read_back is None:
+            return (yield IDLE, None)
+        deadline = time.perf_counter() + self.paste_timeout
+        while not self.read_back(text, end):
+            if time.perf_counter() >= deadline or (yield SLEEP, 0.01):
+                return False
+        return True
+
+    def _paste_steps(self, text: str):
+        """
+        通过剪贴板分块粘贴文本（发送步骤）
+        每块粘贴后确认目标已处理完毕再写入下一块（否则目标可能读到下一块的内容），
+        结束后恢复剪贴板原有的全部内容
+        :return: 是否成功
+        """
         try:
-            nInputs = len(inputs)
-            pInputs = (INPUT * nInputs)(*inputs)
-            cbSize = ctypes.c_int(ctypes.sizeof(INPUT))
-            return ctypes.windll.user32.SendInput(nInputs, pInputs, cbSize) == nInputs
+            snapshot = self.backend.snapshot_clipboard()
         except Exception as e:
-            print(f"{Fore.RED}发送输入事件失败: {str(e)}{Fore.RESET}")
+            print(f"{Fore.RED}无法保存剪贴板内容，取消粘贴: {str(e)}{Fore.RESET}")
             return False
 
-    def _send_text_fast(self, text: str) -> bool:
-        """快速发送文本（批量处理）"""
         try:
-            # 为每个字符创建按下和释放事件
-            inputs = []
-            for char in text:
-                if char == '\n':
-                    # 回车键
-                    inputs.extend([
-                        self._create_virtual_input(win32con.VK_RETURN, False),
-                        self._create_virtual_input(win32con.VK_RETURN, True)
-                    ])
-                elif char == ' ':
-                    # 空格键
-                    inputs.extend([
-                        self._create_virtual_input(win32con.VK_SPACE, False),
-                        self._create_virtual_input(win32con.VK_SPACE, True)
-                    ])
-                elif char == '\t':
-                    # Tab键
-                    inputs.extend([
-                        self._create_virtual_input(win32con.VK_TAB, False),
-                        self._create_virtual_input(win32con.VK_TAB, True)
-                    ])
-                else:
-                    # 普通字符
-                    inputs.extend([
-                        self._create_unicode_input(char, False),
-                        self._create_unicode_input(char, True)
-                    ])
-            
-            # 批量发送所有输入事件
-            if not inputs:
-                return True
-                
-            # 分批发送，每批最多50个事件
-            batch_size = 50
-            for i in range(0, len(inputs), batch_size):
-                batch = inputs[i:i + batch_size]
-                if not self._send_inputs(batch):
+            for start in range(0, len(text), self.paste_chunk_size):
+                end = min(start + self.paste_chunk_size, len(text))
+                if self._interrupted():
                     return False
-                time.sleep(0.001)  # 微小延迟，避免事件丢失
-                
+                if not self._send_text_to_clipboard(text[start:end]) or not self._paste_at_cursor():
+                    return False
+                self.metrics.add('pastes')
+                if not (yield from self._confirm_steps(text, end)):
+                    if not self._interrupted():
+                        print(f"{Fore.RED}目标窗口未确认粘贴，停止输入{Fore.RESET}")
+                    return False
+                self.sent += end - start
             return True
-            
-        except Exception as e:
-            print(f"{Fore.RED}快速输入失败: {str(e)}{Fore.RESET}")
-            return False
+        finally:
+            try:
+                self.backend.restore_clipboard(snapshot)
+            except Exception as e:
+                print(f"{Fore.RED}恢复剪贴板内容失败: {str(e)}{Fore.RESET}")
 
-    def format_text(self, text: str) -> str:
+    def _paste_text(self, text: str) -> bool:
         """
-        格式化文本
-        :param text: 要格式化的文本
-        :return: 格式化后的文本
+        通过剪贴板分块粘贴文本（见 _paste_steps）
+        :return: 是否成功
         """
-        if not text or self.format_rules.get('keep_original_format', False):
-            return text
-
-        result = text
+        owned = self._begin_session()
+        try:
+            return self._drive(self._paste_steps(text))
+        finally:
+            self._end_session(owned)
+
+    def _cost_model(self) -> CostModel:
+        """当前前台窗口的代价模型（首次使用时按默认参数创建）"""
+        target = self._get_active_window()
+        model = self.cost_models.get(target)
+        if model is None:
+            model = self.cost_models[target] = CostModel(paste_chunk_size=self.paste_chunk_size)
+        return model
+
+    def prepare_text(self, text: str, format_text: bool = True) -> str:
+        """
+        准备要输出的文本：按规则格式化，并去掉不匹配的引号
+        :param text: 原始文本
+        :param format_text: 是否格式化文本
+        :return: 准备好的文本
+        """
+        return prepare_text(text, self.format_rules, self.quote_pairs, format_text)
 
-        # 处理多余空格和换行
-        if self.format_rules.get('trim_spaces', True):
-            if self.format_rules.get('auto_format_paragraphs', True):
-                # 保留段落格式，将连续多个空行减少为一个空行
-                paragraphs = re.split(r'\n\s*\n', result)
-                paragraphs = [p.strip() for p in paragraphs if p.strip()]
-                result = '\n\n'.join(paragraphs)
-            
-            # 处理每行的空格
-            if self.format_rules.get('preserve_line_breaks', True):
-                lines = result.split('\n')
-                lines = [re.sub(r'\s+', ' ', line.strip()) for line in lines]
-                result = '\n'.join(lines)
-            else:
-                result = re.sub(r'\s+', ' ', result).strip()
-
-        # 智能处理引号
-        if self.format_rules.get('auto_match_quotes', True):
-            result = self._match_quotes(result)
-
-        # 处理中英文之间的空格
-        if self.format_rules.get('add_space_between_zh_en', True):
-            result = re.sub(r'([\u4e00-\u9fff])([a-zA-Z0-9])', r'\1 \2', result)
-            result = re.sub(r'([a-zA-Z0-9])([\u4e00-\u9fff])', r'\1 \2', result)
-
-        # 规范化标点符号
-        if self.format_rules.get('smart_punctuation', True):
-            # 统一中文标点
-            punctuation_map = {
-                ',': '，',
-                '.': '。',
-                '?': '？',
-                '!': '！',
-                ':': '：',
-                ';': '；',
-                '(': '（',
-                ')': '）',
-                '[': '【',
-                ']': '】'
-            }
-            for en, zh in punctuation_map.items():
-                # 仅在中文上下文中替换英文标点
-                result = re.sub(f'(?<=[\\u4e00-\\u9fff]){re.escape(en)}(?=[\\u4e00-\\u9fff])', zh, result)
-            
-            # 处理重复的标点符号
-            result = re.sub(r'([，。！？；：、])\1+', r'\1', result)
+    def _prepared(self, text: str, format_text: bool = True, chunk_size: int = 0,
+                  format_rules: dict = None) -> PreparedPlan:
+        """
+        准备文本，结果按内容哈希和生效的选项缓存（见 plan_cache）
+        :param format_text: 是否格式化文本
+        :param chunk_size: 快速模式每段的字符数，不为0时还缓存各段编码好的事件
+        :param format_rules: 本次使用的格式化规则，默认 self.format_rules
+        """
+        rules = self.format_rules if format_rules is None else format_rules
+        formatting = format_text and not rules.get('keep_original_format', False)
+        key = (content_key(text), tuple(sorted(rules.items())),
+               tuple(self.quote_pairs.items()), formatting, chunk_size)
+        entry = self.plan_cache.get(key)
+        if entry is None:
+            started = time.perf_counter()
+            prepared, deleted = prepare_with_deletions(text, rules, self.quote_pairs, formatting,
+                                                       self.tracer.record if self.tracer is not None else None)
+            self.metrics.add('format_seconds', time.perf_counter() - started)
+            entry = PreparedPlan(prepared, deleted, encode=bool(chunk_size))
+            self.plan_cache.put(key, entry)
+        return entry
+
+    def _fast_chunk_size(self, interval: Union[float, tuple]) -> int:
+        """快速模式每段的字符数：指定了输入间隔时按100字分段，在段之间停顿"""
+        return 100 if isinstance(interval, tuple) or interval > 0 else self.fast_chunk_size
+
+    def prepare_stream(self, source, encoding: str = 'utf-8', format_text: bool = True,
+                       format_rules: dict = None):
+        """
+        按窗口准备流式输入源（见 text_stream），内存占用只取决于 stream_window
+        :param source: 文件对象（文本或二进制模式）或 str/bytes 片段的可迭代对象
+        :param encoding: bytes 的编码
+        :param format_text: 是否格式化文本
+        :param format_rules: 本次使用的格式化规则，默认 self.format_rules
+        :return: 准备好的文本片段的生成器
+        """
+        rules = self.format_rules if format_rules is None else format_rules
+        return prepare_stream(iter_decoded(source, encoding), rules, self.quote_pairs,
+                              format_text, self.stream_window)
 
-        # 处理省略号
-        if self.format_rules.get('normalize_ellipsis', True):
-            result = re.sub(r'\.{3,}', '...', result)
-            result = re.sub(r'。{3,}', '......', result)
+    def plan_delivery(self, text: str, format_text: bool = True, format_rules: dict = None) -> DeliveryPlan:
+        """
+        为文本规划每一段的输出方式（见 delivery_planner），不发送任何事件
+        :param format_rules: 本次使用的格式化规则，默认 self.format_rules
+        :return: 规划结果，summary() 给出预计的事件数和耗时
+        """
+        return plan_delivery(self._prepared(text, format_text, format_rules=format_rules).text,
+                             self._cost_model())
 
-        # 处理连续字符
-        if self.format_rules.get('max_consecutive_chars', 3) > 0:
-            max_chars = self.format_rules['max_consecutive_chars']
-            pattern = r'(.)\1{' + str(max_chars) + r',}'
-            result = re.sub(pattern, lambda m: m.group(1) * max_chars, result)
+    def _key_steps(self, text: str):
+        """逐个发送虚拟键（规划中的 vk 段，发送步骤），发送完让出一次"""
+        for char in text:
+            if self._interrupted() or not self._send_char_direct(char):
+                return False
+        yield SLEEP, 0
+        return True
 
-        return result
+    def _deliver_steps(self, plan: DeliveryPlan):
+        """
+        按规划逐段输出（发送步骤），并用每段的实测耗时更新代价模型
+        :return: 是否成功
+        """
+        model = self._cost_model()
+        text = plan.text
+        for segment in plan:
+            if self._interrupted():
+                return False
+            chunk = text[segment.start:segment.end]
+            started = time.perf_counter()
+            if segment.method == PASTE:
+                ok = yield from self._paste_steps(chunk)
+                units = len(chunk)
+            elif segment.method == VK:
+                ok = yield from self._key_steps(chunk)
+                units = segment.events
+            else:
+                ok = yield from self._fast_steps(chunk)
+                units = segment.events
+            if not ok:
+                return False
+            model.observe(segment.method, units, time.perf_counter() - started)
+        return True
 
-    def _check_quote_pairs(self, text: str) -> list:
+    def _deliver(self, plan: DeliveryPlan) -> bool:
         """
-        检查文本中的引号配对情况
-        :param text: 要检查的文本
-        :return: 需要删除的引号位置列表
+        按规划逐段输出（见 _deliver_steps）
+        :return: 是否成功
         """
-        stack = []  # 用于存储待匹配的引号
-        delete_positions = []  # 需要删除的引号位置
-        quote_positions = {}  # 记录每种引号的位置
-
-        # 第一遍扫描：记录所有引号的位置
-        for i, char in enumerate(text):
-            if char in self.quote_pairs or char in self.quote_pairs.values():
-                if char not in quote_positions:
-                    quote_positions[char] = []
-                quote_positions[char].append(i)
-
-        # 第二遍扫描：检查配对情况
-        for i, char in enumerate(text):
-            if char in self.quote_pairs:  # 左引号
-                stack.append((char, i))
-            elif char in self.quote_pairs.values():  # 右引号
-                # 找到对应的左引号
-                left_quote = None
-                for left, right in self.quote_pairs.items():
-                    if right == char:
-                        left_quote = left
-                        break
+        owned = self._begin_session()
+        try:
+            return self._drive(self._deliver_steps(plan))
+        finally:
+            self._end_session(owned)
 
-                if stack and stack[-1][0] == left_quote:
-                    stack.pop()  # 匹配成功，弹出左引号
-                else:
-                    # 检查是否有对应的左引号在后面
-                    if left_quote in quote_positions:
-                        future_positions = [pos for pos in quote_positions[left_quote] if pos > i]
-                        if not future_positions:  # 如果后面没有对应的左引号
-                            delete_positions.append(i)  # 标记当前右引号为需要删除
+    def _send_encoded(self, start: int = 0, count: int = None) -> bool:
+        """
+        发送编码器缓冲区中的一段事件（零拷贝）
+        :param start: 起始事件下标
+        :param count: 事件数，默认到末尾
+        """
+        if count is None:
+            count = self.encoder.count - start
+        return self._send_batch(start, count) == count
 
-        # 处理未匹配的左引号
-        while stack:
-            _, pos = stack.pop()
-            delete_positions.append(pos)
+    def _send_batch(self, start: int, count: int) -> int:
+        """
+        发送编码器缓冲区中的一批事件
+        :return: 目标实际接受的事件数（出错时为0）
+        """
+        try:
+            if count <= 0:
+                return 0
+            started = time.perf_counter()
+            accepted = self.backend.send_input(self.encoder.view(start, count), count)
+            finished = time.perf_counter()
+            self.metrics.batch(count, accepted, started, finished)
+            if self.tracer is not None:
+                self.tracer.record('SendInput', started, finished, {'requested': count, 'accepted': accepted})
+            return accepted
+        except Exception as e:
+            print(f"{Fore.RED}发送输入事件失败: {str(e)}{Fore.RESET}")
+            return 0
 
-        return sorted(delete_positions)
+    def _typed_chars(self, text: str, events: int) -> int:
+        """已发送的事件数对应的字符数（每个UTF-16码元一对按下/抬起事件）"""
+        units = events // 2
+        if self.encoder.count == len(text) * 2:  # 没有代理对
+            return units
+        return len(text.encode('utf-16-le')[:units * 2].decode('utf-16-le', errors='surrogatepass'))
 
-    def _send_backspace(self) -> bool:
+    def _fast_steps(self, text: str, events: bytes = None):
         """
-        发送退格键
+        快速发送文本（批量处理，发送步骤）
+        批量和批间延迟由 self.pacer 根据目标的接收情况自适应调整；
+        SendInput 只接受部分事件时，剩余事件在退避后重发；每批之前检查是否已取消或焦点已离开目标窗口。
+        每批之后更新 self.sent 并产出批间延迟（最后一批之后为0）
+        :param events: 这段文本之前编码好的事件（InputEncoder.snapshot），有则直接载入
         :return: 是否成功
         """
         try:
-            inputs = [
-                self._create_virtual_input(win32con.VK_BACK, False),
-                self._create_virtual_input(win32con.VK_BACK, True)
-            ]
-            return self._send_inputs(inputs)
+            # 一次性编码为连续的INPUT缓冲区
+            started = time.perf_counter()
+            total = self.encoder.load(events) if events is not None else self.encoder.encode(text)
+            finished = time.perf_counter()
+            self.metrics.add('encode_seconds', finished - started)
+            if self.tracer is not None:
+                self.tracer.record('encode', started, finished, {'chars': len(text), 'cached': events is not None})
+            if not total:
+                return True
+
+            pacer = self.pacer
+            sent = self.sent  # 这段文本之前已送达的字符数
+            start = 0
+            stalls = 0  # 连续未被接受任何事件的批数
+            while start < total:
+                if self._interrupted():
+                    return False
+                count = min(pacer.batch_size, total - start)
+                accepted = self._send_batch(start, count)
+                start += accepted
+
+                verified = None
+                if accepted:
+                    typed = self._typed_chars(text, start)
+                    self.sent = sent + typed
+                    if self.read_back is not None:
+                        verified = bool(self.read_back(text, typed))
+                pacer.record(count, accepted, verified)
+
+                if accepted:
+                    stalls = 0
+                else:
+                    stalls += 1
+                    if stalls >= self.max_retries:
+                        return False
+                yield SLEEP, pacer.delay if start < total else 0
+            return True
+
         except Exception as e:
-            print(f"{Fore.RED}发送退格键失败: {str(e)}{Fore.RESET}")
+            print(f"{Fore.RED}快速输入失败: {str(e)}{Fore.RESET}")
             return False
 
-    def type_string(self, text: str, interval: Union[float, tuple] = 0.1, 
+    def _send_text_fast(self, text: str, events: bytes = None) -> bool:
+        """快速发送文本（见 _fast_steps）"""
+        return self._drive(self._fast_steps(text, events))
+
+    def _fast_mode_steps(self, text: str, interval: Union[float, tuple], events: list = None,
+                         progress=None):
+        """
+        快速模式（发送步骤）：批量与节奏由自适应控制器决定；指定了输入间隔时按100字分段，在段之间停顿
+        :param events: 各段编码好的事件（见 plan_cache），还没有保存的段发送后追加进去
+        :param progress: 进度回调，每段之后以 self.sent 调用
+        :return: 是否成功
+        """
+        chunk_size = self._fast_chunk_size(interval)
+        for n, i in enumerate(range(0, len(text), chunk_size)):
+            chunk = text[i:i + chunk_size]
+            cached = events[n] if events is not None and n < len(events) else None
+            if not (yield from self._fast_steps(chunk, cached)):
+                return False
+            if events is not None and n == len(events):
+                events.append(self.encoder.snapshot())
+            if progress is not None:
+                progress(self.sent)
+
+            if isinstance(interval, tuple):
+                yield SLEEP, random.uniform(interval[0], interval[1])
+            elif interval > 0:
+                yield SLEEP, interval
+        return True
+
+    def _char_steps(self, text: str, interval: Union[float, tuple], progress=None):
+        """
+        字符输入模式（发送步骤）：每个字符之后产出到下一个截止时间的间隔，发送耗时不会累积成漂移
+        :param progress: 进度回调，每个字符之后以 self.sent 调用
+        :return: 是否成功（被取消、焦点离开或发送失败时为False）
+        """
+        token = self.token
+        focus = self.focus
+        tracer = self.tracer
+        for char in text:
+            if isinstance(interval, tuple):
+                delay = random.uniform(interval[0], interval[1])
+            else:
+                delay = interval
+
+            # 检查是否已取消、窗口是否改变
+            if tracer is None:
+                stop = token.cancelled or focus.moved
+            else:
+                started = time.perf_counter()
+                stop = token.cancelled or focus.moved
+                tracer.record('focus_check', started, time.perf_counter())
+            if stop or not self._send_char_direct(char):
+                return False
+            if progress is not None:
+                progress(self.sent)
+            yield DEADLINE, delay
+        return True
+
+    def format_text(self, text: str) -> str:
+        """
+        格式化文本
+        启用的规则会编译成流水线并按规则集缓存（见 text_formatter）
+        :param text: 要格式化的文本
+        :return: 格式化后的文本
+        """
+        return get_pipeline(self.format_rules)(text, self.quote_pairs)
+
+    def _check_quote_pairs(self, text: str) -> list:
+        """
+        检查文本中的引号配对情况（线性时间，见 quote_engine）
+        :param text: 要检查的文本
+        :return: 需要删除的引号位置列表
+        """
+        return find_unmatched_quotes(text, self.quote_pairs)
+
+    def type_string(self, text: Union[str, bytes, Iterable], interval: Union[float, tuple] = 0.1, 
                    encoding: str = 'utf-8', use_ime: bool = True, fast_mode: bool = False,
-                   format_text: bool = True):
+                   format_text: bool = True, scheduler: DeadlineScheduler = None,
+                   paste_mode: bool = False, planned: bool = False, format_rules: dict = None):
         """
         模拟键盘输入文本
-        :param text: 要输入的文本
+        :param text: 要输入的文本；也可以是文件对象（文本或二进制模式）或 str/bytes 片段的可迭代对象，
+                     这时边读取边输出，内存占用与输入长度无关（见 text_stream）；
+                     ManuscriptSource 还会在检查点中记录送达进度（见 manuscript）
         :param interval: 输入间隔，可以是固定值或者范围元组(min, max)
         :param encoding: 文本编码，默认utf-8
         :param use_ime: 是否使用输入法，默认True
         :param fast_mode: 是否使用快速输入模式，默认False
         :param format_text: 是否格式化文本，默认True
+        :param scheduler: 逐字输入的节奏调度器，默认新建一个；持续输入时多次调用共用同一个
+        :param paste_mode: 是否通过剪贴板分块粘贴（大段文本只需几十个按键事件），默认False
+        :param planned: 是否由规划器为每段选择代价最低的输出方式（忽略fast_mode/paste_mode），默认False
+        :param format_rules: 本次使用的格式化规则，默认 self.format_rules（不修改模拟器的设置）
         """
+        rules = self.format_rules if format_rules is None else format_rules
+        owned = False
+        progress = None
+        events = None
+        tracer = self.tracer
+        session_started = time.perf_counter()
         try:
-            # 确保文本编码正确
-            if isinstance(text, bytes):
-                text = text.decode(encoding)
-            elif isinstance(text, str):
-                text = text.encode(encoding).decode(encoding)
-
-            # 格式化文本
-            if format_text and not self.format_rules.get('keep_original_format', False):
-                text = self.format_text(text)
+            # 开始会话：取消令牌、Esc钩子、前台窗口监视
+            owned = self._begin_session()
+
+            # 格式化文本，不匹配的引号在编码前直接从文本中去掉（不再先输入再退格）
+            streaming = not isinstance(text, (str, bytes))
+            if isinstance(text, ManuscriptSource):
+                # 稿件文件：从检查点继续，并报告每个片段的送达进度
+                pieces = text.windows(rules, self.quote_pairs, format_text, self.stream_window)
+                progress = text.delivered
+            elif streaming:
+                # 增量解码、按窗口准备，第一个窗口准备好就开始输出
+                pieces = self.prepare_stream(text, encoding, format_text, rules)
+            if streaming:
+                pieces = self.metrics.timed(pieces, 'format_seconds',
+                                            tracer.record if tracer is not None else None)
+            else:
+                if isinstance(text, bytes):
+                    text = text.decode(encoding)
+                # 准备结果（快速模式还有编码好的事件）按内容缓存，持续输入第二遍起不再重复准备
+                chunk_size = self._fast_chunk_size(interval) if fast_mode and not (planned or paste_mode) else 0
+                prepared = self._prepared(text, format_text, chunk_size, rules)
+                pieces = (prepared.text,)
+                events = prepared.events
+
+            # 字符输入模式按绝对截止时间等待，整个输入源共用一个调度器
+            if scheduler is None and not (planned or paste_mode or fast_mode):
+                scheduler = DeadlineScheduler(self.spin_ms, sleep=self.token.sleep)
+            if scheduler is not None:
+                self.schedule = scheduler
+
+            for piece in pieces:
+                self.sent = 0
+                started = time.perf_counter()
+                try:
+                    done = self._type_prepared(piece, interval, fast_mode, scheduler, paste_mode,
+                                               planned, announce=not streaming, progress=progress,
+                                               events=events)
+                finally:
+                    finished = time.perf_counter()
+                    self.metrics.output(self.sent, finished - started)
+                    if tracer is not None:
+                        tracer.record('piece', started, finished, {'chars': len(piece), 'sent': self.sent})
+                    if progress is not None:
+                        progress(self.sent)
+                if not done:
+                    break
 
-            # 检查引号配对
-            delete_positions = []
-            if self.format_rules.get('auto_match_quotes', True):
-                delete_positions = self._check_quote_pairs(text)
+        except Exception as e:
+            print(f"{Fore.RED}输入过程出错: {str(e)}{Fore.RESET}")
+        finally:
+            if progress is not None:
+                text.sync()  # 中断或结束时立即保存进度
+            if tracer is not None:
+                tracer.record('type_string', session_started, time.perf_counter())
+            self._end_session(owned)
+
+    def _type_prepared(self, text: str, interval: Union[float, tuple], fast_mode: bool,
+                       scheduler: DeadlineScheduler, paste_mode: bool, planned: bool,
+                       announce: bool = True, progress=None, events: list = None) -> bool:
+        """
+        输出一段已经准备好的文本，self.sent 记录已送达的字符数
+        :param announce: 按规划输出时是否打印预计的事件数和耗时
+        :param progress: 进度回调，逐字输入时每个字符、快速模式每段之后以 self.sent 调用
+        :param events: 快速模式各段编码好的事件（见 plan_cache），还没有保存的段发送后追加进去
+        :return: 是否输出完毕；被取消或焦点离开时打印原因并返回False
+        :raises Exception: 发送失败
+        """
+        # 按规划输出：先报告预计的事件数和耗时，再逐段发送
+        if planned:
+            plan = self.last_plan = plan_delivery(text, self._cost_model())
+            if announce:
+                summary = plan.summary()
+                print(f"{Fore.CYAN}输出规划: {summary['segments']} 段，预计 {summary['events']} 个事件，"
+                      f"约 {summary['seconds']:.2f} 秒{Fore.RESET}")
+            if not self._deliver(plan):
+                if self._report_interruption():
+                    return False
+                raise Exception("按规划输出失败")
+            return True
 
-            # 记录当前窗口
-            active_window = self._get_active_window()
-            
-            # 快速模式
-            if fast_mode:
-                # 分段处理，避免一次性发送太多字符
-                chunk_size = 100
-                current_pos = 0
-                for i in range(0, len(text), chunk_size):
-                    chunk = text[i:i + chunk_size]
-                    if not self._send_text_fast(chunk):
-                        raise Exception("快速输入失败")
-                    
-                    # 处理需要删除的引号
-                    chunk_delete_positions = [pos - i for pos in delete_positions if i <= pos < i + chunk_size]
-                    for _ in chunk_delete_positions:
-                        if not self._send_backspace():
-                            raise Exception("退格失败")
-                        time.sleep(0.001)  # 短暂延迟确保退格成功
-                    
-                    if isinstance(interval, tuple):
-                        time.sleep(random.uniform(interval[0], interval[1]))
-                    elif interval > 0:
-                        time.sleep(interval)
-                return
-            
-            # 字符输入模式
-            for i, char in enumerate(text):
-                if isinstance(interval, tuple):
-                    delay = random.uniform(interval[0], interval[1])
-                else:
-                    delay = interval
+        # 粘贴模式
+        if paste_mode:
+            if not self._paste_text(text):
+                if self._report_interruption():
+                    return False
+                raise Exception("粘贴输入失败")
+            return True
 
-                # 检查窗口是否改变
-                if active_window != self._get_active_window():
-                    print(f"{Fore.YELLOW}窗口已切换，停止输入{Fore.RESET}")
-                    break
+        # 快速模式
+        if fast_mode:
+            if not self._drive(self._fast_mode_steps(text, interval, events, progress)):
+                if self._report_interruption():
+                    return False
+                raise Exception("快速输入失败")
+            return True
 
-                if not self._send_char_direct(char):
-                    raise Exception("输入失败")
+        # 字符输入模式：按绝对截止时间等待，等待可被取消打断
+        if not self._drive(self._char_steps(text, interval, progress), scheduler):
+            if self._report_interruption():
+                return False
+            raise Exception("输入失败")
+        return True
 
-                # 如果当前位置需要删除
-                if i in delete_positions:
-                    time.sleep(0.001)  # 短暂延迟确保字符输入完成
-                    if not self._send_backspace():
-                        raise Exception("退格失败")
-                    
-                if delay > 0:
-                    time.sleep(delay)
-                    
-        except Exception as e:
-            print(f"{Fore.RED}输入过程出错: {str(e)}{Fore.RESET}")
+    def type_file(self, path: str, interval: Union[float, tuple] = 0.1, encoding: str = 'utf-8',
+                  resume: bool = True, **options) -> bool:
+        """
+        输入稿件文件：映射到内存、增量解码，用检查点记录进度，中断后再次调用从停下的地方继续（见 manuscript）
+        :param path: 稿件文件路径
+        :param interval: 输入间隔
+        :param encoding: 文件编码（utf-8、gbk、gb2312）
+        :param resume: 是否从检查点继续，False 则从头开始
+        :param options: 传给 type_string 的其他参数（fast_mode、paste_mode、planned、format_text）
+        :return: 是否已全部输入
+        """
+        with ManuscriptSource(path, encoding, resume=resume) as source:
+            if source.done:
+                print(f"{Fore.GREEN}稿件已全部输入，从头开始请设置 resume=False{Fore.RESET}")
+                return True
+            if source.state is not None:
+                print(f"{Fore.CYAN}从检查点继续：已输入 {source.typed} 字（原文第 {source.position[1]} 字附近）"
+                      f"{Fore.RESET}")
+            self.type_string(source, interval, encoding, **options)
+            return source.done
 
-    def start_continuous_input(self, text: str, interval: Union[float, tuple] = 0.1, 
+    def start_continuous_input(self, text: Union[str, bytes, Iterable], interval: Union[float, tuple] = 0.1, 
                              loop: bool = True, encoding: str = 'utf-8', 
                              use_ime: bool = True, fast_mode: bool = False,
-                             format_text: bool = True):
+                             format_text: bool = True, paste_mode: bool = False,
+                             planned: bool = False):
         """
         开始持续输入模式
-        :param text: 要重复输入的文本
+        :param text: 要重复输入的文本；可定位的文件对象每一遍从头读取，其他流式输入源只输入一遍
         :param interval: 输入间隔
         :param loop: 是否循环输入，False则只输入一次
         :param encoding: 文本编码，默认utf-8
         :param use_ime: 是否使用输入法，默认True
         :param fast_mode: 是否使用快速输入模式，默认False
         :param format_text: 是否格式化文本，默认True
+        :param paste_mode: 是否通过剪贴板粘贴，默认False
+        :param planned: 是否由规划器为每段选择输出方式，默认False
         """
         self.running = True
         print(f"{Fore.YELLOW}{'循环' if loop else '单次'}输入模式已启动，按 'Esc' 键停止{Fore.RESET}")
         
+        owned = False
         try:
-            # 记录初始窗口
-            initial_window = self._get_active_window()
+            # 开始会话：取消令牌、Esc钩子、监视初始窗口
+            owned = self._begin_session()
             
             # 预处理文本编码
+            streaming = not isinstance(text, (str, bytes))
             if isinstance(text, bytes):
                 text = text.decode(encoding)
-            elif isinstance(text, str):
-                text = text.encode(encoding).decode(encoding)
-            
-            # 格式化文本
-            if format_text and not self.format_rules.get('keep_original_format', False):
-                text = self.format_text(text)
             
+            # 整个会话共用一个调度器，循环之间的等待也按截止时间计算
+            scheduler = DeadlineScheduler(self.spin_ms, sleep=self.token.sleep)
             while self.running:
-                if keyboard.is_pressed('esc'):
+                if self._escape_requested():
                     self.running = False
                     print(f"{Fore.YELLOW}输入已停止{Fore.RESET}")
                     break
                 
                 # 检查窗口是否改变
-                if initial_window != self._get_active_window():
+                if self._focus_lost():
                     print(f"{Fore.YELLOW}窗口已切换，停止输入{Fore.RESET}")
                     self.running = False
                     break
                     
-                self.type_string(text, interval, encoding, use_ime, fast_mode, False)  # 避免重复格式化
+                # 第二遍起准备结果和编码好的事件都来自 plan_cache
+                self.type_string(text, interval, encoding, use_ime, fast_mode, format_text,
+                                 scheduler=scheduler, paste_mode=paste_mode, planned=planned)
+                if self._interrupted():  # 原因已由type_string打印
+                    self.running = False
+                    break
                 
                 if not loop:  # 如果是单次模式，输入完成后停止
                     self.running = False
                     print(f"{Fore.GREEN}单次输入完成{Fore.RESET}")
                     break
-                elif isinstance(interval, tuple):
-                    time.sleep(random.uniform(interval[0], interval[1]))
+                if streaming:
+                    # 流式输入源只能读一遍，可定位的文件对象回到开头再读
+                    if not (hasattr(text, 'seekable') and text.seekable()):
+                        self.running = False
+                        print(f"{Fore.YELLOW}输入源不能重新读取，输入完成{Fore.RESET}")
+                        break
+                    text.seek(0)
+                delay = random.uniform(interval[0], interval[1]) if isinstance(interval, tuple) else interval
+                if fast_mode or paste_mode or planned:
+                    self._sleep(delay)
                 else:
-                    time.sleep(interval)
+                    self._wait(scheduler, delay)
+            
+            timing = scheduler.summary()
+            if timing['waits']:
+                print(f"{Fore.CYAN}节奏误差 p50 {timing['p50_ms']:.2f}ms / p99 {timing['p99_ms']:.2f}ms，"
+                      f"速率偏差 {timing['rate_error']:.2%}{Fore.RESET}")
                     
         except Exception as e:
             print(f"{Fore.RED}输入出错: {str(e)}{Fore.RESET}")
             self.running = False
+        finally:
+            self._end_session(owned)
+
+    async def type_string_async(self, text: str, interval: Union[float, tuple] = 0.1,
+                                encoding: str = 'utf-8', fast_mode: bool = False,
+                                format_text: bool = True, paste_mode: bool = False,
+                                planned: bool = False, progress=None,
+                                format_rules: dict = None) -> 'TypingProgress':
+        """
+        type_string 的异步版本（见 async_input）：每批事件之后让出事件循环，等待不占用线程，
+        可以用 Task.cancel() 取消
+        :param progress: 进度回调，参数为 TypingProgress
+        :return: 最终进度，state 为 done/stopped/focus_lost/failed
+        其余参数同 type_string
+        """
+        from async_input import run_typing  # asyncio 只在使用异步接口时导入
+        return await run_typing(self, text, interval, encoding, fast_mode, format_text,
+                                paste_mode, planned, progress=progress, format_rules=format_rules)
+
+    async def continuous_input_async(self, text: str, interval: Union[float, tuple] = 0.1,
+                                     loop: bool = True, encoding: str = 'utf-8',
+                                     fast_mode: bool = False, format_text: bool = True,
+                                     paste_mode: bool = False, planned: bool = False,
+                                     progress=None, format_rules: dict = None) -> 'TypingProgress':
+        """
+        start_continuous_input 的异步版本，参数同 start_continuous_input
+        :param progress: 进度回调，参数为 TypingProgress（passes 为已完成的轮数）
+        :param format_rules: 本次使用的格式化规则，默认 self.format_rules
+        :return: 最终进度
+        """
+        from async_input import run_typing
+        return await run_typing(self, text, interval, encoding, fast_mode, format_text,
+                                paste_mode, planned, continuous=True, loop=loop, progress=progress,
+                                format_rules=format_rules)
 
-    def stop(self):
-        """停止所有正在进行的输入操作"""
+    def start_typing_session(self, text: str, interval: Union[float, tuple] = 0.1,
+                             continuous: bool = False, loop: bool = True, **options) -> 'TypingSession':
+        """
+        在当前事件循环的后台任务中开始输入（必须在协程中调用）
+        返回的会话可以 async for 读取进度、await 取得最终进度、cancel() 取消
+        :param continuous: 是否为持续输入
+        :param loop: 持续输入时是否循环
+        :param options: encoding/fast_mode/format_text/paste_mode/planned/format_rules，同 type_string
+        """
+        from async_input import TypingSession, run_typing
+        session = TypingSession()
+        return session.start(run_typing(self, text, interval, continuous=continuous, loop=loop,
+                                        progress=session.publish, **options))
+
+    def stop(self, wait: float = None) -> bool:
+        """
+        停止所有正在进行的输入操作
+        发送循环在下一批事件或下一个字符之前停止，进行中的等待会被立即打断
+        :param wait: 等待发送循环确认停止的最长时间（秒），None表示不等待；
+                     在运行异步会话的事件循环线程中调用时不能等待
+        :return: 发送循环是否已经停止
+        """
         self.running = False
+        self.token.cancel('stop')
         print(f"{Fore.YELLOW}已停止所有输入操作{Fore.RESET}")
+        if wait is None:
+            return self._idle.is_set()
+        return self._idle.wait(wait)
 
-    def analyze_text(self, text: str) -> dict:
+    @property
+    def idle(self) -> bool:
+        """没有输入会话在进行（发送循环已经停止）"""
+        return self._idle.is_set()
+
+    def analyze_text(self, text: str, max_issues_per_type: int = None, sample_step: int = 1) -> dict:
         """
-        分析文本，返回统计信息和潜在问题
+        分析文本，返回统计信息和潜在问题（见 text_analyzer）
         :param text: 要分析的文本
+        :param max_issues_per_type: 每种问题最多返回的条数，None表示不限
+        :param sample_step: 采样间隔，每种问题每sample_step条返回一条
         :return: 包含分析结果的字典
         """
-        result = {
-            'stats': {},
-            'issues': []
-        }
-        
-        if not text:
-            result['stats'] = {
-                'total_chars': 0,
-                'chars_no_spaces': 0,
-                'chinese_chars': 0,
-                'words': 0,
-                'lines': 0
-            }
-            return result
-
-        # 基本统计
-        result['stats']['total_chars'] = len(text)  # 包含所有字符的总数
-        result['stats']['chars_no_spaces'] = len(''.join(text.split()))  # 不包含空白字符的总数
-        
-        # 统计中文字符
-        chinese_chars = re.findall(r'[\u4e00-\u9fff]', text)
-        result['stats']['chinese_chars'] = len(chinese_chars)
-        
-        # 统计行数（包括空行）
-        result['stats']['lines'] = text.count('\n') + 1
-        
-        # 单词统计（VSCode风格）
-        # 1. 将文本按空白字符分割
-        # 2. 将连续的非空白字符视为一个单词
-        # 3. 中文每个字符都算作一个单词
-        words = []
-        
-        # 首先处理所有中文字符，将每个中文字符替换为"中文字符+空格"
-        text_with_spaces = re.sub(r'([\u4e00-\u9fff])', r'\1 ', text)
-        
-        # 分割文本并过滤空字符串
-        raw_words = [word.strip() for word in text_with_spaces.split()]
-        words = [word for word in raw_words if word]
-        
-        result['stats']['words'] = len(words)
-        
-        # 检查问题
-        # 1. 检查重复字符
-        for i in range(len(text)-2):
-            if text[i] == text[i+1] == text[i+2] and text[i].strip():
-                result['issues'].append({
-                    'type': '重复字符',
-                    'position': i,
-                    'content': text[i:i+3],
-                    'description': f'发现连续重复字符: {text[i]}'
-                })
-        
-        # 2. 检查不规范的空格使用
-        spaces = re.finditer(r'\s{2,}', text)
-        for space in spaces:
-            result['issues'].append({
-                'type': '多余空格',
-                'position': space.start(),
-                'content': space.group(),
-                'description': '发现连续多个空格'
-            })
-        
-        # 3. 检查中英文混排的空格问题
-        mixed_spaces = re.finditer(r'[\u4e00-\u9fff][a-zA-Z]|[a-zA-Z][\u4e00-\u9fff]', text)
-        for mixed in mixed_spaces:
-            result['issues'].append({
-                'type': '中英文混排',
-                'position': mixed.start(),
-                'content': mixed.group(),
-                'description': '中英文之间建议加空格'
-            })
-        
-        # 4. 检查标点符号使用
-        punctuation_issues = re.finditer(r'[，。！？；：、][，。！？；：、]', text)
-        for issue in punctuation_issues:
-            result['issues'].append({
-                'type': '标点符号',
-                'position': issue.start(),
-                'content': issue.group(),
-                'description': '发现连续标点符号'
-            })
-        
-        # 5. 检查特殊字符
-        special_chars = re.finditer(r'[^\u4e00-\u9fff\u0020-\u007F\n\t]', text)
-        for char in special_chars:
-            result['issues'].append({
-                'type': '特殊字符',
-                'position': char.start(),
-                'content': char.group(),
-                'description': f'发现特殊字符: {char.group()}'
-            })
-
-        # 6. 检查引号配对
-        delete_positions = self._check_quote_pairs(text)
-        for pos in delete_positions:
-            result['issues'].append({
-                'type': '引号不匹配',
-                'position': pos,
-                'content': text[pos],
-                'description': f'发现未匹配的引号: {text[pos]}'
-            })
-        
-        return result
+        return analyze_text(text, self.quote_pairs, max_issues_per_type, sample_step)
 
     def _match_quotes(self, text: str) -> str:
         """
-        智能匹配引号
+        智能匹配引号（线性时间，见 quote_engine）
         :param text: 要处理的文本
         :return: 处理后的文本
         """
-        if not text:
-            return text
-
-        # 将文本转换为字符列表以便修改
-        chars = list(text)
-        stack = []  # 存储待匹配的左引号
-        to_remove = set()  # 需要删除的引号位置
-        to_add = {}  # 需要添加的引号 {位置: 引号}
-
-        # 第一遍扫描：标记不匹配的引号
-        for i, char in enumerate(chars):
-            if char in self.quote_pairs:  # 左引号
-                stack.append((char, i))
-            elif char in self.quote_pairs.values():  # 右引号
-                # 找到对应的左引号
-                left_quote = None
-                for left, right in self.quote_pairs.items():
-                    if right == char:
-                        left_quote = left
-                        break
-
-                if stack and stack[-1][0] == left_quote:
-                    stack.pop()  # 匹配成功
-                else:
-                    # 检查是否应该删除这个右引号
-                    if not any(pos for q, pos in stack if self.quote_pairs[q] == char):
-                        to_remove.add(i)
-
-        # 处理未匹配的左引号
-        while stack:
-            quote, pos = stack.pop()
-            # 在适当位置添加右引号
-            next_pos = pos + 1
-            while next_pos < len(chars) and chars[next_pos].isspace():
-                next_pos += 1
-            if next_pos < len(chars):
-                to_add[next_pos] = self.quote_pairs[quote]
-            else:
-                to_remove.add(pos)
-
-        # 应用修改
-        # 先处理要添加的引号（从后向前）
-        for pos in sorted(to_add.keys(), reverse=True):
-            chars.insert(pos, to_add[pos])
-
-        # 再处理要删除的引号（从后向前）
-        for pos in sorted(to_remove, reverse=True):
-            chars.pop(pos)
-
-        return ''.join(chars)
-
-if __name__ == "__main__":
-    # 使用示例
-    simulator = InputSimulator()
-    
-    # 基本输入示例
-    print("1. 基本输入示例")
-    simulator.type_string("Hello, World!", 0.1)
-    
-    # 随机间隔输入示例
-    print("\n2. 随机间隔输入示例")
-    simulator.type_string("Random Typing", (0.1, 0.3))
-    
-    # 组合键示例
-    print("\n3. 组合键示例")
-    simulator.simulate_hotkey('ctrl', 'c')
-    
-    # 持续输入示例
-    print("\n4. 持续输入示例（按ESC停止）")
-    simulator.start_continuous_input("Test ", (0.5, 1.0))
\ No newline at end of file
+        return match_quotes(text, self.quote_pairs)
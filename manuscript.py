@@ -0,0 +1,203 @@
+"""
+稿件文件输入源
+
+ManuscriptSource 把稿件文件映射到内存（mmap），按块增量解码并按窗口准备（见 text_stream），
+旁边的检查点文件记录已经送达的位置，因焦点切换、Esc 或程序崩溃中断后可以从停下的地方继续输入：
+
+    with ManuscriptSource('稿件.txt', encoding='gbk') as source:
+        simulator.type_string(source, interval=0.05)
+
+检查点记录当前窗口在文件中的字节/字符偏移、窗口原文的字节数和其中已送达的字符数。
+恢复时重新准备这个窗口（窗口的准备只取决于原文和规则，结果与中断前相同），跳过已送达的部分，
+再从窗口之后继续读取。
+
+送达进度只在内存中更新，每 sync_every 次更新才写入检查点文件并 fsync；
+中断（Esc、焦点切换、出错）和输入结束时立即写入。崩溃时最多重复输入最后 sync_every 次更新的内容。
+"""
+import codecs
+import hashlib
+import json
+import mmap
+import os
+from text_stream import READ_SIZE, WINDOW, StreamPreparer
+
+CHECKPOINT_SUFFIX = '.checkpoint'  # 默认检查点文件 = 稿件路径 + 后缀
+ENCODINGS = ('utf-8', 'gbk', 'gb2312')  # 界面中提供的编码
+
+
+class ManuscriptSource:
+    """带检查点的稿件文件输入源，直接交给 InputSimulator.type_string"""
+
+    def __init__(self, path: str, encoding: str = 'utf-8', checkpoint: str = None,
+                 resume: bool = True, sync_every: int = 32, read_size: int = READ_SIZE):
+        """
+        :param path: 稿件文件路径
+        :param encoding: 文件编码
+        :param checkpoint: 检查点文件路径，默认为稿件路径加 .checkpoint
+        :param resume: 是否从检查点继续，False 则从头开始（旧的检查点会被覆盖）
+        :param sync_every: 每多少次进度更新写入一次检查点
+        :param read_size: 每次解码的字节数
+        """
+        self.path = os.path.abspath(path)
+        self.encoding = codecs.lookup(encoding).name
+        self.checkpoint_path = checkpoint or self.path + CHECKPOINT_SUFFIX
+        self.sync_every = sync_every
+        self.read_size = read_size
+        self._file = open(self.path, 'rb')
+        stat = os.fstat(self._file.fileno())
+        self.size = stat.st_size
+        self._stamp = [self.size, stat.st_mtime_ns]
+        # 空文件不能映射
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        self.state = self._load() if resume else None  # 检查点内容，还没有开始输入时为None
+        self._skip = 0  # 当前产出的片段在窗口准备好的文本中的起点
+        self._pending = 0  # 尚未写入检查点文件的进度更新次数
+        self.syncs = 0  # 写入检查点文件的次数
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def done(self) -> bool:
+        """是否已经全部输入"""
+        return bool(self.state and self.state['done'])
+
+    @property
+    def typed(self) -> int:
+        """已经送达的字符数（格式化后）"""
+        if self.state is None:
+            return 0
+        return self.state['typed'] + self.state['skip']
+
+    @property
+    def position(self) -> tuple:
+        """已经送达的内容对应的原文位置 (字节偏移, 字符偏移)，按窗口计：当前窗口送达完毕之前为窗口起点"""
+        state = self.state
+        if state is None:
+            return 0, 0
+        if state['done']:
+            return self.size, state['char']
+        return state['byte'], state['char']
+
+    def _load(self):
+        """读取检查点文件，不存在时返回None"""
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        if state.get('path') != self.path or state.get('stamp') != self._stamp \
+                or state.get('encoding') != self.encoding:
+            raise ValueError(f'检查点 {self.checkpoint_path} 与稿件不一致（文件已修改或编码不同），'
+                             f'请删除检查点或从头开始')
+        return state
+
+    @staticmethod
+    def _fingerprint(rules: dict, quote_pairs: dict, formatting: bool) -> str:
+        """格式化设置的指纹：设置改变后窗口准备的结果不同，不能按检查点跳过"""
+        settings = json.dumps([rules, quote_pairs, formatting], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(settings.encode('utf-8')).hexdigest()
+
+    def windows(self, rules: dict = None, quote_pairs: dict = None, formatting: bool = True,
+                window: int = WINDOW):
+        """
+        从检查点（或文件开头）开始逐窗口准备稿件
+        每产出一个片段之前把检查点移到它所在的窗口，之后用 delivered 报告片段中已送达的字符数
+        :return: 准备好的文本片段的生成器
+        :raises ValueError: 检查点是用不同的格式化设置记录的
+        """
+        preparer = StreamPreparer(rules, quote_pairs, formatting, window)
+        fingerprint = self._fingerprint(preparer.rules, preparer.quote_pairs, formatting)
+        state = self.state
+        if state is None:
+            byte = char = typed = 0
+        elif state['fingerprint'] != fingerprint:
+            raise ValueError(f'检查点 {self.checkpoint_path} 是用不同的格式化设置记录的，请删除检查点或从头开始')
+        elif state['done']:
+            return
+        else:
+            # 重新准备中断时的窗口，跳过已送达的部分
+            byte, char, typed = state['byte'], state['char'], state['typed']
+            end = byte + state['length']
+            source = self._map[byte:end].decode(self.encoding)
+            text = preparer.prepare_window(source, state['lead'], state['trail'])
+            yield from self._emit(fingerprint, byte, char, typed, end - byte, source, state['lead'],
+                                  state['trail'], text, state['skip'])
+            byte, char, typed = end, char + len(source), typed + len(text)
+            preparer = StreamPreparer(rules, quote_pairs, formatting, window, started=byte > 0)
+
+        decoder = codecs.getincrementaldecoder(self.encoding)()
+        position = byte
+        while True:
+            block = self._map[position:position + self.read_size]
+            position += len(block)
+            final = position >= self.size
+            decoded = decoder.decode(block, final=final)
+            windows = preparer.feed_windows(decoded) if decoded else []
+            if final:
+                windows += preparer.finish_windows()
+            for w in windows:
+                length = len(w.source.encode(self.encoding))
+                yield from self._emit(fingerprint, byte, char, typed, length, w.source, w.lead,
+                                      w.trail, w.text, 0)
+                byte, char, typed = byte + length, char + len(w.source), typed + len(w.text)
+            if final:
+                break
+
+        self.state = {'path': self.path, 'stamp': self._stamp, 'encoding': self.encoding,
+                      'fingerprint': fingerprint, 'byte': byte, 'char': char, 'length': 0,
+                      'lead': byte > 0, 'trail': False, 'typed': typed, 'skip': 0, 'done': True}
+        self.sync()
+
+    def _emit(self, fingerprint: str, byte: int, char: int, typed: int, length: int, source: str,
+              lead: bool, trail: bool, text: str, skip: int):
+        """把检查点移到一个窗口，产出其中还未送达的部分"""
+        self.state = {'path': self.path, 'stamp': self._stamp, 'encoding': self.encoding,
+                      'fingerprint': fingerprint, 'byte': byte, 'char': char, 'length': length,
+                      'lead': lead, 'trail': trail, 'typed': typed, 'skip': skip, 'done': False}
+        self._skip = skip
+        if len(text) > skip:
+            yield text[skip:] if skip else text
+
+    def delivered(self, count: int):
+        """
+        报告最近产出的片段中已送达的字符数（热路径上只更新内存，每 sync_every 次写入一次）
+        :param count: 片段开头已送达的字符数
+        """
+        self.state['skip'] = self._skip + count
+        self._pending += 1
+        if self._pending >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        """把进度写入检查点文件并落盘（先写临时文件再替换，崩溃时不会留下写了一半的检查点）"""
+        if self.state is None:
+            return
+        temp = self.checkpoint_path + '.tmp'
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.checkpoint_path)
+        self._pending = 0
+        self.syncs += 1
+
+    def discard(self):
+        """删除检查点文件（下次从头开始）"""
+        self.state = None
+        self._pending = 0
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        """写入未保存的进度并关闭文件"""
+        if self._pending:
+            self.sync()
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
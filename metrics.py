@@ -0,0 +1,218 @@
+"""
+输入会话的指标
+
+InputSimulator.metrics 累计所有会话的计数、耗时和直方图，每次会话结束时另外保存这次会话的增量：
+- 计数：SendInput 请求/接受的事件数、部分接受的次数、批数、退格数、粘贴数、会话数
+- 耗时：准备文本（格式化、引号检查；流式输入含读取和解码）、编码、发送、等待
+- 直方图：每次输出达到的字符/秒（流式输入每个窗口一次），相邻两批之间的间隔
+
+读取方式：snapshot() 返回字典，last_session 是最近一次会话的增量，to_prometheus() 生成 Prometheus 文本格式。
+只在批次和会话的粒度上记录，逐字输入时每个字符也只是一批，开销远小于一次系统调用。
+"""
+import bisect
+import time
+
+# 每次输出达到的字符/秒
+RATE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000)
+# 相邻两批之间的间隔（秒）
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+
+# 计数与耗时：名称 -> (Prometheus 指标名, 说明)
+COUNTERS = {
+    'events_requested': ('events_requested_total', '请求 SendInput 发送的事件数'),
+    'events_accepted': ('events_accepted_total', 'SendInput 实际接受的事件数'),
+    'partial_sends': ('partial_sends_total', 'SendInput 只接受了部分事件的批数'),
+    'batches': ('batches_total', '发送的批数'),
+    'pastes': ('pastes_total', '粘贴次数'),
+    'chars': ('chars_total', '输出的字符数'),
+    'sessions': ('sessions_total', '输入会话数'),
+}
+TIMERS = {
+    'format_seconds': ('format_seconds_total', '准备文本的耗时（格式化、引号检查；流式输入含读取和解码）'),
+    'encode_seconds': ('encode_seconds_total', '编码 INPUT 事件的耗时'),
+    'send_seconds': ('send_seconds_total', '发送事件的耗时'),
+    'sleep_seconds': ('sleep_seconds_total', '等待（输入间隔、批间延迟）的耗时'),
+}
+
+
+class Histogram:
+    """累计直方图"""
+
+    def __init__(self, buckets: tuple):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一格为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def copy(self) -> 'Histogram':
+        other = Histogram(self.buckets)
+        other.counts = list(self.counts)
+        other.sum = self.sum
+        other.count = self.count
+        return other
+
+    def minus(self, earlier: 'Histogram') -> 'Histogram':
+        """与更早的副本之差"""
+        other = Histogram(self.buckets)
+        other.counts = [a - b for a, b in zip(self.counts, earlier.counts)]
+        other.sum = self.sum - earlier.sum
+        other.count = self.count - earlier.count
+        return other
+
+    def quantile(self, q: float) -> float:
+        """按桶估计分位数（返回所在桶的上界，超出所有桶时返回最后一个上界）"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def to_dict(self) -> dict:
+        return {
+            'buckets': {str(bound): count for bound, count in zip(self.buckets, self.counts)},
+            'inf': self.counts[-1],
+            'sum': self.sum,
+            'count': self.count,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+        }
+
+
+class Metrics:
+    """InputSimulator 的输入指标"""
+
+    def __init__(self, enabled: bool = True):
+        """
+        :param enabled: 是否记录，关闭后所有记录方法直接返回
+        """
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        """清零所有指标"""
+        for name in COUNTERS:
+            setattr(self, name, 0)
+        for name in TIMERS:
+            setattr(self, name, 0.0)
+        self.rate = Histogram(RATE_BUCKETS)
+        self.batch_interval = Histogram(LATENCY_BUCKETS)
+        self.last_session = None  # 最近一次会话的增量（snapshot 格式）
+        self._last_batch = None  # 上一批发送结束的时间
+        self._session_start = None
+
+    # ---------------------------------------------------------------- 记录
+
+    def begin_session(self):
+        """会话开始：记下当前的累计值"""
+        if not self.enabled:
+            return
+        self._session_start = (self._values(), self.rate.copy(), self.batch_interval.copy(),
+                               time.perf_counter())
+        self._last_batch = None
+
+    def end_session(self):
+        """会话结束：保存这次会话的增量"""
+        if not self.enabled or self._session_start is None:
+            return
+        self.sessions += 1
+        values, rate, interval, started = self._session_start
+        self._session_start = None
+        current = self._values()
+        session = {name: current[name] - values[name] for name in current}
+        session['elapsed'] = time.perf_counter() - started
+        session['chars_per_second'] = self.rate.minus(rate).to_dict()
+        session['batch_interval'] = self.batch_interval.minus(interval).to_dict()
+        self.last_session = session
+
+    def batch(self, requested: int, accepted: int, started: float, finished: float):
+        """
+        记录一批事件的发送
+        :param started: 开始发送的时间（perf_counter）
+        :param finished: 发送结束的时间
+        """
+        if not self.enabled:
+            return
+        self.batches += 1
+        self.events_requested += requested
+        self.events_accepted += accepted
+        if accepted < requested:
+            self.partial_sends += 1
+        self.send_seconds += finished - started
+        if self._last_batch is not None:
+            self.batch_interval.observe(started - self._last_batch)
+        self._last_batch = finished
+
+    def output(self, chars: int, seconds: float):
+        """记录一次输出（一段文本）达到的字符/秒"""
+        if not self.enabled:
+            return
+        self.chars += chars
+        if chars and seconds > 0:
+            self.rate.observe(chars / seconds)
+
+    def add(self, name: str, value=1):
+        """增加一个计数或耗时"""
+        if self.enabled:
+            setattr(self, name, getattr(self, name) + value)
+
+    def timed(self, iterable, name: str, trace=None):
+        """
+        逐项计时的迭代器：取出每一项的耗时计入 name
+        :param trace: 可选的回调 trace(名称, 开始, 结束)，每取出一项记录一个时间段
+        """
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                end = time.perf_counter()
+                self.add(name, end - start)
+                if trace is not None:
+                    trace('prepare_window', start, end)
+            yield item
+
+    # ---------------------------------------------------------------- 读取
+
+    def _values(self) -> dict:
+        return {name: getattr(self, name) for name in (*COUNTERS, *TIMERS)}
+
+    def snapshot(self) -> dict:
+        """所有会话的累计值"""
+        values = self._values()
+        values['chars_per_second'] = self.rate.to_dict()
+        values['batch_interval'] = self.batch_interval.to_dict()
+        return values
+
+    def to_prometheus(self, prefix: str = 'input_simulator') -> str:
+        """Prometheus 文本格式（0.0.4）"""
+        lines = []
+        for table in (COUNTERS, TIMERS):
+            for name, (metric, help_text) in table.items():
+                lines.append(f'# HELP {prefix}_{metric} {help_text}')
+                lines.append(f'# TYPE {prefix}_{metric} counter')
+                lines.append(f'{prefix}_{metric} {getattr(self, name)}')
+        for metric, help_text, histogram in (
+                ('chars_per_second', '每次输出达到的字符/秒', self.rate),
+                ('batch_interval_seconds', '相邻两批之间的间隔（秒）', self.batch_interval)):
+            lines.append(f'# HELP {prefix}_{metric} {help_text}')
+            lines.append(f'# TYPE {prefix}_{metric} histogram')
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{prefix}_{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_{metric}_bucket{{le="+Inf"}} {histogram.count}')
+            lines.append(f'{prefix}_{metric}_sum {histogram.sum}')
+            lines.append(f'{prefix}_{metric}_count {histogram.count}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,423 @@
+"""
+输出后端
+
+InputSimulator 的所有输出（SendInput、keybd_event、剪贴板、前台窗口查询）
+都通过这里的后端对象完成：
+- Win32Backend：真实的 Windows 输出
+- RecordingBackend：把事件流连同时间戳记录到紧凑数组中，
+  不需要显示器，可在 Linux 构建机上做吞吐/延迟测试和逐字节回放校验
+"""
+import ctypes
+import struct
+import time
+from array import array
+from focus_watcher import FocusWatcher, PollingFocusWatcher, Win32FocusWatcher
+from input_types import (
+    VK_BACK, VK_TAB, VK_RETURN, VK_CONTROL, VK_SPACE, VK_V, KEYEVENTF_KEYUP, KEYEVENTF_UNICODE,
+    KEYBDINPUT, INPUT_UNION, INPUT
+)
+
+# Windows 输出所需的模块在第一次创建 Win32Backend 时才导入（见 _load_win32），
+# 只使用 RecordingBackend 或只做文本处理时不承担这些导入的开销
+win32api = None
+win32gui = None
+win32clipboard = None
+keyboard = None
+_win32_loaded = False
+
+
+def _load_win32():
+    """导入 pywin32、keyboard，并设置 pyautogui 的安全选项（只执行一次）"""
+    global win32api, win32gui, win32clipboard, keyboard, _win32_loaded
+    if _win32_loaded:
+        return
+    _win32_loaded = True
+    try:
+        import win32api
+        import win32gui
+        import win32clipboard
+    except ImportError:  # 非Windows环境
+        pass
+    try:
+        import keyboard
+    except ImportError:
+        pass
+    try:
+        import pyautogui
+        pyautogui.FAILSAFE = True
+        pyautogui.PAUSE = 0.1
+    except Exception:  # 无图形界面的环境（如Linux构建机）无法导入pyautogui
+        pass
+
+
+CF_UNICODETEXT = 13
+CF_HDROP = 15
+# 以GDI句柄形式存放的剪贴板格式：句柄在剪贴板清空后失效，无法保存后恢复。
+# 位图由系统根据 CF_DIB 重新合成，因此只保存 CF_DIB 即可
+_HANDLE_FORMATS = frozenset([
+    2,  # CF_BITMAP
+    3,  # CF_METAFILEPICT
+    9,  # CF_PALETTE
+    14,  # CF_ENHMETAFILE
+])
+WM_NULL = 0x0000
+SMTO_ABORTIFHUNG = 0x0002
+
+# 虚拟键对应的文本，用于从事件流还原输入内容
+VK_TEXT = {
+    VK_RETURN: '\n',
+    VK_SPACE: ' ',
+    VK_TAB: '\t',
+}
+
+
+class OutputBackend:
+    """
+    输出后端基类
+    子类需要实现全部方法，InputSimulator 只通过这些方法产生输出
+    """
+    name = 'base'
+
+    def send_input(self, inputs, count: int) -> int:
+        """
+        发送 INPUT 数组
+        :param inputs: ctypes 的 INPUT 数组（或指向 INPUT 的指针）
+        :param count: 事件数量
+        :return: 实际被接受的事件数（与 SendInput 返回值含义相同）
+        """
+        raise NotImplementedError
+
+    def keybd_event(self, vk: int, flags: int = 0):
+        """发送单个虚拟键事件"""
+        raise NotImplementedError
+
+    def get_clipboard_text(self):
+        """读取剪贴板中的文本，没有文本时返回None"""
+        raise NotImplementedError
+
+    def set_clipboard_text(self, text: str):
+        """将文本写入剪贴板"""
+        raise NotImplementedError
+
+    def snapshot_clipboard(self) -> list:
+        """保存剪贴板的全部内容，返回 [(格式, 数据)]；默认实现只保存文本"""
+        text = self.get_clipboard_text()
+        return [] if text is None else [(CF_UNICODETEXT, text)]
+
+    def restore_clipboard(self, snapshot: list):
+        """恢复 snapshot_clipboard 保存的内容"""
+        for fmt, data in snapshot:
+            if fmt == CF_UNICODETEXT:
+                self.set_clipboard_text(data)
+
+    def wait_until_idle(self, timeout: float) -> bool:
+        """等待前台窗口处理完已发送的输入，超时返回False"""
+        return True
+
+    def foreground_window(self):
+        """获取当前前台窗口"""
+        raise NotImplementedError
+
+    def caret_pos(self):
+        """获取当前光标位置"""
+        raise NotImplementedError
+
+    def escape_pressed(self) -> bool:
+        """Esc 键当前是否被按下"""
+        raise NotImplementedError
+
+    def focus_watcher(self) -> FocusWatcher:
+        """创建前台窗口监视器；默认在检查时查询前台窗口"""
+        return PollingFocusWatcher(self)
+
+    def add_escape_hook(self, callback):
+        """
+        Esc 键按下时调用 callback（只调用一次）
+        :return: 钩子句柄，传给 remove_escape_hook；后端不支持钩子时返回None，调用方需轮询 escape_pressed
+        """
+        return None
+
+    def remove_escape_hook(self, handle):
+        """移除 add_escape_hook 安装的钩子"""
+
+
+class Win32Backend(OutputBackend):
+    """基于 SendInput / keybd_event / win32clipboard 的 Windows 输出后端"""
+    name = 'win32'
+
+    def __init__(self):
+        _load_win32()
+        self._cb_size = ctypes.c_int(ctypes.sizeof(INPUT))
+
+    def send_input(self, inputs, count: int) -> int:
+        return ctypes.windll.user32.SendInput(count, inputs, self._cb_size)
+
+    def keybd_event(self, vk: int, flags: int = 0):
+        win32api.keybd_event(vk, 0, flags, 0)
+
+    def get_clipboard_text(self):
+        win32clipboard.OpenClipboard()
+        try:
+            return win32clipboard.GetClipboardData(CF_UNICODETEXT)
+        except Exception:
+            return None
+        finally:
+            win32clipboard.CloseClipboard()
+
+    def set_clipboard_text(self, text: str):
+        win32clipboard.OpenClipboard()
+        try:
+            win32clipboard.EmptyClipboard()
+            win32clipboard.SetClipboardText(text)
+        finally:
+            win32clipboard.CloseClipboard()
+
+    def snapshot_clipboard(self) -> list:
+        snapshot = []
+        win32clipboard.OpenClipboard()
+        try:
+            fmt = win32clipboard.EnumClipboardFormats(0)
+            while fmt:
+                if fmt not in _HANDLE_FORMATS:
+                    try:
+                        snapshot.append((fmt, win32clipboard.GetClipboardData(fmt)))
+                    except Exception:  # 延迟渲染失败或无法读取的私有格式
+                        pass
+                fmt = win32clipboard.EnumClipboardFormats(fmt)
+        finally:
+            win32clipboard.CloseClipboard()
+        return snapshot
+
+    def restore_clipboard(self, snapshot: list):
+        win32clipboard.OpenClipboard()
+        try:
+            win32clipboard.EmptyClipboard()
+            for fmt, data in snapshot:
+                if fmt == CF_HDROP and isinstance(data, tuple):
+                    data = _pack_file_list(data)
+                try:
+                    win32clipboard.SetClipboardData(fmt, data)
+                except Exception:
+                    pass
+        finally:
+            win32clipboard.CloseClipboard()
+
+    def wait_until_idle(self, timeout: float) -> bool:
+        # 向前台窗口发送空消息：返回时说明目标线程已经处理到这条消息之前的输入
+        try:
+            win32gui.SendMessageTimeout(win32gui.GetForegroundWindow(), WM_NULL, 0, 0,
+                                        SMTO_ABORTIFHUNG, int(timeout * 1000))
+            return True
+        except Exception:
+            return False
+
+    def foreground_window(self):
+        return win32gui.GetForegroundWindow()
+
+    def caret_pos(self):
+        return win32gui.GetCaretPos()
+
+    def escape_pressed(self) -> bool:
+        return keyboard is not None and keyboard.is_pressed('esc')
+
+    def focus_watcher(self) -> FocusWatcher:
+        return Win32FocusWatcher()
+
+    def add_escape_hook(self, callback):
+        if keyboard is None:
+            return None
+        fired = []
+
+        def on_escape(event):
+            if not fired:
+                fired.append(True)
+                callback()
+        return keyboard.on_press_key('esc', on_escape)
+
+    def remove_escape_hook(self, handle):
+        if handle is not None:
+            keyboard.unhook(handle)
+
+
+def _pack_file_list(paths: tuple) -> bytes:
+    """把文件路径列表打包成 CF_HDROP 所需的 DROPFILES 结构（宽字符）"""
+    header = struct.pack('<IiiII', 20, 0, 0, 0, 1)
+    return header + ''.join(path + '\0' for path in paths).encode('utf-16-le') + b'\0\0'
+
+
+class RecordingBackend(OutputBackend):
+    """
+    记录型输出后端
+    每个事件记录为 (时间戳ns, wVk, wScan, dwFlags)，分别存放在四个 array 中，
+    百万级事件也只占用十几MB内存。前台窗口、Esc 状态都可以由调用方脚本化设置。
+    """
+    name = 'recording'
+
+    def __init__(self, clock=time.perf_counter_ns, foreground=1):
+        self.clock = clock
+        self._watchers = []
+        self._escape_hooks = []
+        self._escape = False
+        self._foreground = foreground
+        self.focus_script = []  # [(事件数, 窗口)]：记录的事件数达到时切换前台窗口
+        self.caret = (0, 0)
+        self.clipboard = None  # 剪贴板文本
+        self.clipboard_data = {}  # 剪贴板中文本以外的格式 {格式: 数据}
+        self.calls = 0  # send_input/keybd_event 的调用次数
+        self.max_accept = None  # 每次 send_input 最多接受的事件数，用于模拟繁忙的目标；None表示全部接受
+        self.clear()
+
+    def clear(self):
+        """清空已记录的事件"""
+        self.timestamps = array('q')
+        self.vks = array('H')
+        self.scans = array('H')
+        self.flags = array('I')
+        self.pastes = []  # 每次 Ctrl+V 时剪贴板中的文本
+        self._ctrl = False
+
+    def __len__(self):
+        return len(self.vks)
+
+    @property
+    def foreground(self):
+        """模拟的前台窗口句柄，修改即可模拟窗口切换（会通知所有监视器）"""
+        return self._foreground
+
+    @foreground.setter
+    def foreground(self, window):
+        self._foreground = window
+        for watcher in self._watchers:
+            watcher.notify(window)
+
+    @property
+    def escape(self) -> bool:
+        """模拟的Esc键状态，设为True时触发已安装的钩子"""
+        return self._escape
+
+    @escape.setter
+    def escape(self, pressed: bool):
+        self._escape = pressed
+        if pressed:
+            hooks, self._escape_hooks = self._escape_hooks, []
+            for callback in hooks:
+                callback()
+
+    def _run_focus_script(self):
+        while self.focus_script and len(self.vks) >= self.focus_script[0][0]:
+            self.foreground = self.focus_script.pop(0)[1]
+
+    def send_input(self, inputs, count: int) -> int:
+        self.calls += 1
+        if self.max_accept is not None:
+            count = min(count, self.max_accept)
+        if count <= 0:
+            return 0
+        size = ctypes.sizeof(INPUT)
+        raw = memoryview(ctypes.string_at(ctypes.cast(inputs, ctypes.c_void_p).value, size * count))
+        base = INPUT.union.offset + INPUT_UNION.ki.offset
+        words = raw.cast('H')
+        dwords = raw.cast('I')
+        # 按结构体步长切片，一次性取出所有事件的字段
+        self.vks.frombytes(words[(base + KEYBDINPUT.wVk.offset) // 2::size // 2].tobytes())
+        self.scans.frombytes(words[(base + KEYBDINPUT.wScan.offset) // 2::size // 2].tobytes())
+        self.flags.frombytes(dwords[(base + KEYBDINPUT.dwFlags.offset) // 4::size // 4].tobytes())
+        self.timestamps.extend(array('q', [self.clock()]) * count)
+        self._run_focus_script()
+        return count
+
+    def keybd_event(self, vk: int, flags: int = 0):
+        self.calls += 1
+        if vk == VK_CONTROL:
+            self._ctrl = not flags & KEYEVENTF_KEYUP
+        elif vk == VK_V and self._ctrl and not flags & KEYEVENTF_KEYUP:
+            self.pastes.append(self.clipboard)
+        self.timestamps.append(self.clock())
+        self.vks.append(vk)
+        self.scans.append(0)
+        self.flags.append(flags)
+        self._run_focus_script()
+
+    def get_clipboard_text(self):
+        return self.clipboard
+
+    def set_clipboard_text(self, text: str):
+        self.clipboard = text
+        self.clipboard_data = {}
+
+    def snapshot_clipboard(self) -> list:
+        snapshot = list(self.clipboard_data.items())
+        if self.clipboard is not None:
+            snapshot.insert(0, (CF_UNICODETEXT, self.clipboard))
+        return snapshot
+
+    def restore_clipboard(self, snapshot: list):
+        self.clipboard = None
+        self.clipboard_data = {}
+        for fmt, data in snapshot:
+            if fmt == CF_UNICODETEXT:
+                self.clipboard = data
+            else:
+                self.clipboard_data[fmt] = data
+
+    def foreground_window(self):
+        return self.foreground
+
+    def caret_pos(self):
+        return self.caret
+
+    def escape_pressed(self) -> bool:
+        return self._escape
+
+    def focus_watcher(self) -> FocusWatcher:
+        watcher = FocusWatcher()
+        self._watchers.append(watcher)
+        return watcher
+
+    def add_escape_hook(self, callback):
+        self._escape_hooks.append(callback)
+        return callback
+
+    def remove_escape_hook(self, handle):
+        if handle in self._escape_hooks:
+            self._escape_hooks.remove(handle)
+
+    def events(self):
+        """按顺序返回 (时间戳ns, wVk, wScan, dwFlags) 元组"""
+        return zip(self.timestamps, self.vks, self.scans, self.flags)
+
+    def event_bytes(self) -> bytes:
+        """不含时间戳的事件流字节串，用于逐字节比较两次输入是否一致"""
+        return self.vks.tobytes() + self.scans.tobytes() + self.flags.tobytes()
+
+    def typed_text(self) -> str:
+        """
+        根据记录的按下事件还原目标窗口中应当出现的文本
+        支持Unicode事件、回车/空格/Tab、退格以及Ctrl+V粘贴
+        """
+        units = []  # UTF-16 码元
+        ctrl_down = False
+        pastes = iter(self.pastes)
+        for vk, scan, flags in zip(self.vks, self.scans, self.flags):
+            if flags & KEYEVENTF_UNICODE:
+                if not flags & KEYEVENTF_KEYUP:
+                    units.append(scan)
+                continue
+            up = bool(flags & KEYEVENTF_KEYUP)
+            if vk == VK_CONTROL:
+                ctrl_down = not up
+            elif up:
+                continue
+            elif vk in VK_TEXT:
+                units.append(ord(VK_TEXT[vk]))
+            elif vk == VK_BACK and units:
+                # 退格删除一个字符（代理对需要删除两个码元）
+                last = units.pop()
+                if 0xDC00 <= last <= 0xDFFF and units and 0xD800 <= units[-1] <= 0xDBFF:
+                    units.pop()
+            elif vk == VK_V and ctrl_down:
+                # 优先使用粘贴当时的剪贴板内容（由 keybd_event 记录），否则使用当前内容
+                pasted = next(pastes, self.clipboard)
+                if pasted:
+                    units.extend(array('H', pasted.encode('utf-16-le')))
+        return array('H', units).tobytes().decode('utf-16-le', errors='surrogatepass')
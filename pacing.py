@@ -0,0 +1,234 @@
+"""
+快速模式的自适应节奏控制
+
+AdaptivePacer 根据目标窗口的实际接收情况调整每批事件数和批间延迟：
+- SendInput 只接受了部分事件：批量降为实际接受的数量，并以此为上限；
+  回读校验失败或一个事件都未被接受：批量减半，并把失败时的批量记为上限；两种情况延迟都加倍
+- 连续成功：先缩短延迟，延迟降到下限后再逐步增大批量，但不超过上限
+- 在上限附近连续成功 probe_after 次后撤销上限，重新试探更高的速率
+每一次调整都记录在 decisions 中，可在输入结束后查看控制器的决策过程。
+
+DeadlineScheduler 用于逐字输入模式，按绝对截止时间等待，长时间输入不会累积漂移。
+"""
+import time
+from array import array
+from collections import deque, namedtuple
+
+# 单次决策记录
+PacingDecision = namedtuple('PacingDecision', [
+    'batch_size',  # 本批计划发送的事件数
+    'delay',  # 本批之后的延迟（秒）
+    'sent',  # 实际提交的事件数
+    'accepted',  # 目标接受的事件数
+    'verified',  # 回读校验结果，未校验时为None
+    'action',  # grow/faster/hold/backoff/probe
+    'next_batch_size',
+    'next_delay'
+])
+
+
+class AdaptivePacer:
+    """加性增、乘性减（AIMD）的批量与延迟控制器"""
+
+    def __init__(self, batch_size: int = 50, delay: float = 0.001,
+                 min_batch: int = 2, max_batch: int = 2000,
+                 min_delay: float = 0.0, max_delay: float = 0.05,
+                 step: int = 16, probe_after: int = 32, history: int = 1000):
+        """
+        :param batch_size: 初始批量（事件数）
+        :param delay: 初始批间延迟（秒）
+        :param min_batch: 批量下限
+        :param max_batch: 批量上限
+        :param min_delay: 延迟下限（秒）
+        :param max_delay: 延迟上限（秒）
+        :param step: 每次成功后批量的增加量
+        :param probe_after: 在已知上限处连续成功多少批后重新试探
+        :param history: 最多保留的决策记录数
+        """
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.step = step
+        self.probe_after = probe_after
+        self.batch_size = min(max(batch_size, min_batch), max_batch)
+        self.delay = min(max(delay, min_delay), max_delay)
+        self.ceiling = None  # 最近一次失败时的批量，增长不会超过它
+        self.streak = 0  # 连续成功的批数
+        self.decisions = deque(maxlen=history)
+        self.batches = 0
+        self.events = 0
+        self.partial = 0  # 部分接受的批数
+        self.verify_failures = 0
+
+    def record(self, sent: int, accepted: int, verified: bool = None) -> PacingDecision:
+        """
+        记录一批的发送结果并调整下一批的批量和延迟
+        :param sent: 提交的事件数
+        :param accepted: SendInput 返回的接受数
+        :param verified: 回读校验结果，None表示未校验
+        :return: 本次决策
+        """
+        batch_size, delay = self.batch_size, self.delay
+        self.batches += 1
+        self.events += accepted
+
+        if accepted < sent or verified is False:
+            if accepted < sent:
+                self.partial += 1
+            if verified is False:
+                self.verify_failures += 1
+            action = 'backoff'
+            self.streak = 0
+            if 0 < accepted < sent and verified is not False:
+                # 目标明确告诉了它能接受多少：以此为新的批量上限
+                self.ceiling = accepted + 1
+                self.batch_size = max(self.min_batch, accepted)
+            else:
+                self.ceiling = batch_size
+                self.batch_size = max(self.min_batch, batch_size // 2)
+            self.delay = min(self.max_delay, max(delay * 2, 0.001))
+        elif sent < batch_size:
+            # 文本末尾的不满批，不能说明目标能接受更大的批量
+            action = 'hold'
+        else:
+            self.streak += 1
+            if self.delay > self.min_delay:
+                action = 'faster'
+                faster = delay / 2
+                # 小于0.1毫秒的sleep在多数系统上没有意义
+                self.delay = max(self.min_delay, faster if faster >= 0.0001 else 0.0)
+            elif self.ceiling is not None and batch_size + self.step >= self.ceiling:
+                if self.streak >= self.probe_after:
+                    action = 'probe'
+                    self.ceiling = None
+                    self.streak = 0
+                else:
+                    action = 'hold'
+                    self.batch_size = max(batch_size, min(self.ceiling - 1, self.max_batch))
+            else:
+                action = 'grow'
+                self.batch_size = min(self.max_batch, batch_size + self.step)
+
+        decision = PacingDecision(batch_size, delay, sent, accepted, verified,
+                                  action, self.batch_size, self.delay)
+        self.decisions.append(decision)
+        return decision
+
+    def reset(self, batch_size: int = 50, delay: float = 0.001):
+        """放弃已学到的节奏（例如目标窗口改变时）"""
+        self.batch_size = min(max(batch_size, self.min_batch), self.max_batch)
+        self.delay = min(max(delay, self.min_delay), self.max_delay)
+        self.ceiling = None
+        self.streak = 0
+
+    def summary(self) -> dict:
+        """控制器当前状态与累计统计"""
+        return {
+            'batch_size': self.batch_size,
+            'delay': self.delay,
+            'ceiling': self.ceiling,
+            'batches': self.batches,
+            'events': self.events,
+            'partial': self.partial,
+            'verify_failures': self.verify_failures
+        }
+
+
+class DeadlineScheduler:
+    """
+    按绝对截止时间控制输入节奏
+    每个字符的截止时间 = 上一个截止时间 + 间隔，而不是"发送完再sleep间隔"，
+    发送本身的耗时和sleep的误差不会逐字累积；等待时先sleep到截止时间前spin_ms，再忙等到截止时间。
+    """
+
+    def __init__(self, spin_ms: float = 2.0, max_lag: float = 0.5,
+                 clock=time.perf_counter_ns, sleep=time.sleep):
+        """
+        :param spin_ms: 忙等的时间预算（毫秒），越大越准确，CPU占用也越高
+        :param max_lag: 落后计划超过这么多秒时（例如被窗口切换暂停）重新以当前时间为基准，不追赶
+        :param clock: 纳秒时钟
+        :param sleep: 秒为单位的sleep函数；返回真值时视为等待被打断（例如输入被取消），不再忙等
+        """
+        self.spin_ns = int(spin_ms * 1_000_000)
+        self.max_lag_ns = int(max_lag * 1_000_000_000)
+        self.clock = clock
+        self.sleep = sleep
+        self.errors = array('q')  # 每次等待的实际时刻减截止时间（纳秒）
+        self.started = None
+        self.deadline = None
+        self.finished = None  # 最近一次等待结束的时刻
+        self.scheduled_ns = 0  # 计划的总间隔
+        self.skipped_ns = 0  # 重新定基准时放弃追赶的时间
+        self.rebased = 0  # 因落后过多而重新定基准的次数
+
+    def start(self):
+        """开始一个会话（第一次 wait 时也会自动开始）"""
+        self.started = self.deadline = self.finished = self.clock()
+
+    def advance(self, delay: float) -> int:
+        """
+        把截止时间推进delay秒（不等待），异步输入由事件循环的定时器完成等待
+        :param delay: 距离上一个截止时间的间隔（秒）
+        :return: 距离新截止时间的纳秒数；delay不大于0时返回None
+        """
+        if self.deadline is None:
+            self.start()
+        step = int(delay * 1_000_000_000)
+        if step <= 0:
+            return None
+        now = self.clock()
+        if now - self.deadline > self.max_lag_ns:
+            self.skipped_ns += now - self.deadline
+            self.deadline = now
+            self.rebased += 1
+        self.deadline += step
+        self.scheduled_ns += step
+        return self.deadline - now
+
+    def arrive(self, now: int = None):
+        """记录到达截止时间的时刻（纳秒，默认为当前时刻）"""
+        if now is None:
+            now = self.clock()
+        self.finished = now
+        self.errors.append(now - self.deadline)
+
+    def wait(self, delay: float) -> bool:
+        """
+        等待到下一个截止时间
+        :param delay: 距离上一个截止时间的间隔（秒）
+        :return: 是否等到了截止时间（sleep被打断时返回False）
+        """
+        remaining = self.advance(delay)
+        if remaining is None:
+            return True
+        if remaining > self.spin_ns:
+            if self.sleep((remaining - self.spin_ns) / 1_000_000_000):
+                return False
+        now = self.clock()
+        while now < self.deadline:
+            now = self.clock()
+        self.arrive(now)
+        return True
+
+    def percentile(self, p: float) -> float:
+        """等待误差的百分位（毫秒）"""
+        if not self.errors:
+            return 0.0
+        ordered = sorted(self.errors)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] / 1_000_000
+
+    def summary(self) -> dict:
+        """会话统计：等待次数、误差百分位（毫秒）、实际耗时与计划耗时的相对偏差"""
+        elapsed = (self.finished - self.started - self.skipped_ns) if self.started is not None else 0
+        return {
+            'waits': len(self.errors),
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'max_ms': max(self.errors) / 1_000_000 if self.errors else 0.0,
+            'scheduled_s': self.scheduled_ns / 1_000_000_000,
+            'elapsed_s': elapsed / 1_000_000_000,
+            'rate_error': (elapsed - self.scheduled_ns) / self.scheduled_ns if self.scheduled_ns else 0.0,
+            'rebased': self.rebased
+        }
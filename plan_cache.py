@@ -0,0 +1,104 @@
+"""
+准备结果缓存
+
+持续输入每一遍都对同一段文本调用 type_string，格式化、引号检查和 INPUT 编码的结果每次都相同。
+PlanCache 以内容哈希加上生效的选项（格式化规则、引号配对、输出方式、分段大小）为键，
+保存准备好的文本、去掉的不匹配引号位置，以及快速模式下各段编码好的事件缓冲区，
+第二遍起可以直接从缓存中的事件开始发送。
+
+缓存按最近最少使用的顺序淘汰，总大小不超过 max_bytes；超过上限的单个条目不缓存。
+"""
+import hashlib
+import sys
+from collections import OrderedDict
+
+from input_encoder import INPUT_SIZE
+
+
+def content_key(text: str) -> tuple:
+    """文本内容的键：(长度, 128位哈希)"""
+    digest = hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+    return len(text), digest
+
+
+class PreparedPlan:
+    """一段文本的准备结果"""
+
+    __slots__ = ('text', 'deleted', 'events', 'nbytes')
+
+    def __init__(self, text: str, deleted: list, encode: bool = False):
+        """
+        :param text: 准备好的文本
+        :param deleted: 去掉的不匹配引号在格式化后文本中的位置
+        :param encode: 是否缓存编码好的事件（快速模式），各段的事件在第一次发送时依次保存
+        """
+        self.text = text
+        self.deleted = tuple(deleted)
+        self.events = [] if encode else None  # 各段的事件缓冲区（InputEncoder.snapshot）
+        self.nbytes = sys.getsizeof(text) + 8 * len(self.deleted)
+        if encode:
+            # 每个UTF-16码元一对事件，全部保存后的大小在此时就能确定
+            units = len(text.encode('utf-16-le', 'surrogatepass')) // 2
+            self.nbytes += units * 2 * INPUT_SIZE
+
+
+class PlanCache:
+    """按内存上限淘汰的准备结果 LRU 缓存"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        """
+        :param max_bytes: 所有条目的总大小上限（字节）
+        """
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """查找条目，命中时移到最近使用的一端；未命中返回None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry: PreparedPlan) -> bool:
+        """
+        加入条目，必要时淘汰最久未使用的条目
+        :return: 是否已缓存（条目本身超过上限时不缓存）
+        """
+        if entry.nbytes > self.max_bytes:
+            return False
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.nbytes -= old.nbytes
+        while self._entries and self.nbytes + entry.nbytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+            self.evictions += 1
+        self._entries[key] = entry
+        self.nbytes += entry.nbytes
+        return True
+
+    def clear(self):
+        """清空缓存（计数保留）"""
+        self._entries.clear()
+        self.nbytes = 0
+
+    def info(self) -> dict:
+        """命中/未命中/淘汰次数、条目数和占用大小"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self.nbytes,
+            'max_bytes': self.max_bytes,
+        }
@@ -0,0 +1,168 @@
+"""
+引号配对引擎
+
+_check_quote_pairs 与 _match_quotes 的线性时间实现：
+- 只对引号字符做处理，其余字符由正则在C层跳过
+- 右引号到左引号的映射预先建好索引
+- 所有插入和删除在一次重建中完成
+结果与原有实现逐字一致（包括其中的边界行为）。
+"""
+import re
+from functools import lru_cache
+
+_NON_SPACE = re.compile(r'\S')
+
+
+class QuoteIndex:
+    """由引号配对字典预先计算出的查找表"""
+
+    def __init__(self, items: tuple):
+        self.pairs = dict(items)
+        self.openers = frozenset(self.pairs)
+        # 右引号 -> 左引号；与原实现一样，取字典中第一个匹配的左引号
+        self.closer_to_opener = {}
+        for left, right in items:
+            self.closer_to_opener.setdefault(right, left)
+        chars = set(self.pairs) | set(self.pairs.values())
+        self.chars = frozenset(chars)
+        self.pattern = re.compile('[' + ''.join(re.escape(c) for c in sorted(chars)) + ']')
+
+    def events(self, text: str):
+        """依次产生文本中所有引号的 (位置, 字符)"""
+        return ((m.start(), m.group()) for m in self.pattern.finditer(text))
+
+    def last_openers(self, text: str) -> dict:
+        """每种左引号在文本中最后一次出现的位置（未出现的不包含在内）"""
+        last_seen = {}
+        for opener in self.openers:
+            pos = text.rfind(opener)
+            if pos >= 0:
+                last_seen[opener] = pos
+        return last_seen
+
+
+@lru_cache(maxsize=16)
+def _build_index(items: tuple) -> QuoteIndex:
+    return QuoteIndex(items)
+
+
+def get_quote_index(quote_pairs: dict) -> QuoteIndex:
+    """获取（并缓存）引号配对字典对应的索引"""
+    return _build_index(tuple(quote_pairs.items()))
+
+
+def unmatched_quote_positions(events, index: QuoteIndex, last_seen: dict = None) -> list:
+    """
+    根据引号事件序列找出需要删除的引号位置
+    :param events: 按位置排序的 (位置, 字符) 序列，只需包含引号字符
+    :param index: 引号索引
+    :param last_seen: 每种左引号最后一次出现的位置；为None时从events中统计（events需可重复遍历）
+    :return: 需要删除的引号位置列表（升序）
+    """
+    openers = index.openers
+    closer_to_opener = index.closer_to_opener
+
+    # 每种左引号最后一次出现的位置，用于 O(1) 判断"后面是否还有对应的左引号"
+    if last_seen is None:
+        last_seen = {}
+        for pos, char in events:
+            last_seen[char] = pos
+
+    stack = []
+    delete_positions = []
+    for pos, char in events:
+        if char in openers:  # 左引号
+            stack.append((char, pos))
+        elif char in closer_to_opener:  # 右引号
+            left_quote = closer_to_opener[char]
+            if stack and stack[-1][0] == left_quote:
+                stack.pop()  # 匹配成功
+            elif left_quote in last_seen and last_seen[left_quote] <= pos:
+                # 后面没有对应的左引号，删除当前右引号
+                delete_positions.append(pos)
+
+    # 未匹配的左引号
+    delete_positions.extend(pos for _, pos in stack)
+    delete_positions.sort()
+    return delete_positions
+
+
+def find_unmatched_quotes(text: str, quote_pairs: dict) -> list:
+    """
+    检查文本中的引号配对情况
+    :param text: 要检查的文本
+    :param quote_pairs: 引号配对字典 {左引号: 右引号}
+    :return: 需要删除的引号位置列表
+    """
+    index = get_quote_index(quote_pairs)
+    return unmatched_quote_positions(index.events(text), index, index.last_openers(text))
+
+
+def match_quotes(text: str, quote_pairs: dict) -> str:
+    """
+    智能匹配引号：删除多余的右引号，为未闭合的左引号补上右引号
+    :param text: 要处理的文本
+    :param quote_pairs: 引号配对字典 {左引号: 右引号}
+    :return: 处理后的文本
+    """
+    if not text:
+        return text
+
+    index = get_quote_index(quote_pairs)
+    pairs = index.pairs
+    openers = index.openers
+    closer_to_opener = index.closer_to_opener
+
+    stack = []  # 待匹配的左引号
+    # 栈中每种右引号对应的左引号数量（只统计位置不为0的项，与原实现的判断保持一致）
+    pending = {}
+    to_remove = set()
+    to_add = {}  # {位置: 引号}
+
+    for pos, char in index.events(text):
+        if char in openers:  # 左引号
+            stack.append((char, pos))
+            if pos:
+                closer = pairs[char]
+                pending[closer] = pending.get(closer, 0) + 1
+        elif char in closer_to_opener:  # 右引号
+            if stack and stack[-1][0] == closer_to_opener[char]:
+                quote, top = stack.pop()  # 匹配成功
+                if top:
+                    pending[pairs[quote]] -= 1
+            elif not pending.get(char):
+                to_remove.add(pos)
+
+    # 处理未匹配的左引号（从栈顶开始，与原实现的覆盖顺序一致）
+    length = len(text)
+    for quote, pos in reversed(stack):
+        match = _NON_SPACE.search(text, pos + 1)
+        if match:
+            to_add[match.start()] = pairs[quote]
+        else:
+            to_remove.add(pos)
+
+    if not to_add and not to_remove:
+        return text
+
+    # 一次重建：先插入右引号，再按插入后的下标删除
+    if to_add:
+        pieces = []
+        last = 0
+        for pos in sorted(to_add):
+            pieces.append(text[last:pos])
+            pieces.append(to_add[pos])
+            last = pos
+        pieces.append(text[last:length])
+        text = ''.join(pieces)
+
+    if to_remove:
+        pieces = []
+        last = 0
+        for pos in sorted(to_remove):
+            pieces.append(text[last:pos])
+            last = pos + 1
+        pieces.append(text[last:])
+        text = ''.join(pieces)
+
+    return text
@@ -1 +0,0 @@
-9- 
\ No newline at end of file
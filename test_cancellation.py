@@ -0,0 +1,111 @@
+"""
+输入取消测试
+
+在发送到一半时调用 stop() 或按下 Esc（RecordingBackend.escape）：输入应当在下一批事件之前停止，
+进行中的等待被立即打断，已送达的文本是准备好的文本的前缀，停止延迟被记录下来。
+"""
+import threading
+import time
+
+import pytest
+
+from input_simulator import InputSimulator
+from output_backends import RecordingBackend
+from pacing import AdaptivePacer
+
+BATCH = 40  # 快速模式固定的批量（事件数）
+TEXT = '中文输入测试' * 50  # 没有虚拟键和代理对：每个字符一对按下/抬起事件
+
+
+class StoppingBackend(RecordingBackend):
+    """记录的事件数达到 stop_at 时调用 on_stop（模拟用户在输入过程中停止）"""
+
+    def __init__(self, stop_at: int):
+        super().__init__()
+        self.stop_at = stop_at
+        self.on_stop = None
+
+    def _check_stop(self):
+        if self.on_stop is not None and len(self) >= self.stop_at:
+            on_stop, self.on_stop = self.on_stop, None
+            on_stop()
+
+    def send_input(self, inputs, count: int) -> int:
+        accepted = super().send_input(inputs, count)
+        self._check_stop()
+        return accepted
+
+    def keybd_event(self, vk: int, flags: int = 0):
+        super().keybd_event(vk, flags)
+        self._check_stop()
+
+
+def make_simulator(stop_at: int, how: str) -> InputSimulator:
+    backend = StoppingBackend(stop_at)
+    simulator = InputSimulator(backend)
+    simulator.pacer = AdaptivePacer(batch_size=BATCH, delay=0, min_batch=BATCH, max_batch=BATCH,
+                                    min_delay=0)
+    if how == 'esc':
+        backend.on_stop = lambda: setattr(backend, 'escape', True)
+    else:
+        backend.on_stop = simulator.stop
+    return simulator
+
+
+@pytest.mark.parametrize('how', ['stop', 'esc'])
+def test_fast_mode_stops_within_one_batch(how):
+    stop_at = 100  # 第三批的中间
+    simulator = make_simulator(stop_at, how)
+    simulator.type_string(TEXT, 0, fast_mode=True)
+    backend = simulator.backend
+    assert stop_at <= len(backend) < stop_at + BATCH
+    typed = backend.typed_text()
+    assert typed == TEXT[:len(typed)] and len(typed) < len(TEXT)
+    assert simulator.sent == len(typed)
+    assert simulator.token.reason == how
+    assert len(simulator.stop_latencies) == 1
+    assert simulator.idle
+
+
+@pytest.mark.parametrize('how', ['stop', 'esc'])
+def test_char_mode_stops_at_next_character(how):
+    simulator = make_simulator(10, how)  # 第5个字符发送后停止
+    simulator.type_string(TEXT, 0)
+    assert simulator.backend.typed_text() == TEXT[:5]
+    assert simulator.sent == 5
+
+
+def test_paste_mode_stops_before_next_chunk():
+    simulator = make_simulator(4, 'stop')  # 第一次 Ctrl+V（4个按键事件）之后停止
+    simulator.paste_chunk_size = 10
+    simulator.type_string(TEXT, 0, paste_mode=True)
+    assert simulator.backend.typed_text() == TEXT[:10]
+
+
+def test_stop_interrupts_long_wait():
+    simulator = InputSimulator(RecordingBackend())
+    timer = threading.Timer(0.05, simulator.stop)
+    started = time.perf_counter()
+    timer.start()
+    try:
+        simulator.type_string(TEXT, 1.0)  # 每个字符之后等待1秒
+    finally:
+        timer.cancel()
+    assert time.perf_counter() - started < 0.5
+    assert simulator.backend.typed_text() == TEXT[:1]
+    assert simulator.stop_latencies[-1] < 100  # 毫秒
+
+
+def test_stop_waits_for_send_loop():
+    simulator = InputSimulator(RecordingBackend())
+    thread = threading.Thread(target=simulator.type_string, args=(TEXT, 0.01))
+    thread.start()
+    try:
+        while simulator.idle:  # 等待会话开始
+            time.sleep(0.001)
+        assert simulator.stop(wait=1.0)
+        assert simulator.idle
+    finally:
+        thread.join(5)
+    assert not thread.is_alive()
+    assert simulator.stop()  # 没有会话在进行时立即返回
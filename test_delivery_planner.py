@@ -0,0 +1,96 @@
+"""
+输出方式规划测试
+
+plan_delivery 选出的方式应当是代价模型下总耗时最低的一种（与穷举所有组合的结果比较）；
+按规划输出时，RecordingBackend 上还原的文本与 prepare_text 相同，各段确实按规划的方式发送。
+"""
+import copy
+import itertools
+
+import pytest
+
+from delivery_planner import METHODS, PASTE, UNICODE, VK, CostModel, _runs, _units, plan_delivery
+from input_simulator import InputSimulator
+from output_backends import RecordingBackend
+from text_core import FORMAT_RULES, QUOTE_PAIRS, prepare_text
+
+TEXTS = [
+    '短文本',
+    '第一行\n\n第二行  tab\t结束',
+    '表情 😀 与扩展区汉字 𠀀\n' + '长段落' * 400 + '\n\n结尾',
+    '\n\n  ',
+]
+
+
+def model_with(**params) -> CostModel:
+    model = CostModel(paste_chunk_size=1000)
+    model.params.update(params)
+    return model
+
+
+MODELS = {
+    'default': model_with(),
+    'slow_paste': model_with(paste=(0.5, 0.0001)),
+    'cheap_paste': model_with(paste=(0.0, 0.0)),
+    'slow_vk': model_with(vk=(0.01, 0.01)),
+    'slow_unicode_calls': model_with(unicode=(0.2, 0.00002)),
+}
+
+
+def brute_force(text: str, model: CostModel) -> float:
+    """穷举每段的方式，返回最低总耗时（相邻同方式的段并入同一次调用）"""
+    runs = _runs(text)
+    choices = [METHODS if is_space else (UNICODE, PASTE) for _, _, is_space in runs]
+    best = float('inf')
+    for methods in itertools.product(*choices):
+        total = 0.0
+        for index, (method, (start, end, _)) in enumerate(zip(methods, runs)):
+            size = end - start if method == PASTE else _units(text, start, end) * 2
+            total += model.cost(method, size, new_call=index == 0 or methods[index - 1] != method)
+        best = min(best, total)
+    return best
+
+
+@pytest.mark.parametrize('model', MODELS.values(), ids=list(MODELS))
+@pytest.mark.parametrize('text', TEXTS, ids=['short', 'lines', 'long', 'blank'])
+def test_plan_is_cheapest_under_model(text, model):
+    plan = plan_delivery(text, model)
+    assert plan.seconds == pytest.approx(brute_force(text, model))
+    # 各段首尾相接、覆盖全文，vk 只用于空白段
+    assert [s.start for s in plan] == [0] + [s.end for s in plan][:-1]
+    assert plan.segments[-1].end == len(text)
+    assert all(not text[s.start:s.end].strip() for s in plan if s.method == VK)
+
+
+def test_plan_follows_the_model():
+    text = TEXTS[1]
+    assert {s.method for s in plan_delivery(text, MODELS['cheap_paste'])} == {PASTE}
+    assert PASTE not in {s.method for s in plan_delivery(text, MODELS['slow_paste'])}
+    assert VK not in {s.method for s in plan_delivery(text, MODELS['slow_vk'])}
+
+
+def test_model_learns_from_observations():
+    model = CostModel(decay=1.0)
+    for units in (10, 100, 1000):
+        model.observe(UNICODE, units, 0.002 + units * 0.0001)
+    per_call, per_unit = model.params[UNICODE]
+    assert per_call == pytest.approx(0.002) and per_unit == pytest.approx(0.0001)
+
+
+@pytest.mark.parametrize('model', ['default', 'cheap_paste', 'slow_paste'])
+@pytest.mark.parametrize('text', TEXTS[:3], ids=['short', 'lines', 'long'])
+def test_planned_output_follows_plan(text, model):
+    simulator = InputSimulator(RecordingBackend())
+    simulator.paste_chunk_size = 1000
+    backend = simulator.backend
+    simulator.cost_models[backend.foreground] = copy.deepcopy(MODELS[model])  # 输出时会更新模型
+    simulator.type_string(text, 0, planned=True)
+    prepared = prepare_text(text, FORMAT_RULES, QUOTE_PAIRS)
+    assert backend.typed_text() == prepared
+    plan = simulator.last_plan
+    assert plan.text == prepared
+    pasted = ''.join(prepared[s.start:s.end] for s in plan if s.method == PASTE)
+    assert ''.join(backend.pastes) == pasted
+    assert len(backend) == plan.events
+    if model == 'cheap_paste':
+        assert pasted == prepared
@@ -0,0 +1,76 @@
+"""
+焦点监视测试
+
+用 RecordingBackend.focus_script 在发送到一半时切换前台窗口：输入应当在下一批事件之前停止，
+已送达的文本是准备好的文本的前缀，self.sent 与之相符。
+"""
+import asyncio
+
+from async_input import FOCUS_LOST, run_typing
+from focus_watcher import FocusWatcher
+from input_simulator import InputSimulator
+from output_backends import RecordingBackend
+from pacing import AdaptivePacer
+
+BATCH = 40  # 快速模式固定的批量（事件数）
+TEXT = '中文输入测试' * 50  # 没有虚拟键和代理对：每个字符一对按下/抬起事件
+
+
+def make_simulator(switch_at: int) -> InputSimulator:
+    """记录的事件数达到 switch_at 时前台窗口切换到另一个窗口"""
+    backend = RecordingBackend(foreground=1)
+    backend.focus_script = [(switch_at, 2)]
+    simulator = InputSimulator(backend)
+    simulator.pacer = AdaptivePacer(batch_size=BATCH, delay=0, min_batch=BATCH, max_batch=BATCH,
+                                    min_delay=0)
+    return simulator
+
+
+def test_watcher_flags_only_armed_changes():
+    watcher = FocusWatcher()
+    watcher.notify(2)
+    assert not watcher.moved  # 未监视时忽略
+    watcher.arm(1)
+    watcher.notify(1)
+    assert not watcher.moved
+    watcher.notify(2)
+    assert watcher.moved
+    watcher.notify(1)
+    assert watcher.moved  # 切回目标窗口也保持
+    watcher.disarm()
+    assert not watcher.moved
+
+
+def test_fast_mode_stops_within_one_batch():
+    switch_at = 100  # 第三批的中间
+    simulator = make_simulator(switch_at)
+    simulator.type_string(TEXT, 0, fast_mode=True)
+    backend = simulator.backend
+    assert switch_at <= len(backend) < switch_at + BATCH
+    typed = backend.typed_text()
+    assert typed == TEXT[:len(typed)] and len(typed) < len(TEXT)
+    assert simulator.sent == len(typed)
+    assert not simulator.focus.armed  # 会话已结束
+
+
+def test_char_mode_stops_at_next_character():
+    simulator = make_simulator(10)  # 第5个字符发送后切换
+    simulator.type_string(TEXT, 0)
+    assert simulator.backend.typed_text() == TEXT[:5]
+    assert simulator.sent == 5
+
+
+def test_paste_mode_stops_before_next_chunk():
+    simulator = make_simulator(4)  # 第一次 Ctrl+V（4个按键事件）之后切换
+    simulator.paste_chunk_size = 10
+    simulator.type_string(TEXT, 0, paste_mode=True)
+    assert simulator.backend.typed_text() == TEXT[:10]
+
+
+def test_async_fast_mode_reports_focus_lost():
+    switch_at = 100
+    simulator = make_simulator(switch_at)
+    progress = asyncio.run(run_typing(simulator, TEXT, 0, fast_mode=True))
+    assert progress.state == FOCUS_LOST
+    assert switch_at <= len(simulator.backend) < switch_at + BATCH
+    assert progress.typed == len(simulator.backend.typed_text()) < progress.total
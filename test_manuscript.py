@@ -0,0 +1,114 @@
+"""
+稿件检查点测试
+
+在输入到一半时切换窗口或按下 Esc 中断 type_file，再用新的模拟器从检查点继续：
+两次送达的文本拼接后与不中断的一次输入逐字相同，没有重复也没有遗漏。
+"""
+import json
+import shutil
+
+import pytest
+
+from input_simulator import InputSimulator
+from manuscript import CHECKPOINT_SUFFIX, ManuscriptSource
+from output_backends import RecordingBackend
+
+WINDOW = 64  # 小窗口：中断点落在某个窗口的中间
+PARAGRAPH = '他说：“今天天气不错……”   我们去公园吧!!!\n\n第二段 mixed English文本，“未闭合\n'
+
+
+def make_simulator() -> InputSimulator:
+    simulator = InputSimulator(RecordingBackend(foreground=1))
+    simulator.stream_window = WINDOW
+    simulator.paste_chunk_size = 16  # 粘贴模式每个窗口分成多块
+    return simulator
+
+
+def write_manuscript(tmp_path, name: str, encoding: str) -> str:
+    path = tmp_path / name
+    path.write_bytes((PARAGRAPH * 20).encode(encoding))
+    return str(path)
+
+
+def type_uninterrupted(path: str, encoding: str, **options) -> str:
+    simulator = make_simulator()
+    assert simulator.type_file(path, 0, encoding, **options)
+    return simulator.backend.typed_text()
+
+
+@pytest.mark.parametrize('encoding', ['utf-8', 'gbk'])
+@pytest.mark.parametrize('options, switch_at', [({'fast_mode': True}, 300), ({}, 300), ({'paste_mode': True}, 40)],
+                         ids=['fast', 'char', 'paste'])
+def test_resume_after_interrupt(tmp_path, encoding, options, switch_at):
+    reference = write_manuscript(tmp_path, 'reference.txt', encoding)
+    expected = type_uninterrupted(reference, encoding, **options)
+
+    path = write_manuscript(tmp_path, 'manuscript.txt', encoding)
+    first = make_simulator()
+    first.backend.focus_script = [(switch_at, 2)]  # 输入到一半时切换窗口
+    assert not first.type_file(path, 0, encoding, **options)
+    typed = first.backend.typed_text()
+    assert 0 < len(typed) < len(expected) and expected.startswith(typed)
+
+    with open(path + CHECKPOINT_SUFFIX, encoding='utf-8') as f:
+        state = json.load(f)
+    assert state['typed'] + state['skip'] == len(typed) and not state['done']
+
+    second = make_simulator()
+    assert second.type_file(path, 0, encoding, **options)
+    assert typed + second.backend.typed_text() == expected
+
+    # 已全部输入：再次调用不输出任何内容
+    third = make_simulator()
+    assert third.type_file(path, 0, encoding, **options)
+    assert third.backend.typed_text() == ''
+
+
+def test_resume_after_escape(tmp_path):
+    path = write_manuscript(tmp_path, 'manuscript.txt', 'utf-8')
+    expected = type_uninterrupted(shutil.copy(path, tmp_path / 'reference.txt'), 'utf-8')
+
+    typed = ''
+    for attempt in range(100):
+        simulator = make_simulator()
+        backend = simulator.backend
+        original = backend.send_input
+
+        def send_input(inputs, count, backend=backend, original=original):
+            accepted = original(inputs, count)
+            if len(backend) >= 200:
+                backend.escape = True  # 每次输入约100个字符后按下 Esc
+            return accepted
+
+        backend.send_input = send_input
+        done = simulator.type_file(path, 0)
+        typed += backend.typed_text()
+        if done:
+            break
+    assert attempt > 1
+    assert typed == expected
+
+
+def test_resume_refuses_changed_settings(tmp_path):
+    path = write_manuscript(tmp_path, 'manuscript.txt', 'utf-8')
+    simulator = make_simulator()
+    simulator.backend.focus_script = [(300, 2)]
+    simulator.type_file(path, 0, fast_mode=True)
+
+    changed = make_simulator()
+    changed.format_rules['add_space_between_zh_en'] = False  # 窗口的准备结果不同，不能按检查点跳过
+    assert not changed.type_file(path, 0, fast_mode=True)  # 报告错误，不输入任何内容
+    assert changed.backend.typed_text() == ''
+    # 从头开始则覆盖旧的检查点
+    assert changed.type_file(path, 0, fast_mode=True, resume=False)
+
+
+def test_resume_refuses_modified_file(tmp_path):
+    path = write_manuscript(tmp_path, 'manuscript.txt', 'utf-8')
+    simulator = make_simulator()
+    simulator.backend.focus_script = [(300, 2)]
+    simulator.type_file(path, 0, fast_mode=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('追加的内容')
+    with pytest.raises(ValueError):
+        ManuscriptSource(path)
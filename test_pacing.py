@@ -0,0 +1,118 @@
+"""
+节奏控制测试
+
+AdaptivePacer：目标只接受部分事件时批量缩小到实际接受的数量，并以此为上限，文本仍然完整送达。
+DeadlineScheduler：按绝对截止时间等待，sleep 的误差和发送本身的耗时不会逐字累积成漂移。
+"""
+import time
+
+from input_simulator import InputSimulator
+from output_backends import RecordingBackend
+from pacing import AdaptivePacer, DeadlineScheduler
+from text_core import FORMAT_RULES, QUOTE_PAIRS, prepare_text
+
+TEXT = '中文输入测试' * 50  # 没有虚拟键和代理对：每个字符一对按下/抬起事件
+
+
+def test_pacer_shrinks_to_partial_accept():
+    pacer = AdaptivePacer(batch_size=50, delay=0.001)
+    decision = pacer.record(50, 7)
+    assert decision.action == 'backoff'
+    assert pacer.batch_size == 7 and pacer.ceiling == 8
+    assert pacer.delay == 0.002
+    # 之后的成功只缩短延迟、保持在上限以下，不会立即回到50
+    for _ in range(10):
+        pacer.record(pacer.batch_size, pacer.batch_size)
+    assert pacer.batch_size == 7 and pacer.delay < 0.002
+
+
+def test_pacer_halves_when_nothing_accepted():
+    pacer = AdaptivePacer(batch_size=50)
+    assert pacer.record(50, 0).action == 'backoff'
+    assert pacer.batch_size == 25 and pacer.ceiling == 50
+
+
+def test_fast_mode_adapts_to_busy_target():
+    simulator = InputSimulator(RecordingBackend())
+    simulator.pacer = AdaptivePacer(batch_size=50, delay=0, min_delay=0)
+    simulator.backend.max_accept = 7
+    simulator.type_string(TEXT, 0, fast_mode=True)
+
+    assert simulator.backend.typed_text() == prepare_text(TEXT, FORMAT_RULES, QUOTE_PAIRS)
+    decisions = list(simulator.pacer.decisions)
+    assert decisions[0].accepted == 7 and decisions[0].next_batch_size == 7
+    # 缩小之后只有撤销上限、重新试探更高的批量时才会再次被部分接受
+    actions = [d.action for d in decisions]
+    for i, decision in enumerate(decisions[1:], 1):
+        if decision.accepted < decision.sent:
+            assert actions[i - 2:i] == ['probe', 'grow']
+        else:
+            assert decision.batch_size <= 7
+    assert simulator.pacer.partial < len(decisions) // 10
+    assert simulator.metrics.partial_sends == simulator.pacer.partial
+
+
+class FakeClock:
+    """每次读取前进1微秒的纳秒时钟；sleep 比请求的时间多睡 overshoot 秒"""
+
+    def __init__(self, overshoot: float):
+        self.now = 0
+        self.overshoot = overshoot
+
+    def __call__(self) -> int:
+        self.now += 1_000
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += int(seconds * 1_000_000_000)
+
+    def sleep(self, seconds: float):
+        self.advance(seconds + self.overshoot)
+
+
+def test_scheduler_does_not_drift():
+    clock = FakeClock(overshoot=0.0015)  # 小于忙等预算，忙等会把误差吃掉
+    scheduler = DeadlineScheduler(spin_ms=2.0, clock=clock, sleep=clock.sleep)
+    scheduler.start()
+    for _ in range(1000):
+        clock.advance(0.0007)  # 发送一个字符的耗时
+        assert scheduler.wait(0.01)
+    summary = scheduler.summary()
+    assert summary['waits'] == 1000
+    assert summary['scheduled_s'] == 10.0
+    assert abs(summary['rate_error']) < 1e-4  # 按"发送完再sleep"会慢 22%
+    assert summary['max_ms'] < 0.01
+
+
+def test_scheduler_rebases_after_long_stall():
+    clock = FakeClock(overshoot=0)
+    scheduler = DeadlineScheduler(clock=clock, sleep=clock.sleep, max_lag=0.5)
+    scheduler.start()
+    scheduler.wait(0.01)
+    clock.advance(2.0)  # 例如窗口切换时被暂停
+    scheduler.wait(0.01)
+    scheduler.wait(0.01)
+    summary = scheduler.summary()
+    assert summary['rebased'] == 1
+    assert summary['p99_ms'] < 0.01  # 不追赶：之后的字符仍按间隔发送
+
+
+class SlowBackend(RecordingBackend):
+    """每次 send_input 耗时1毫秒的目标"""
+
+    def send_input(self, inputs, count: int) -> int:
+        time.sleep(0.001)
+        return super().send_input(inputs, count)
+
+
+def test_char_mode_keeps_schedule_with_slow_sends():
+    interval = 0.004
+    simulator = InputSimulator(SlowBackend())
+    simulator.type_string(TEXT[:100], interval)
+    backend = simulator.backend
+    downs = backend.timestamps[::2]
+    assert backend.typed_text() == TEXT[:100]
+    elapsed = (downs[-1] - downs[0]) / 1_000_000_000
+    # 发送耗时若累积，会多出 99 × 1毫秒 以上
+    assert abs(elapsed - 99 * interval) < 0.05
+    assert simulator.schedule.summary()['waits'] == 100
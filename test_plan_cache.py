@@ -0,0 +1,108 @@
+"""
+准备结果缓存测试
+
+同一段文本第二次输入时命中缓存，发送的事件流逐字节相同；
+格式化规则、引号配对或输出方式改变后不命中，输出按新的设置准备。
+"""
+import pytest
+
+from input_simulator import InputSimulator
+from output_backends import RecordingBackend
+from plan_cache import PlanCache, PreparedPlan, content_key
+from text_core import FORMAT_RULES, QUOTE_PAIRS, prepare_text
+
+TEXT = '他说：“你好”，然后（离开\n第二行 mixed English文本...   空格「未闭合' * 20
+
+
+def make_simulator() -> InputSimulator:
+    simulator = InputSimulator(RecordingBackend())
+    simulator.fast_chunk_size = 100  # 快速模式分成多段，每段的事件分别缓存
+    return simulator
+
+
+def type_twice(simulator: InputSimulator, **options) -> tuple:
+    """输入两次，返回两次的事件流"""
+    streams = []
+    for _ in range(2):
+        simulator.backend.clear()
+        simulator.type_string(TEXT, 0, **options)
+        streams.append(simulator.backend.event_bytes())
+    return streams
+
+
+@pytest.mark.parametrize('options', [{}, {'fast_mode': True}, {'paste_mode': True}, {'format_text': False}],
+                         ids=['char', 'fast', 'paste', 'unformatted'])
+def test_second_pass_hits_cache(options):
+    simulator = make_simulator()
+    first, second = type_twice(simulator, **options)
+    assert first == second
+    assert simulator.plan_cache.info()['misses'] == 1
+    assert simulator.plan_cache.info()['hits'] == 1
+    prepared = prepare_text(TEXT, FORMAT_RULES, QUOTE_PAIRS, options.get('format_text', True))
+    assert simulator.backend.typed_text() == prepared
+
+
+def test_fast_mode_caches_encoded_events():
+    simulator = make_simulator()
+    type_twice(simulator, fast_mode=True)
+    (entry,) = simulator.plan_cache._entries.values()
+    assert len(entry.events) == -(-len(entry.text) // simulator.fast_chunk_size)  # 每段一份
+
+
+def test_interrupted_pass_keeps_partial_events():
+    simulator = make_simulator()
+    simulator.backend.focus_script = [(300, 2)]  # 第二段中途切换窗口
+    simulator.type_string(TEXT, 0, fast_mode=True)
+    (entry,) = simulator.plan_cache._entries.values()
+    assert len(entry.events) == 1  # 只保存了完整发送的段
+
+    simulator.backend.clear()
+    simulator.type_string(TEXT, 0, fast_mode=True)
+    assert simulator.plan_cache.hits == 1
+    assert simulator.backend.typed_text() == prepare_text(TEXT, FORMAT_RULES, QUOTE_PAIRS)
+
+
+@pytest.mark.parametrize('change', ['rule', 'rule_in_place', 'quote_pairs', 'format_rules_argument'])
+def test_changed_settings_miss_cache(change):
+    simulator = make_simulator()
+    simulator.type_string(TEXT, 0, fast_mode=True)
+    rules = dict(FORMAT_RULES, add_space_between_zh_en=False)
+    quote_pairs = QUOTE_PAIRS
+    options = {}
+    if change == 'rule':
+        simulator.format_rules = rules
+    elif change == 'rule_in_place':
+        simulator.format_rules['add_space_between_zh_en'] = False  # 同一个字典对象，内容改变
+    elif change == 'quote_pairs':
+        rules = FORMAT_RULES
+        quote_pairs = simulator.quote_pairs = dict(QUOTE_PAIRS)
+        del quote_pairs['（']  # 不再为未闭合的括号补全
+    else:
+        options['format_rules'] = rules
+
+    simulator.backend.clear()
+    simulator.type_string(TEXT, 0, fast_mode=True, **options)
+    assert simulator.plan_cache.info()['misses'] == 2 and simulator.plan_cache.hits == 0
+    expected = prepare_text(TEXT, rules, quote_pairs)
+    assert expected != prepare_text(TEXT, FORMAT_RULES, QUOTE_PAIRS)
+    assert simulator.backend.typed_text() == expected
+
+
+def test_output_mode_is_part_of_key():
+    simulator = make_simulator()
+    simulator.type_string(TEXT, 0, fast_mode=True)
+    simulator.type_string(TEXT, 0)  # 逐字输入不缓存编码好的事件，是另一个条目
+    assert simulator.plan_cache.info()['misses'] == 2 and len(simulator.plan_cache) == 2
+
+
+def test_cache_evicts_least_recently_used():
+    entries = {name: PreparedPlan(name * 1000, []) for name in 'abc'}
+    cache = PlanCache(max_bytes=entries['a'].nbytes * 2)
+    cache.put(content_key('a'), entries['a'])
+    cache.put(content_key('b'), entries['b'])
+    assert cache.get(content_key('a')) is entries['a']  # a 成为最近使用的条目
+    cache.put(content_key('c'), entries['c'])
+    assert cache.get(content_key('b')) is None
+    assert cache.get(content_key('a')) is entries['a']
+    assert cache.info()['evictions'] == 1 and cache.nbytes <= cache.max_bytes
+    assert not cache.put(content_key('d'), PreparedPlan('d' * 10000, []))  # 超过上限的条目不缓存
@@ -0,0 +1,163 @@
+"""
+引号配对引擎与原实现的对照测试
+
+legacy_* 是替换前 InputSimulator._check_quote_pairs / _match_quotes 的原样副本（只把 self.quote_pairs 改为参数），
+find_unmatched_quotes 和 match_quotes 在嵌套、未闭合、多余右引号等输入上的结果应当与之逐字相同。
+"""
+import random
+
+import pytest
+
+from quote_engine import find_unmatched_quotes, match_quotes
+from text_core import QUOTE_PAIRS
+
+
+def legacy_check_quote_pairs(text: str, quote_pairs: dict) -> list:
+    stack = []  # 用于存储待匹配的引号
+    delete_positions = []  # 需要删除的引号位置
+    quote_positions = {}  # 记录每种引号的位置
+
+    # 第一遍扫描：记录所有引号的位置
+    for i, char in enumerate(text):
+        if char in quote_pairs or char in quote_pairs.values():
+            if char not in quote_positions:
+                quote_positions[char] = []
+            quote_positions[char].append(i)
+
+    # 第二遍扫描：检查配对情况
+    for i, char in enumerate(text):
+        if char in quote_pairs:  # 左引号
+            stack.append((char, i))
+        elif char in quote_pairs.values():  # 右引号
+            # 找到对应的左引号
+            left_quote = None
+            for left, right in quote_pairs.items():
+                if right == char:
+                    left_quote = left
+                    break
+
+            if stack and stack[-1][0] == left_quote:
+                stack.pop()  # 匹配成功，弹出左引号
+            else:
+                # 检查是否有对应的左引号在后面
+                if left_quote in quote_positions:
+                    future_positions = [pos for pos in quote_positions[left_quote] if pos > i]
+                    if not future_positions:  # 如果后面没有对应的左引号
+                        delete_positions.append(i)  # 标记当前右引号为需要删除
+
+    # 处理未匹配的左引号
+    while stack:
+        _, pos = stack.pop()
+        delete_positions.append(pos)
+
+    return sorted(delete_positions)
+
+
+def legacy_match_quotes(text: str, quote_pairs: dict) -> str:
+    if not text:
+        return text
+
+    # 将文本转换为字符列表以便修改
+    chars = list(text)
+    stack = []  # 存储待匹配的左引号
+    to_remove = set()  # 需要删除的引号位置
+    to_add = {}  # 需要添加的引号 {位置: 引号}
+
+    # 第一遍扫描：标记不匹配的引号
+    for i, char in enumerate(chars):
+        if char in quote_pairs:  # 左引号
+            stack.append((char, i))
+        elif char in quote_pairs.values():  # 右引号
+            # 找到对应的左引号
+            left_quote = None
+            for left, right in quote_pairs.items():
+                if right == char:
+                    left_quote = left
+                    break
+
+            if stack and stack[-1][0] == left_quote:
+                stack.pop()  # 匹配成功
+            else:
+                # 检查是否应该删除这个右引号
+                if not any(pos for q, pos in stack if quote_pairs[q] == char):
+                    to_remove.add(i)
+
+    # 处理未匹配的左引号
+    while stack:
+        quote, pos = stack.pop()
+        # 在适当位置添加右引号
+        next_pos = pos + 1
+        while next_pos < len(chars) and chars[next_pos].isspace():
+            next_pos += 1
+        if next_pos < len(chars):
+            to_add[next_pos] = quote_pairs[quote]
+        else:
+            to_remove.add(pos)
+
+    # 应用修改
+    # 先处理要添加的引号（从后向前）
+    for pos in sorted(to_add.keys(), reverse=True):
+        chars.insert(pos, to_add[pos])
+
+    # 再处理要删除的引号（从后向前）
+    for pos in sorted(to_remove, reverse=True):
+        chars.pop(pos)
+
+    return ''.join(chars)
+
+
+TEXTS = [
+    '',
+    '没有引号的文本',
+    '他说：“你好”，然后离开',
+    '「外层『内层』外层」',
+    '「外层『内层」外层』',  # 交错
+    '「「「三层未闭合',
+    '」」」只有右引号',
+    '」开头的右引号，后面还有「左引号',
+    '“开头未闭合',  # 位置0的左引号（原实现 any(pos ...) 会忽略它）
+    '”位置0的右引号“',
+    '末尾未闭合“',
+    '末尾未闭合“   \n\t',  # 左引号后只有空白
+    '"同一字符作左右引号" "再来一次',
+    "it's a 'test' of \"mixed\" quotes",
+    '（括号（嵌套）未闭合',
+    '【】《》〈〉{}[]()<>',
+    '》【【《〈]]}',
+    'a < b > c << d',
+    '“一”‘二’「三」『四』《五》〈六〉（七）【八】',
+    '“ ”“  ”“',
+]
+
+
+def random_text(rng: random.Random, length: int) -> str:
+    alphabet = '“”「」『』（）"\'[]<>文字 \n'
+    return ''.join(rng.choice(alphabet) for _ in range(length))
+
+
+RANDOM_TEXTS = [random_text(random.Random(seed), seed % 40 + 1) for seed in range(300)]
+
+# 一个右引号对应多个左引号时，原实现取字典中第一个匹配的左引号
+SHARED_CLOSER = {'«': '»', '‹': '»', '"': '"'}
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_unmatched_positions_match_legacy(text):
+    assert find_unmatched_quotes(text, QUOTE_PAIRS) == legacy_check_quote_pairs(text, QUOTE_PAIRS)
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_match_quotes_matches_legacy(text):
+    assert match_quotes(text, QUOTE_PAIRS) == legacy_match_quotes(text, QUOTE_PAIRS)
+
+
+def test_random_texts_match_legacy():
+    for text in RANDOM_TEXTS:
+        assert find_unmatched_quotes(text, QUOTE_PAIRS) == legacy_check_quote_pairs(text, QUOTE_PAIRS), text
+        assert match_quotes(text, QUOTE_PAIRS) == legacy_match_quotes(text, QUOTE_PAIRS), text
+
+
+@pytest.mark.parametrize('text', ['«a» ‹b» »c «d', '‹»«»»‹', '»‹ "«'])
+def test_shared_closer_matches_legacy(text):
+    assert find_unmatched_quotes(text, SHARED_CLOSER) == legacy_check_quote_pairs(text, SHARED_CLOSER)
+    assert match_quotes(text, SHARED_CLOSER) == legacy_match_quotes(text, SHARED_CLOSER)
@@ -0,0 +1,123 @@
+"""
+记录型后端的回放测试
+
+各种输出方式在 RecordingBackend 上还原出的文本都应当与 prepare_text 的结果逐字相同，
+同样的输入两次记录到的事件流逐字节相同。不需要显示器，可以在 Linux 上运行。
+"""
+import pytest
+
+from input_simulator import InputSimulator
+from output_backends import CF_HDROP, RecordingBackend
+from text_core import FORMAT_RULES, QUOTE_PAIRS, prepare_text
+
+TEXTS = [
+    '这是一个测试...   Hello  world！',
+    '他说：“你好”，然后（离开\n第二行\t制表符  空格',
+    '表情 😀 与扩展区汉字 𠀀，"未闭合的引号',
+]
+
+# 输出方式 -> type_string 的参数
+MODES = {
+    'char': {},
+    'fast': {'fast_mode': True},
+    'paste': {'paste_mode': True},
+    'planned': {'planned': True},
+}
+
+
+def make_simulator() -> InputSimulator:
+    simulator = InputSimulator(RecordingBackend())
+    simulator.paste_chunk_size = 8  # 粘贴模式分成多块
+    return simulator
+
+
+@pytest.mark.parametrize('mode', MODES)
+@pytest.mark.parametrize('text', TEXTS)
+def test_replay_matches_prepared_text(mode, text):
+    simulator = make_simulator()
+    simulator.type_string(text, 0, **MODES[mode])
+    assert simulator.backend.typed_text() == prepare_text(text, FORMAT_RULES, QUOTE_PAIRS)
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_unformatted_text_only_drops_unmatched_quotes(mode):
+    text = TEXTS[1]
+    simulator = make_simulator()
+    simulator.type_string(text, 0, format_text=False, **MODES[mode])
+    assert simulator.backend.typed_text() == prepare_text(text, FORMAT_RULES, QUOTE_PAIRS, False)
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_replay_is_byte_exact(mode):
+    streams = []
+    for _ in range(2):
+        simulator = make_simulator()
+        simulator.type_string(''.join(TEXTS), 0, **MODES[mode])
+        streams.append(simulator.backend.event_bytes())
+    assert streams[0] == streams[1]
+
+
+def test_partially_accepted_batches_are_resent():
+    text = ''.join(TEXTS) * 20
+    simulator = make_simulator()
+    simulator.backend.max_accept = 7  # 繁忙的目标每次只接受一部分事件
+    simulator.type_string(text, 0, fast_mode=True)
+    assert simulator.backend.typed_text() == prepare_text(text, FORMAT_RULES, QUOTE_PAIRS)
+    assert simulator.metrics.partial_sends > 0
+
+
+def test_paste_restores_clipboard():
+    simulator = make_simulator()
+    simulator.backend.clipboard = '原有内容'
+    simulator.type_string(TEXTS[0], 0, paste_mode=True)
+    prepared = prepare_text(TEXTS[0], FORMAT_RULES, QUOTE_PAIRS)
+    assert ''.join(simulator.backend.pastes) == prepared
+    assert simulator.backend.clipboard == '原有内容'
+
+
+# 文本以外的剪贴板格式：位图、文件列表和应用注册的格式
+CLIPBOARD_DATA = {8: b'BITMAPINFOHEADER...', CF_HDROP: b'C:\\a.txt\0\0', 0xC0DE: b'<html>'}
+
+
+@pytest.mark.parametrize('text', [None, '原有内容'])
+def test_paste_restores_non_text_formats(text):
+    simulator = make_simulator()
+    backend = simulator.backend
+    backend.clipboard = text
+    backend.clipboard_data = dict(CLIPBOARD_DATA)
+    simulator.type_string(TEXTS[1], 0, paste_mode=True)
+    assert backend.typed_text() == prepare_text(TEXTS[1], FORMAT_RULES, QUOTE_PAIRS)
+    assert backend.clipboard == text
+    assert backend.clipboard_data == CLIPBOARD_DATA
+
+
+def test_interrupted_paste_restores_clipboard():
+    simulator = make_simulator()
+    backend = simulator.backend
+    backend.clipboard_data = dict(CLIPBOARD_DATA)
+    backend.focus_script = [(4, 2)]  # 第一次 Ctrl+V 之后切换窗口
+    simulator.type_string(TEXTS[1], 0, paste_mode=True)
+    assert len(backend.pastes) == 1
+    assert backend.clipboard is None and backend.clipboard_data == CLIPBOARD_DATA
+
+
+class UnreadableClipboard(RecordingBackend):
+    """剪贴板被其他程序占用，无法保存原有内容"""
+
+    def snapshot_clipboard(self) -> list:
+        raise OSError('OpenClipboard failed')
+
+
+def test_paste_refuses_when_clipboard_cannot_be_saved():
+    simulator = InputSimulator(UnreadableClipboard())
+    simulator.backend.clipboard = '原有内容'
+    simulator.type_string(TEXTS[0], 0, paste_mode=True)
+    assert simulator.backend.pastes == []  # 不覆盖无法恢复的剪贴板
+    assert simulator.backend.clipboard == '原有内容'
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_continuous_input_once(mode):
+    simulator = make_simulator()
+    simulator.start_continuous_input(TEXTS[2], 0, loop=False, **MODES[mode])
+    assert simulator.backend.typed_text() == prepare_text(TEXTS[2], FORMAT_RULES, QUOTE_PAIRS)
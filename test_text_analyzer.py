@@ -0,0 +1,220 @@
+"""
+文本分析与原实现的对照测试
+
+legacy_analyze_text 是替换前 InputSimulator.analyze_text 的原样副本（只把 self 上的引号检查改为参数），
+单遍扫描的 analyze_text 在各类问题密集的输入上应当与之结果相同；
+按类型限制或采样时，每种问题保留的是原结果中该类型的前若干条（或每隔若干条的一条）。
+"""
+import random
+import re
+
+import pytest
+
+from test_quote_engine import legacy_check_quote_pairs
+from text_analyzer import BLOCK_ISSUE_TYPES, QUOTE, IncrementalAnalyzer, analyze_text
+from text_core import QUOTE_PAIRS
+
+
+def legacy_analyze_text(text: str, quote_pairs: dict) -> dict:
+    result = {
+        'stats': {},
+        'issues': []
+    }
+
+    if not text:
+        result['stats'] = {
+            'total_chars': 0,
+            'chars_no_spaces': 0,
+            'chinese_chars': 0,
+            'words': 0,
+            'lines': 0
+        }
+        return result
+
+    # 基本统计
+    result['stats']['total_chars'] = len(text)  # 包含所有字符的总数
+    result['stats']['chars_no_spaces'] = len(''.join(text.split()))  # 不包含空白字符的总数
+
+    # 统计中文字符
+    chinese_chars = re.findall(r'[\u4e00-\u9fff]', text)
+    result['stats']['chinese_chars'] = len(chinese_chars)
+
+    # 统计行数（包括空行）
+    result['stats']['lines'] = text.count('\n') + 1
+
+    # 单词统计（VSCode风格）
+    words = []
+
+    # 首先处理所有中文字符，将每个中文字符替换为"中文字符+空格"
+    text_with_spaces = re.sub(r'([\u4e00-\u9fff])', r'\1 ', text)
+
+    # 分割文本并过滤空字符串
+    raw_words = [word.strip() for word in text_with_spaces.split()]
+    words = [word for word in raw_words if word]
+
+    result['stats']['words'] = len(words)
+
+    # 检查问题
+    # 1. 检查重复字符
+    for i in range(len(text)-2):
+        if text[i] == text[i+1] == text[i+2] and text[i].strip():
+            result['issues'].append({
+                'type': '重复字符',
+                'position': i,
+                'content': text[i:i+3],
+                'description': f'发现连续重复字符: {text[i]}'
+            })
+
+    # 2. 检查不规范的空格使用
+    spaces = re.finditer(r'\s{2,}', text)
+    for space in spaces:
+        result['issues'].append({
+            'type': '多余空格',
+            'position': space.start(),
+            'content': space.group(),
+            'description': '发现连续多个空格'
+        })
+
+    # 3. 检查中英文混排的空格问题
+    mixed_spaces = re.finditer(r'[\u4e00-\u9fff][a-zA-Z]|[a-zA-Z][\u4e00-\u9fff]', text)
+    for mixed in mixed_spaces:
+        result['issues'].append({
+            'type': '中英文混排',
+            'position': mixed.start(),
+            'content': mixed.group(),
+            'description': '中英文之间建议加空格'
+        })
+
+    # 4. 检查标点符号使用
+    punctuation_issues = re.finditer(r'[，。！？；：、][，。！？；：、]', text)
+    for issue in punctuation_issues:
+        result['issues'].append({
+            'type': '标点符号',
+            'position': issue.start(),
+            'content': issue.group(),
+            'description': '发现连续标点符号'
+        })
+
+    # 5. 检查特殊字符
+    special_chars = re.finditer(r'[^\u4e00-\u9fff\u0020-\u007F\n\t]', text)
+    for char in special_chars:
+        result['issues'].append({
+            'type': '特殊字符',
+            'position': char.start(),
+            'content': char.group(),
+            'description': f'发现特殊字符: {char.group()}'
+        })
+
+    # 6. 检查引号配对
+    delete_positions = legacy_check_quote_pairs(text, quote_pairs)
+    for pos in delete_positions:
+        result['issues'].append({
+            'type': '引号不匹配',
+            'position': pos,
+            'content': text[pos],
+            'description': f'发现未匹配的引号: {text[pos]}'
+        })
+
+    return result
+
+
+TEXTS = [
+    '',
+    '\n',
+    '这是一个测试...   Hello  world！',
+    '啊啊啊啊啊 aaaa    \t\t  ！！！！，。、',
+    '中文abc中文 a中b文c中',  # 相邻的混排配对互不重叠
+    '，。，。，',
+    '表情 😀 与扩展区汉字 𠀀，全角　空格',
+    '他说：“你好”，然后（离开\n第二行\t制表符  空格\n\n\n   缩进',
+    '「外层『内层」外层』」」',
+    '   \n\n  前后空白  \n\n   ',
+]
+
+
+def random_text(rng: random.Random, length: int) -> str:
+    alphabet = '中文字ab1 \n\t.，。！“”「」😀　'
+    return ''.join(rng.choice(alphabet) for _ in range(length))
+
+
+RANDOM_TEXTS = [random_text(random.Random(seed), seed % 80 + 1) for seed in range(200)]
+
+ISSUE_TYPES = BLOCK_ISSUE_TYPES + (QUOTE,)
+
+
+def issues_of(result: dict, kind: str) -> list:
+    return [issue for issue in result['issues'] if issue['type'] == kind]
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_analysis_matches_legacy(text):
+    assert analyze_text(text, QUOTE_PAIRS) == legacy_analyze_text(text, QUOTE_PAIRS)
+
+
+def test_random_texts_match_legacy():
+    for text in RANDOM_TEXTS:
+        assert analyze_text(text, QUOTE_PAIRS) == legacy_analyze_text(text, QUOTE_PAIRS), text
+
+
+@pytest.mark.parametrize('limit, step', [(0, 1), (1, 1), (3, 1), (None, 2), (2, 3)])
+def test_per_type_caps_keep_legacy_prefix(limit, step):
+    text = '！' * 50 + '啊' * 20 + '  x  ' * 10 + '中a' * 10 + '」' * 7 + '😀' * 5
+    expected = legacy_analyze_text(text, QUOTE_PAIRS)
+    result = analyze_text(text, QUOTE_PAIRS, limit, step)
+    assert result['stats'] == expected['stats']
+    for kind in ISSUE_TYPES:
+        found = issues_of(expected, kind)
+        assert result['issue_counts'][kind] == len(found)
+        assert issues_of(result, kind) == found[::step][:limit]
+    # 各类型仍按原来的先后顺序输出
+    kinds = [issue['type'] for issue in result['issues']]
+    assert kinds == sorted(kinds, key=ISSUE_TYPES.index)
+
+
+def test_pathological_input_is_capped():
+    result = analyze_text('！' * 10000, QUOTE_PAIRS, 100)
+    assert len(result['issues']) == 300  # 重复字符、连续标点、特殊字符（全角）各100条
+    assert result['issue_counts'] == {'重复字符': 9998, '多余空格': 0, '中英文混排': 0, '标点符号': 5000,
+                                      '特殊字符': 10000, '引号不匹配': 0}
+
+
+# 块在"换行之后的第一个非空白字符"处切分；以下编辑落在切分点上或跨越切分点
+DOCUMENT = '第一段啊啊\n第二段  “引号\n\n  缩进段，，\n第四段”abc中文\n'
+EDITS = [
+    (6, 6, ' '),  # 在切分点前插入空白，切分点移动
+    (5, 6, ''),  # 删除换行，两块合并
+    (3, 3, '\n'),  # 在块中间插入换行，拆出新块
+    (6, 7, ''),  # 删除块的第一个字符
+    (0, 0, '”'),  # 文本开头插入右引号，影响全文的引号配对
+    (len(DOCUMENT), len(DOCUMENT), '啊啊'),  # 末尾追加，与前面的字符构成重复
+    (23, 24, ''),  # 删除最后一个切分点前的换行
+    (10, 26, ''),  # 删除跨越切分点的范围
+    (0, len(DOCUMENT), '全部替换'),
+    (0, len(DOCUMENT), ''),
+]
+
+
+@pytest.mark.parametrize('limit', [None, 1])
+@pytest.mark.parametrize('start, end, insert', EDITS)
+def test_incremental_edit_matches_full_analysis(start, end, insert, limit):
+    analyzer = IncrementalAnalyzer(QUOTE_PAIRS, limit)
+    analyzer.update(DOCUMENT)
+    edited = DOCUMENT[:start] + insert + DOCUMENT[end:]
+    expected = analyze_text(edited, QUOTE_PAIRS, limit)
+    assert analyzer.update(edited) == expected
+    if limit is None:
+        assert expected == legacy_analyze_text(edited, QUOTE_PAIRS)
+
+
+def test_incremental_typing_session():
+    rng = random.Random(0)
+    analyzer = IncrementalAnalyzer(QUOTE_PAIRS)
+    text = ''
+    for _ in range(300):
+        pos = rng.randint(0, len(text))
+        if text and rng.random() < 0.3:
+            text = text[:pos] + text[pos + 1:]
+        else:
+            text = text[:pos] + rng.choice('中文ab \n\n“”！。') + text[pos:]
+        assert analyzer.update(text) == legacy_analyze_text(text, QUOTE_PAIRS), text
+    assert analyzer.reanalyzed < len(text)  # 最后一次只重新分析了受影响的块
@@ -0,0 +1,139 @@
+"""
+格式化流水线与原实现的对照测试
+
+legacy_format_text 是替换前 InputSimulator.format_text 的原样副本（只把 self.format_rules 改为参数），
+逐条关闭每一条规则时，编译后的流水线输出都应当与之逐字相同。
+"""
+import random
+import re
+
+import pytest
+
+from test_quote_engine import legacy_match_quotes
+from text_core import FORMAT_RULES, QUOTE_PAIRS, format_text
+
+
+def legacy_format_text(text: str, format_rules: dict, quote_pairs: dict) -> str:
+    if not text or format_rules.get('keep_original_format', False):
+        return text
+
+    result = text
+
+    # 处理多余空格和换行
+    if format_rules.get('trim_spaces', True):
+        if format_rules.get('auto_format_paragraphs', True):
+            # 保留段落格式，将连续多个空行减少为一个空行
+            paragraphs = re.split(r'\n\s*\n', result)
+            paragraphs = [p.strip() for p in paragraphs if p.strip()]
+            result = '\n\n'.join(paragraphs)
+
+        # 处理每行的空格
+        if format_rules.get('preserve_line_breaks', True):
+            lines = result.split('\n')
+            lines = [re.sub(r'\s+', ' ', line.strip()) for line in lines]
+            result = '\n'.join(lines)
+        else:
+            result = re.sub(r'\s+', ' ', result).strip()
+
+    # 智能处理引号
+    if format_rules.get('auto_match_quotes', True):
+        result = legacy_match_quotes(result, quote_pairs)
+
+    # 处理中英文之间的空格
+    if format_rules.get('add_space_between_zh_en', True):
+        result = re.sub(r'([\u4e00-\u9fff])([a-zA-Z0-9])', r'\1 \2', result)
+        result = re.sub(r'([a-zA-Z0-9])([\u4e00-\u9fff])', r'\1 \2', result)
+
+    # 规范化标点符号
+    if format_rules.get('smart_punctuation', True):
+        # 统一中文标点
+        punctuation_map = {
+            ',': '，',
+            '.': '。',
+            '?': '？',
+            '!': '！',
+            ':': '：',
+            ';': '；',
+            '(': '（',
+            ')': '）',
+            '[': '【',
+            ']': '】'
+        }
+        for en, zh in punctuation_map.items():
+            # 仅在中文上下文中替换英文标点
+            result = re.sub(f'(?<=[\\u4e00-\\u9fff]){re.escape(en)}(?=[\\u4e00-\\u9fff])', zh, result)
+
+        # 处理重复的标点符号
+        result = re.sub(r'([，。！？；：、])\1+', r'\1', result)
+
+    # 处理省略号
+    if format_rules.get('normalize_ellipsis', True):
+        result = re.sub(r'\.{3,}', '...', result)
+        result = re.sub(r'。{3,}', '......', result)
+
+    # 处理连续字符
+    if format_rules.get('max_consecutive_chars', 3) > 0:
+        max_chars = format_rules['max_consecutive_chars']
+        pattern = r'(.)\1{' + str(max_chars) + r',}'
+        result = re.sub(pattern, lambda m: m.group(1) * max_chars, result)
+
+    return result
+
+
+TEXTS = [
+    '',
+    '   ',
+    '这是一个测试...   Hello  world！',
+    '  首行缩进\n\n\n\n第二段  \t 有制表符\r\n第三行　全角空格  ',
+    '\n\n开头和结尾的空行\n\n',
+    '中文,中文.中文?中文!中文:中文;中文(中文)中文[中文]中文',
+    '中文，，，中文。。。。中文！！中文？？？？？',
+    '省略号......与。。。。。。和.....',
+    '啊啊啊啊啊啊 aaaaaa 11111 ------',
+    '中文abc中文123中文 a中b文c',
+    '他说：“你好，然后（离开\n第二行「未闭合',
+    '”多余的右引号 "同字符引号',
+    '混合 mixed 内容: 中文,English,中文.end',
+    'a b c　d',
+]
+
+
+def random_text(rng: random.Random, length: int) -> str:
+    alphabet = '中文字ab1 \n\t.,!?;:()[]。，！“”「」…'
+    return ''.join(rng.choice(alphabet) for _ in range(length))
+
+
+RANDOM_TEXTS = [random_text(random.Random(seed), seed % 60 + 1) for seed in range(200)]
+
+BOOLEAN_RULES = [name for name, value in FORMAT_RULES.items() if type(value) is bool]
+
+
+def rules_with(**changes) -> dict:
+    rules = dict(FORMAT_RULES)
+    rules.update(changes)
+    return rules
+
+
+# 默认规则，逐条关闭（或打开）每一条布尔规则，以及不同的连续字符上限
+RULE_SETS = [FORMAT_RULES]
+RULE_SETS += [rules_with(**{name: not FORMAT_RULES[name]}) for name in BOOLEAN_RULES]
+RULE_SETS += [rules_with(max_consecutive_chars=n) for n in (0, 1, 2, 5)]
+RULE_SETS.append(rules_with(trim_spaces=False, auto_match_quotes=False, smart_punctuation=False))
+RULE_SETS.append(rules_with(auto_format_paragraphs=False, preserve_line_breaks=False))
+
+
+def rule_set_id(rules: dict) -> str:
+    changed = [f'{name}={value}' for name, value in rules.items() if value != FORMAT_RULES[name]]
+    return ','.join(changed) or 'default'
+
+
+@pytest.mark.parametrize('rules', RULE_SETS, ids=rule_set_id)
+@pytest.mark.parametrize('text', TEXTS)
+def test_pipeline_matches_legacy(rules, text):
+    assert format_text(text, rules, QUOTE_PAIRS) == legacy_format_text(text, rules, QUOTE_PAIRS)
+
+
+@pytest.mark.parametrize('rules', RULE_SETS, ids=rule_set_id)
+def test_random_texts_match_legacy(rules):
+    for text in RANDOM_TEXTS:
+        assert format_text(text, rules, QUOTE_PAIRS) == legacy_format_text(text, rules, QUOTE_PAIRS), text
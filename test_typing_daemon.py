@@ -0,0 +1,196 @@
+"""
+常驻输入服务的端到端测试
+
+以 --backend recording 启动 typing_daemon.py（端口由系统分配），通过 HTTP 提交、查询、取消任务，
+读取 /metrics 和 /output。不发送任何按键，可以在 Linux 上运行。
+选项检查、监听地址和输入任务线程的出错处理直接在进程内检查 TypingDaemon。
+"""
+import http.client
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+import pytest
+
+from input_simulator import InputSimulator
+from output_backends import RecordingBackend
+from text_core import FORMAT_RULES, QUOTE_PAIRS, format_text, prepare_text
+from typing_daemon import TYPE, TypingDaemon
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture(scope='module')
+def port():
+    """启动服务，返回它监听的端口"""
+    env = dict(os.environ, PYTHONIOENCODING='utf-8')
+    process = subprocess.Popen(
+        [sys.executable, '-u', os.path.join(ROOT, 'typing_daemon.py'), '--backend', 'recording', '--port', '0'],
+        cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        universal_newlines=True, encoding='utf-8', errors='replace')
+    try:
+        line = process.stdout.readline()  # 输入服务已启动: http://127.0.0.1:<端口>
+        match = re.search(r'http://[\d.]+:(\d+)', line)
+        assert match, f'服务没有启动: {line}'
+        yield int(match.group(1))
+    finally:
+        process.terminate()
+        process.wait(10)
+        process.stdout.close()
+
+
+def request(port: int, method: str, path: str, body=None, host: str = None,
+            content_type: str = 'application/json'):
+    """发送请求，返回 (状态码, JSON 或文本)"""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    headers = {'Host': host or f'127.0.0.1:{port}'}
+    data = None
+    if body is not None:
+        data = json.dumps(body).encode('utf-8')
+        headers['Content-Type'] = content_type
+    try:
+        connection.request(method, path, data, headers)
+        response = connection.getresponse()
+        payload = response.read().decode('utf-8')
+        if response.getheader('Content-Type', '').startswith('application/json'):
+            payload = json.loads(payload)
+        return response.status, payload
+    finally:
+        connection.close()
+
+
+def wait_for(port: int, job_id: int, states: tuple, timeout: float = 10.0) -> dict:
+    """轮询任务直到进入 states 之一"""
+    deadline = time.monotonic() + timeout
+    while True:
+        status, job = request(port, 'GET', f'/jobs/{job_id}')
+        assert status == 200
+        if job['state'] in states:
+            return job
+        assert time.monotonic() < deadline, f'任务 {job_id} 停在 {job["state"]}'
+        time.sleep(0.01)
+
+
+def type_text(port: int, text: str) -> dict:
+    """提交快速模式的输入任务并等待它结束"""
+    status, job = request(port, 'POST', '/jobs',
+                          {'kind': 'type', 'text': text, 'options': {'interval': 0, 'fast_mode': True}})
+    assert status == 202 and job['kind'] == 'type'
+    return wait_for(port, job['id'], ('done', 'failed', 'stopped', 'focus_lost', 'cancelled'))
+
+
+def test_type_job_round_trip(port):
+    text = '这是一个测试...   Hello  world！"未闭合'
+    prepared = prepare_text(text, FORMAT_RULES, QUOTE_PAIRS)
+    before = request(port, 'GET', '/output')[1]['text']
+
+    job = type_text(port, text)
+    assert job['state'] == 'done'
+    assert job['result']['typed'] == job['result']['total'] == len(prepared)
+
+    status, output = request(port, 'GET', '/output')
+    assert status == 200 and output['text'] == before + prepared
+
+
+def test_format_job_uses_daemon_rules(port):
+    text = '这是一个测试...   Hello  world！'
+    status, job = request(port, 'POST', '/jobs', {'kind': 'format', 'text': text})
+    assert status == 202
+    job = wait_for(port, job['id'], ('done', 'failed'))
+    assert job['result'] == {'text': format_text(text, FORMAT_RULES, QUOTE_PAIRS)}
+
+
+def test_cancel_running_and_queued_jobs(port):
+    slow = request(port, 'POST', '/jobs',
+                   {'kind': 'type', 'text': '慢速输入' * 20, 'options': {'interval': 0.2}})[1]
+    queued = request(port, 'POST', '/jobs', {'kind': 'type', 'text': '不会执行'})[1]
+    wait_for(port, slow['id'], ('running',))
+
+    assert request(port, 'POST', f'/jobs/{queued["id"]}/cancel', {}) == \
+        (200, {'id': queued['id'], 'cancelled': True})
+    assert wait_for(port, queued['id'], ('cancelled',))['started'] is None
+
+    started = time.monotonic()
+    assert request(port, 'POST', f'/jobs/{slow["id"]}/cancel', {})[1]['cancelled']
+    job = wait_for(port, slow['id'], ('cancelled',))
+    assert time.monotonic() - started < 1.0  # 等待被立即唤醒，不必等到下一个字符
+    assert job['result']['typed'] < job['chars']
+
+    # 已结束的任务不能再取消，不存在的任务返回404
+    assert request(port, 'POST', f'/jobs/{slow["id"]}/cancel', {})[1]['cancelled'] is False
+    assert request(port, 'POST', '/jobs/99999/cancel', {})[0] == 404
+
+
+def test_metrics_are_prometheus_text(port):
+    assert type_text(port, 'metrics')['state'] == 'done'
+    status, text = request(port, 'GET', '/metrics')
+    assert status == 200
+    accepted = re.search(r'^input_simulator_events_accepted_total (\d+)', text, re.MULTILINE)
+    assert accepted and int(accepted.group(1)) > 0
+    assert re.search(r'^input_simulator_sessions_total [1-9]', text, re.MULTILINE)
+
+
+def test_status_lists_jobs(port):
+    type_text(port, 'status')
+    status, info = request(port, 'GET', '/status')
+    assert status == 200 and info['backend'] == 'recording'
+    assert info['jobs'].get('done', 0) >= 1
+    jobs = request(port, 'GET', '/jobs')[1]['jobs']
+    assert all('result' not in job for job in jobs)
+
+
+def test_rejects_foreign_host(port):
+    jobs = len(request(port, 'GET', '/jobs')[1]['jobs'])
+    assert request(port, 'GET', '/status', host=f'localhost:{port}')[0] == 200
+    assert request(port, 'GET', '/status', host=f'evil.example:{port}')[0] == 421
+    status, _ = request(port, 'POST', '/jobs', {'kind': 'type', 'text': 'x'}, host=f'evil.example:{port}')
+    assert status == 421
+    assert len(request(port, 'GET', '/jobs')[1]['jobs']) == jobs
+
+
+def test_rejects_bad_requests(port):
+    assert request(port, 'POST', '/jobs', {'kind': 'type', 'text': 'x'}, content_type='text/plain')[0] == 415
+    status, body = request(port, 'POST', '/jobs', {'kind': 'type', 'text': 'x', 'options': {'bad': 1}})
+    assert status == 400 and 'bad' in body['error']
+    assert request(port, 'GET', '/jobs/99999')[0] == 404
+
+
+@pytest.mark.parametrize('kind, options', [
+    ('type', [1]),
+    ('type', 'fast'),
+    ('type', {'format_rules': [1]}),
+    ('type', {'format_rules': {'bogus': True}}),
+    ('type', {'format_rules': {'trim_spaces': 'no'}}),
+    ('type', {'interval': -1}),
+    ('type', {'interval': [0.3, 0.1]}),
+    ('type', {'interval': 'fast'}),
+    ('type', {'fast_mode': 1}),
+    ('format', {'format_rules': {'max_consecutive_chars': True}}),
+    ('analyze', {'max_issues_per_type': -1}),
+    ('analyze', {'sample_step': 0}),
+])
+def test_rejects_invalid_options(port, kind, options):
+    status, body = request(port, 'POST', '/jobs', {'kind': kind, 'text': 'x', 'options': options})
+    assert status == 400 and body['error']
+
+
+def test_failed_typing_job_keeps_lane_running():
+    # 不启动 HTTP 服务，直接在当前线程中运行输入任务线程的循环
+    daemon = TypingDaemon(InputSimulator(RecordingBackend()), port=0)
+    bad = daemon.submit(TYPE, 'bad', options={'interval': 0})
+    bad.options['format_rules'] = [1]  # 绕过 submit 的检查，在执行时出错
+    good = daemon.submit(TYPE, 'good', options={'interval': 0, 'fast_mode': True})
+    daemon._queues[TYPE].put((float('inf'), -1, None))  # 处理完以上任务后结束
+    daemon._run_typing()
+    assert bad.state == 'failed' and bad.error
+    assert good.state == 'done'
+    assert daemon.simulator.backend.typed_text() == 'good'
+
+
+@pytest.mark.parametrize('host', ['0.0.0.0', '192.168.1.10', 'example.com'])
+def test_refuses_non_loopback_host(host):
+    with pytest.raises(ValueError):
+        TypingDaemon(InputSimulator(RecordingBackend()), host=host, port=0)
@@ -0,0 +1,542 @@
+"""
+文本分析
+
+analyze_text 的实现，以及供编辑器使用的增量分析器。
+
+analyze_block 对每个字符只分类一次，在同一遍扫描中得出全部统计和各类问题，
+并可以按类型限制或采样问题条数，避免病态输入（例如一万个"！"）生成海量问题列表。
+
+增量分析把文本切分成若干块，切分点是"换行符之后的第一个非空白字符"。
+所有问题检测（重复字符、连续空白、中英文混排、连续标点、特殊字符）都不可能跨越这样的切分点，
+因此每块可以独立分析，合并后与整体分析的结果完全一致；引号配对依赖全文，
+由各块记录的引号事件在合并时统一计算，代价只与引号数量有关。
+流式分析器按同样的切分点逐块分析输入流，只保留统计、问题和尚未配对的引号，不保存全文。
+
+块结果只以整数元组保存问题的位置，内容在合并时从全文切出：大文档有上万个块，
+只含整数和字符串的元组不受循环垃圾回收跟踪，避免后台分析时的全量回收拖慢界面线程。
+"""
+import bisect
+import re
+from quote_engine import get_quote_index, unmatched_quote_positions
+
+# 问题类型（按 analyze_text 输出的先后顺序）
+REPEAT = '重复字符'
+SPACES = '多余空格'
+MIXED = '中英文混排'
+PUNCTUATION = '标点符号'
+SPECIAL = '特殊字符'
+QUOTE = '引号不匹配'
+BLOCK_ISSUE_TYPES = (REPEAT, SPACES, MIXED, PUNCTUATION, SPECIAL)
+
+# 字符类别（按位组合）
+_WS = 1
+_ZH = 2
+_ALPHA = 4
+_CN_PUNCT = 8
+_SPECIAL = 16
+_QUOTE = 32
+_WS_OR_ZH = _WS | _ZH
+_MIXABLE = _ZH | _ALPHA
+
+# 块切分点：换行符之后紧跟非空白字符的位置
+_BLOCK_BOUNDARY = re.compile(r'\n(?=\S)')
+# 最后一个块切分点
+_LAST_BOUNDARY = re.compile(r'.*\n(?=\S)', re.S)
+
+# 各类问题内容的长度（连续空白的长度单独记录）
+_ISSUE_WIDTHS = (3, 0, 2, 2, 1)
+
+
+def make_issue(kind: str, position: int, content: str) -> dict:
+    """生成问题记录"""
+    if kind == REPEAT:
+        description = f'发现连续重复字符: {content[0]}'
+    elif kind == SPACES:
+        description = '发现连续多个空格'
+    elif kind == MIXED:
+        description = '中英文之间建议加空格'
+    elif kind == PUNCTUATION:
+        description = '发现连续标点符号'
+    elif kind == SPECIAL:
+        description = f'发现特殊字符: {content}'
+    else:
+        description = f'发现未匹配的引号: {content}'
+    return {
+        'type': kind,
+        'position': position,
+        'content': content,
+        'description': description
+    }
+
+
+class BlockResult:
+    """单个文本块的分析结果（位置均相对于块起点）"""
+    __slots__ = ('length', 'stats', 'issues', 'space_lengths', 'counts', 'quote_positions', 'quote_chars')
+
+    def __init__(self, length: int, stats: tuple, issues: tuple, space_lengths: tuple, counts: tuple,
+                 quote_positions: tuple, quote_chars: str):
+        self.length = length
+        self.stats = stats  # (总字符, 不含空白字符, 中文字符, 换行数, 单词数)
+        self.issues = issues  # 与 BLOCK_ISSUE_TYPES 对应的问题位置元组
+        self.space_lengths = space_lengths  # 每段连续空白的长度，与 issues[1] 一一对应
+        self.counts = counts  # 每种问题的实际数量（保留的条目可能因上限/采样而更少）
+        self.quote_positions = quote_positions  # 引号位置
+        self.quote_chars = quote_chars  # 与 quote_positions 对应的引号字符
+
+
+def _classify(char: str, quote_chars) -> int:
+    """计算单个字符的类别"""
+    bits = 0
+    if char.isspace():
+        bits |= _WS
+    if '\u4e00' <= char <= '\u9fff':
+        bits |= _ZH
+    elif not ('\u0020' <= char <= '\u007f' or char == '\n' or char == '\t'):
+        bits |= _SPECIAL
+    if 'a' <= char <= 'z' or 'A' <= char <= 'Z':
+        bits |= _ALPHA
+    if char in '，。！？；：、':
+        bits |= _CN_PUNCT
+    if char in quote_chars:
+        bits |= _QUOTE
+    return bits
+
+
+_class_tables = {}
+
+
+def _class_table(quote_index) -> dict:
+    """每种引号配置对应一张字符类别缓存表"""
+    table = _class_tables.get(quote_index)
+    if table is None:
+        table = _class_tables[quote_index] = {}
+    return table
+
+
+def analyze_block(text: str, quote_index, limit: int = None, step: int = 1) -> BlockResult:
+    """
+    单遍扫描分析一个文本块：每个字符只分类一次，同时得出全部统计和各类问题
+    :param text: 文本块
+    :param quote_index: 引号索引
+    :param limit: 每种问题最多保留的条数，None表示不限
+    :param step: 采样间隔，每种问题每step条保留一条
+    """
+    if limit is None:
+        limit = len(text) + 1
+    table = _class_table(quote_index)
+    quote_chars = quote_index.chars
+
+    no_spaces = chinese = newlines = words = 0
+    repeats, spaces, mixed, punctuation, special = [], [], [], [], []
+    space_lengths, quote_positions, found_quotes = [], [], []
+    counts = [0, 0, 0, 0, 0]
+    prev = prev2 = ''
+    prev_bits = _WS  # 文本开头视为空白，用于单词计数
+    space_start = -1  # 当前空白段的起点
+    mix_prev = 0  # 上一个字符可参与中英文配对时的类别（已被配对占用则为0）
+    punct_free = False  # 上一个字符是否为未被占用的中文标点
+
+    for i, char in enumerate(text):
+        bits = table.get(char)
+        if bits is None:
+            bits = table[char] = _classify(char, quote_chars)
+
+        if bits & _WS:
+            if space_start < 0:
+                space_start = i
+            if char == '\n':
+                newlines += 1
+        else:
+            no_spaces += 1
+            if space_start >= 0:
+                if i - space_start >= 2:
+                    n = counts[1]
+                    counts[1] = n + 1
+                    if n % step == 0 and len(spaces) < limit:
+                        spaces.append(space_start)
+                        space_lengths.append(i - space_start)
+                space_start = -1
+            # 单词：前一个字符是空白或汉字时开始一个新单词
+            if prev_bits & _WS_OR_ZH:
+                words += 1
+            if char == prev == prev2:
+                n = counts[0]
+                counts[0] = n + 1
+                if n % step == 0 and len(repeats) < limit:
+                    repeats.append(i - 2)
+
+        mix = bits & _MIXABLE
+        if mix:
+            if bits & _ZH:
+                chinese += 1
+            if mix_prev and mix_prev != mix:
+                n = counts[2]
+                counts[2] = n + 1
+                if n % step == 0 and len(mixed) < limit:
+                    mixed.append(i - 1)
+                mix = 0  # 当前字符已被本次配对占用
+        mix_prev = mix
+
+        if bits & _CN_PUNCT:
+            if punct_free:
+                n = counts[3]
+                counts[3] = n + 1
+                if n % step == 0 and len(punctuation) < limit:
+                    punctuation.append(i - 1)
+                punct_free = False
+            else:
+                punct_free = True
+        else:
+            punct_free = False
+
+        if bits & _SPECIAL:
+            n = counts[4]
+            counts[4] = n + 1
+            if n % step == 0 and len(special) < limit:
+                special.append(i)
+        if bits & _QUOTE:
+            quote_positions.append(i)
+            found_quotes.append(char)
+
+        prev2 = prev
+        prev = char
+        prev_bits = bits
+
+    if space_start >= 0 and len(text) - space_start >= 2:
+        n = counts[1]
+        counts[1] = n + 1
+        if n % step == 0 and len(spaces) < limit:
+            spaces.append(space_start)
+            space_lengths.append(len(text) - space_start)
+
+    stats = (len(text), no_spaces, chinese, newlines, words)
+    issues = (tuple(repeats), tuple(spaces), tuple(mixed), tuple(punctuation), tuple(special))
+    return BlockResult(len(text), stats, issues, tuple(space_lengths), tuple(counts),
+                       tuple(quote_positions), ''.join(found_quotes))
+
+
+def empty_stats() -> dict:
+    return {
+        'total_chars': 0,
+        'chars_no_spaces': 0,
+        'chinese_chars': 0,
+        'words': 0,
+        'lines': 0
+    }
+
+
+def merge_results(text: str, starts: list, blocks: list, totals: list, quote_index,
+                  limit: int = None, step: int = 1) -> dict:
+    """
+    把各块的分析结果合并成 analyze_text 的输出格式
+    设置了limit或step时，额外返回 issue_counts：每种问题的实际数量
+    """
+    result = {
+        'stats': {},
+        'issues': []
+    }
+    if not text:
+        result['stats'] = empty_stats()
+        return result
+
+    total_chars, chars_no_spaces, chinese_chars, newlines, words = totals
+    result['stats']['total_chars'] = total_chars
+    result['stats']['chars_no_spaces'] = chars_no_spaces
+    result['stats']['chinese_chars'] = chinese_chars
+    result['stats']['lines'] = newlines + 1
+    result['stats']['words'] = words
+
+    if limit is None:
+        limit = total_chars + 1
+    issues = result['issues']
+    counts = {}
+    for index, kind in enumerate(BLOCK_ISSUE_TYPES):
+        kept = 0
+        counts[kind] = 0
+        width = _ISSUE_WIDTHS[index]
+        for start, block in zip(starts, blocks):
+            counts[kind] += block.counts[index]
+            positions = block.issues[index]
+            for n, pos in enumerate(positions):
+                if kept >= limit:
+                    break
+                pos += start
+                end = pos + (block.space_lengths[n] if index == 1 else width)
+                issues.append(make_issue(kind, pos, text[pos:end]))
+                kept += 1
+
+    events = ((start + pos, char) for start, block in zip(starts, blocks)
+              for pos, char in zip(block.quote_positions, block.quote_chars))
+    unmatched = unmatched_quote_positions(events, quote_index, quote_index.last_openers(text))
+    counts[QUOTE] = len(unmatched)
+    for pos in unmatched[::step][:limit]:
+        issues.append(make_issue(QUOTE, pos, text[pos]))
+
+    if limit <= total_chars or step > 1:
+        result['issue_counts'] = counts
+    return result
+
+
+def analyze_text(text: str, quote_pairs: dict, max_issues_per_type: int = None,
+                 sample_step: int = 1) -> dict:
+    """
+    分析文本，返回统计信息和潜在问题
+    :param text: 要分析的文本
+    :param quote_pairs: 引号配对字典
+    :param max_issues_per_type: 每种问题最多返回的条数，None表示不限
+    :param sample_step: 采样间隔，每种问题每sample_step条返回一条
+    :return: 包含分析结果的字典
+    """
+    if not text:
+        return merge_results(text, [], [], [], None)
+    quote_index = get_quote_index(quote_pairs)
+    block = analyze_block(text, quote_index, max_issues_per_type, sample_step)
+    return merge_results(text, [0], [block], list(block.stats), quote_index,
+                         max_issues_per_type, sample_step)
+
+
+def _common_prefix(a: str, b: str) -> int:
+    """两个字符串公共前缀的长度（二分比较切片，比较在C层完成）"""
+    lo, hi = 0, min(len(a), len(b))
+    if a[:hi] == b[:hi]:
+        return hi
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+    """两个字符串公共后缀的长度，不超过limit"""
+    lo, hi = 0, limit
+    if hi and a[len(a) - hi:] == b[len(b) - hi:]:
+        return hi
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:len(a) - lo] == b[len(b) - mid:len(b) - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def split_blocks(text: str, start: int = 0, end: int = None) -> list:
+    """返回 text[start:end] 范围内各块的起点（第一个为start）"""
+    if end is None:
+        end = len(text)
+    starts = [start]
+    for match in _BLOCK_BOUNDARY.finditer(text, start, end):
+        if match.end() < end:
+            starts.append(match.end())
+    return starts
+
+
+class IncrementalAnalyzer:
+    """
+    增量文本分析器
+    保存每个块的统计和问题列表；文本变化时只重新分析受影响的块及其边界上的相邻块，
+    再把差值合并进总计。update() 的结果与对全文调用 analyze_text 完全一致。
+    """
+
+    def __init__(self, quote_pairs: dict, max_issues_per_type: int = None):
+        """
+        :param quote_pairs: 引号配对字典
+        :param max_issues_per_type: 每种问题最多返回的条数，None表示不限
+        """
+        self.quote_index = get_quote_index(quote_pairs)
+        self.limit = max_issues_per_type
+        self.text = ''
+        self.starts = []  # 各块在全文中的起点
+        self.blocks = []  # 各块的 BlockResult
+        self.totals = [0, 0, 0, 0, 0]
+        self.reanalyzed = 0  # 最近一次更新重新分析的字符数
+
+    def _add_totals(self, blocks: list, sign: int):
+        totals = self.totals
+        for block in blocks:
+            for i, value in enumerate(block.stats):
+                totals[i] += sign * value
+
+    def _find_block(self, pos: int) -> int:
+        return bisect.bisect_right(self.starts, pos) - 1
+
+    def _analyze_blocks(self, text: str, starts: list, end: int, cancelled=None):
+        """分析各块；cancelled() 返回True时中止并返回None"""
+        blocks = []
+        for s, e in zip(starts, starts[1:] + [end]):
+            if cancelled is not None and cancelled():
+                return None
+            blocks.append(analyze_block(text[s:e], self.quote_index, self.limit))
+        return blocks
+
+    def update(self, text: str, cancelled=None):
+        """
+        用新的全文更新分析结果
+        :param text: 编辑后的全文
+        :param cancelled: 可选的取消检查函数，在每块分析前调用；返回True时放弃本次更新
+        :return: 与 analyze_text(text) 相同格式的分析结果；被取消时返回None且状态不变
+        """
+        old = self.text
+        if text == old:
+            self.reanalyzed = 0
+            return self.result()
+
+        if not self.blocks or not text:
+            # 首次分析或文本被清空：整体重建
+            starts = split_blocks(text) if text else []
+            blocks = self._analyze_blocks(text, starts, len(text), cancelled)
+            if blocks is None:
+                return None
+            self.starts = starts
+            self.blocks = blocks
+            self.totals = [0, 0, 0, 0, 0]
+            self._add_totals(self.blocks, 1)
+            self.text = text
+            self.reanalyzed = len(text)
+            return self.result()
+
+        # 找出变化范围：old[a:old_end] 被替换为 text[a:new_end]
+        a = _common_prefix(old, text)
+        suffix = _common_suffix(old, text, min(len(old), len(text)) - a)
+        old_end = len(old) - suffix
+        delta = len(text) - len(old)
+
+        # 受影响的块：包含变化起点前一个字符的块，到包含变化终点的块
+        first = self._find_block(max(a - 1, 0))
+        last = self._find_block(min(old_end, len(old) - 1))
+        region_start = self.starts[first]
+        region_end = (self.starts[last + 1] if last + 1 < len(self.starts) else len(old)) + delta
+
+        new_starts = split_blocks(text, region_start, region_end)
+        new_blocks = self._analyze_blocks(text, new_starts, region_end, cancelled)
+        if new_blocks is None:
+            return None
+
+        self._add_totals(self.blocks[first:last + 1], -1)
+        self._add_totals(new_blocks, 1)
+        tail = [s + delta for s in self.starts[last + 1:]]
+        self.starts = self.starts[:first] + new_starts + tail
+        self.blocks[first:last + 1] = new_blocks
+        self.text = text
+        self.reanalyzed = region_end - region_start
+        return self.result()
+
+    def result(self) -> dict:
+        """当前文本的分析结果"""
+        return merge_results(self.text, self.starts, self.blocks, self.totals, self.quote_index, self.limit)
+
+
+class StreamAnalyzer:
+    """
+    流式文本分析器
+    逐段送入文本，在块切分点处逐块分析，只保留总计、限定条数内的问题和尚未配对的引号，
+    内存占用只取决于最长的块（段落）和不匹配引号的数量。finish() 的结果与对全文调用 analyze_text 完全一致。
+    """
+
+    def __init__(self, quote_pairs: dict, max_issues_per_type: int = None):
+        """
+        :param quote_pairs: 引号配对字典
+        :param max_issues_per_type: 每种问题最多返回的条数，None表示不限
+        """
+        self.quote_index = get_quote_index(quote_pairs)
+        self.limit = max_issues_per_type
+        self.totals = [0, 0, 0, 0, 0]
+        self._buffer = ''  # 尚未分析的文本
+        self._scanned = 0  # 缓冲区中已确认没有切分点的长度
+        self._offset = 0  # 缓冲区在全文中的起点
+        self._issues = [[] for _ in BLOCK_ISSUE_TYPES]  # 每种问题保留的 (位置, 内容)
+        self._counts = [0] * len(BLOCK_ISSUE_TYPES)
+        self._stack = []  # 尚未闭合的左引号 (字符, 位置)
+        self._closers = []  # 没有与栈顶配对的右引号 (位置, 对应的左引号, 字符)
+        self._last_seen = {}  # 每种左引号最后一次出现的位置
+
+    def feed(self, text: str):
+        """送入一段文本，分析其中已经完整的块"""
+        self._buffer += text
+        # 切分点要求换行之后的字符已经到达，从上次扫描的末尾之前一个字符开始找
+        match = _LAST_BOUNDARY.match(self._buffer, max(self._scanned - 1, 0))
+        if match is None:
+            self._scanned = len(self._buffer)
+            return
+        cut = match.end()
+        self._analyze(self._buffer[:cut])
+        self._buffer = self._buffer[cut:]
+        self._scanned = len(self._buffer)
+
+    def _analyze(self, text: str):
+        """分析若干个完整的块（块之间没有跨越的问题，可以作为一块分析）"""
+        block = analyze_block(text, self.quote_index, self.limit)
+        offset = self._offset
+        for i, value in enumerate(block.stats):
+            self.totals[i] += value
+        for index, kept in enumerate(self._issues):
+            self._counts[index] += block.counts[index]
+            width = _ISSUE_WIDTHS[index]
+            for n, pos in enumerate(block.issues[index]):
+                if self.limit is not None and len(kept) >= self.limit:
+                    break
+                end = pos + (block.space_lengths[n] if index == 1 else width)
+                kept.append((offset + pos, text[pos:end]))
+
+        # 引号按 unmatched_quote_positions 的规则在线配对；右引号是否删除取决于后面还有没有对应的左引号，
+        # 先记下，结束时再判断
+        openers = self.quote_index.openers
+        closer_to_opener = self.quote_index.closer_to_opener
+        stack = self._stack
+        for pos, char in zip(block.quote_positions, block.quote_chars):
+            pos += offset
+            if char in openers:
+                stack.append((char, pos))
+                self._last_seen[char] = pos
+            elif char in closer_to_opener:
+                left_quote = closer_to_opener[char]
+                if stack and stack[-1][0] == left_quote:
+                    stack.pop()
+                else:
+                    self._closers.append((pos, left_quote, char))
+        self._offset += len(text)
+
+    def finish(self) -> dict:
+        """
+        输入结束，分析剩余的文本
+        :return: 与 analyze_text(全文) 相同格式的分析结果
+        """
+        if self._buffer:
+            self._analyze(self._buffer)
+            self._buffer = ''
+        result = {
+            'stats': {},
+            'issues': []
+        }
+        total_chars, chars_no_spaces, chinese_chars, newlines, words = self.totals
+        if not total_chars:
+            result['stats'] = empty_stats()
+            return result
+        result['stats']['total_chars'] = total_chars
+        result['stats']['chars_no_spaces'] = chars_no_spaces
+        result['stats']['chinese_chars'] = chinese_chars
+        result['stats']['lines'] = newlines + 1
+        result['stats']['words'] = words
+
+        issues = result['issues']
+        counts = {}
+        for kind, kept, count in zip(BLOCK_ISSUE_TYPES, self._issues, self._counts):
+            counts[kind] = count
+            issues.extend(make_issue(kind, pos, content) for pos, content in kept)
+
+        last_seen = self._last_seen
+        unmatched = [(pos, char) for pos, left_quote, char in self._closers
+                     if left_quote in last_seen and last_seen[left_quote] <= pos]
+        unmatched.extend((pos, char) for char, pos in self._stack)
+        unmatched.sort()
+        counts[QUOTE] = len(unmatched)
+        limit = total_chars + 1 if self.limit is None else self.limit
+        for pos, char in unmatched[:limit]:
+            issues.append(make_issue(QUOTE, pos, char))
+
+        if limit <= total_chars:
+            result['issue_counts'] = counts
+        return result
@@ -0,0 +1,113 @@
+"""
+文本处理核心
+
+格式化、分析和引号检查的轻量入口，只依赖标准库：
+不导入 colorama、pyautogui、keyboard、pywin32，也不需要创建 InputSimulator，
+适合批处理脚本等短时间运行、启动开销比实际工作更显著的场景。
+
+InputSimulator 的默认引号配对和格式化规则也定义在这里。
+"""
+import time
+from quote_engine import find_unmatched_quotes
+from text_analyzer import analyze_text as _analyze_text
+from text_formatter import get_pipeline
+
+# 默认的引号配对
+QUOTE_PAIRS = {
+    '"': '"',
+    "'": "'",
+    "“": "”",  # 中文双引号
+    "‘": "’",  # 中文单引号
+    "「": "」",  # 「」
+    "『": "』",  # 『』
+    "《": "》",  # 《》
+    "〈": "〉",  # 〈〉
+    "（": "）",  # （）
+    "【": "】",  # 【】
+    "[": "]",
+    "{": "}",
+    "(": ")",
+    "<": ">"
+}
+
+# 默认的格式化规则
+FORMAT_RULES = {
+    'max_consecutive_chars': 3,  # 最大连续字符数
+    'max_consecutive_spaces': 1,  # 最大连续空格数
+    'add_space_between_zh_en': True,  # 中英文之间添加空格
+    'normalize_ellipsis': True,  # 规范化省略号
+    'normalize_punctuation': True,  # 规范化标点符号
+    'trim_spaces': True,  # 清理多余空格
+    'keep_original_format': False,  # 保持原格式
+    'auto_match_quotes': True,  # 自动匹配引号
+    'auto_format_paragraphs': True,  # 自动格式化段落
+    'preserve_line_breaks': True,  # 保留换行符
+    'smart_punctuation': True  # 智能标点处理
+}
+
+
+def format_text(text: str, rules: dict = None, quote_pairs: dict = None) -> str:
+    """
+    按规则格式化文本（规则集编译后缓存，见 text_formatter）
+    :param rules: 格式化规则，默认 FORMAT_RULES
+    :param quote_pairs: 引号配对字典，默认 QUOTE_PAIRS
+    """
+    return get_pipeline(FORMAT_RULES if rules is None else rules)(
+        text, QUOTE_PAIRS if quote_pairs is None else quote_pairs)
+
+
+def remove_positions(text: str, positions: list) -> str:
+    """删除文本中指定位置（升序）的字符"""
+    pieces = []
+    last = 0
+    for pos in positions:
+        pieces.append(text[last:pos])
+        last = pos + 1
+    pieces.append(text[last:])
+    return ''.join(pieces)
+
+
+def prepare_text(text: str, rules: dict = None, quote_pairs: dict = None,
+                 formatting: bool = True) -> str:
+    """
+    准备要输出的文本：按规则格式化，并去掉不匹配的引号（与 InputSimulator.prepare_text 相同）
+    :param rules: 格式化规则，默认 FORMAT_RULES
+    :param quote_pairs: 引号配对字典，默认 QUOTE_PAIRS
+    :param formatting: 是否格式化文本
+    """
+    return prepare_with_deletions(text, rules, quote_pairs, formatting)[0]
+
+
+def prepare_with_deletions(text: str, rules: dict = None, quote_pairs: dict = None,
+                           formatting: bool = True, trace=None) -> tuple:
+    """
+    同 prepare_text，另外返回去掉的不匹配引号在格式化后文本中的位置
+    :param trace: 可选的回调 trace(名称, 开始, 结束)，分别记录格式化和引号检查的时间段（perf_counter）
+    :return: (准备好的文本, 去掉的位置列表)
+    """
+    rules = FORMAT_RULES if rules is None else rules
+    quote_pairs = QUOTE_PAIRS if quote_pairs is None else quote_pairs
+    if formatting and not rules.get('keep_original_format', False):
+        started = time.perf_counter()
+        text = format_text(text, rules, quote_pairs)
+        if trace is not None:
+            trace('format_text', started, time.perf_counter())
+    delete_positions = []
+    if rules.get('auto_match_quotes', True):
+        started = time.perf_counter()
+        delete_positions = find_unmatched_quotes(text, quote_pairs)
+        if delete_positions:
+            text = remove_positions(text, delete_positions)
+        if trace is not None:
+            trace('quote_check', started, time.perf_counter())
+    return text, delete_positions
+
+
+def analyze_text(text: str, quote_pairs: dict = None, max_issues_per_type: int = None,
+                 sample_step: int = 1) -> dict:
+    """
+    分析文本，返回统计信息和潜在问题（见 text_analyzer）
+    :param quote_pairs: 引号配对字典，默认 QUOTE_PAIRS
+    """
+    return _analyze_text(text, QUOTE_PAIRS if quote_pairs is None else quote_pairs,
+                         max_issues_per_type, sample_step)
@@ -0,0 +1,158 @@
+"""
+格式化流水线
+
+把 format_rules 中启用的规则编译成一条流水线，按规则集缓存，重复调用时不再重新编译正则。
+兼容的处理步骤合并成一遍扫描：
+1. 空白处理：段落、行首尾空格、连续空白一次完成，只对需要改动的空白段回调
+2. 引号匹配（quote_engine）
+3. 行内处理：中英文空格、标点映射、重复标点、省略号合并为一个交替正则
+4. 连续字符限制
+输出与原有的逐条 re.sub 实现完全一致。
+"""
+import re
+from functools import lru_cache
+from quote_engine import match_quotes
+
+ZH = r'\u4e00-\u9fff'
+ALNUM = 'a-zA-Z0-9'
+
+# 中文语境下的英文标点映射
+PUNCTUATION_MAP = {
+    ',': '，',
+    '.': '。',
+    '?': '？',
+    '!': '！',
+    ':': '：',
+    ';': '；',
+    '(': '（',
+    ')': '）',
+    '[': '【',
+    ']': '】'
+}
+
+# 需要改动的空白段：两个以上的空白字符、单个非空格非换行的空白字符、文本首尾的空白
+# 以\s开头，正则引擎可以按首字符快速跳过非空白字符
+_EDGE_OR_IRREGULAR_SPACE = re.compile(r'\s(?:\s+|(?<=[^\S \n])|(?<=\A\s)|\Z)')
+_ANY_SPACE = re.compile(r'\s+')
+
+
+class FormatPipeline:
+    """由一组格式化规则编译出的流水线"""
+
+    def __init__(self, rules: dict):
+        self.rules = dict(rules)
+        get = self.rules.get
+        self.passthrough = get('keep_original_format', False)
+        self.trim_spaces = get('trim_spaces', True)
+        self.paragraphs = get('auto_format_paragraphs', True)
+        self.preserve_line_breaks = get('preserve_line_breaks', True)
+        self.match_quotes = get('auto_match_quotes', True)
+
+        # 行内处理：各分支互不重叠，合并后与原来逐条替换的结果一致。
+        # 每个分支都从一个"触发字符"开始（先整体匹配触发字符，再用断言判断分支），
+        # 正则引擎据此跳过不可能匹配的位置，中文正文中绝大多数字符不会进入分支判断。
+        triggers = ''
+        branches = []
+        if get('add_space_between_zh_en', True):
+            triggers += ALNUM
+            branches.append(f'(?<=[{ALNUM}])(?:(?<=[{ZH}].)|(?=[{ZH}]))(?P<space>)')
+        if get('smart_punctuation', True):
+            punctuation = ''.join(re.escape(c) for c in PUNCTUATION_MAP)
+            triggers += punctuation + '，。！？；：、'
+            branches.append(f'(?<=[{ZH}][{punctuation}])(?=[{ZH}])(?P<punct>)')
+            # 重复标点要排在省略号之前：先去重，"。。。"就不会再被当作省略号
+            branches.append('(?<=[，。！？；：、])(?P=first)+(?P<dup>)')
+        if get('normalize_ellipsis', True):
+            triggers += r'\.。'
+            branches.append(r'(?<=\.)\.{2,}(?P<dots>)')
+            branches.append('(?<=。)。{2,}(?P<circles>)')
+        if branches:
+            self.inline = re.compile(f'(?P<first>[{triggers}])(?:' + '|'.join(branches) + ')')
+        else:
+            self.inline = None
+
+        max_chars = get('max_consecutive_chars', 3)
+        if max_chars > 0:
+            self.consecutive = re.compile(r'(.)\1{' + str(max_chars) + r',}')
+            self.consecutive_repl = r'\1' * max_chars
+        else:
+            self.consecutive = None
+
+    def _replace_space(self, match) -> str:
+        """按段落/行规则替换一段空白"""
+        run = match.group()
+        newlines = run.count('\n')
+        at_edge = match.start() == 0 or match.end() == len(match.string)
+        if self.paragraphs:
+            if at_edge:
+                return ''
+            if newlines >= 2:
+                return '\n\n'
+            return '\n' if newlines else ' '
+        if newlines:
+            return '\n' * newlines
+        return '' if at_edge else ' '
+
+    @staticmethod
+    def _replace_inline(match) -> str:
+        kind = match.lastgroup
+        char = match.group('first')
+        if kind == 'space':
+            # 字母数字与相邻汉字之间补空格
+            string = match.string
+            start, end = match.span()
+            if start and '\u4e00' <= string[start - 1] <= '\u9fff':
+                char = ' ' + char
+            if end < len(string) and '\u4e00' <= string[end] <= '\u9fff':
+                char += ' '
+            return char
+        if kind == 'punct':
+            return PUNCTUATION_MAP[char]
+        if kind == 'dup':
+            return char
+        if kind == 'dots':
+            return '...'
+        return '......'
+
+    def __call__(self, text: str, quote_pairs: dict) -> str:
+        """
+        格式化文本
+        :param text: 要格式化的文本
+        :param quote_pairs: 引号配对字典
+        :return: 格式化后的文本
+        """
+        if not text or self.passthrough:
+            return text
+
+        result = text
+        if self.trim_spaces:
+            if self.preserve_line_breaks:
+                result = _EDGE_OR_IRREGULAR_SPACE.sub(self._replace_space, result)
+            else:
+                result = _ANY_SPACE.sub(' ', result).strip()
+
+        if self.match_quotes:
+            result = match_quotes(result, quote_pairs)
+
+        if self.inline is not None:
+            result = self.inline.sub(self._replace_inline, result)
+
+        if self.consecutive is not None:
+            result = self.consecutive.sub(self.consecutive_repl, result)
+
+        return result
+
+
+@lru_cache(maxsize=32)
+def _compile(items: tuple) -> FormatPipeline:
+    return FormatPipeline(dict(items))
+
+
+def get_pipeline(rules: dict) -> FormatPipeline:
+    """获取规则集对应的流水线，相同规则集只编译一次"""
+    return _compile(tuple(sorted(rules.items())))
+
+
+def pipeline_cache_info():
+    """流水线缓存的命中统计"""
+    return _compile.cache_info()
@@ -0,0 +1,265 @@
+"""
+流式文本准备
+
+type_string 可以直接接受文件对象或字符串片段的可迭代对象：
+- iter_decoded：按块读取输入源，bytes 用增量解码器解码（多字节字符被拆在两块之间也能正确解码）
+- StreamPreparer：把解码后的文本切成有界的窗口，逐个格式化并去掉不匹配的引号，
+  内存占用只取决于窗口大小，与输入的总长度无关；第一个窗口准备好就可以开始输出
+
+窗口在空白段处切开，空白段单独按"文本中间的空白"处理，窗口两侧加上哨兵字符，
+因此段落、行首尾空格、连续空白的处理与整段格式化相同。优先选择引号栈为空的换行处切开，
+引号配对不会跨越窗口；找不到这样的位置时才在引号未闭合处切开，这时跨窗口的引号在各自的窗口内处理。
+"""
+import bisect
+import codecs
+import re
+from collections import namedtuple
+from quote_engine import get_quote_index
+from text_core import FORMAT_RULES, QUOTE_PAIRS, prepare_text
+
+READ_SIZE = 65536  # 文件对象每次读取的大小
+WINDOW = 8192  # 默认窗口大小（字符数）
+
+# 哨兵：不会出现在正常文本中的非字符码位，标记"这一侧还有文本"
+_SENTINEL = '\uffff'
+# 最后一个空白字符
+_LAST_SPACE = re.compile(r'.*\s', re.S)
+# 最后一个可以安全切开的位置：两个不同的汉字之间，或两个不同的字母数字之间，
+# 任何格式化规则都不会跨越这样的位置
+_LAST_SAFE_PAIR = re.compile(
+    r'.*(?:([\u4e00-\u9fff])(?!\1)(?=[\u4e00-\u9fff])|([a-zA-Z0-9])(?!\2)(?=[a-zA-Z0-9]))', re.S)
+
+# 一个窗口：原文、前后是否还有文本、准备好的文本；用 StreamPreparer.prepare_window 可以从原文重新得到 text
+Window = namedtuple('Window', ['source', 'lead', 'trail', 'text'])
+
+
+def iter_decoded(source, encoding: str = 'utf-8', read_size: int = READ_SIZE):
+    """
+    把输入源转换为字符串片段
+    :param source: str/bytes、文件对象（文本或二进制模式）、或 str/bytes 片段的可迭代对象
+    :param encoding: bytes 的编码
+    :param read_size: 文件对象每次读取的大小
+    """
+    if isinstance(source, (str, bytes)):
+        pieces = (source,)
+    elif hasattr(source, 'read'):
+        pieces = iter(lambda: source.read(read_size), source.read(0))
+    else:
+        pieces = source
+
+    decoder = None
+    for piece in pieces:
+        if not isinstance(piece, str):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(encoding)()
+            piece = decoder.decode(piece)
+        if piece:
+            yield piece
+    if decoder is not None:
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+
+class StreamPreparer:
+    """按窗口准备流式文本（格式化并去掉不匹配的引号）"""
+
+    def __init__(self, rules: dict = None, quote_pairs: dict = None, formatting: bool = True,
+                 window: int = WINDOW, started: bool = False):
+        """
+        :param rules: 格式化规则，默认 FORMAT_RULES
+        :param quote_pairs: 引号配对字典，默认 QUOTE_PAIRS
+        :param formatting: 是否格式化文本
+        :param window: 窗口大小（字符数），找不到合适的切开位置时最多放宽到4倍
+        :param started: 前面是否已经有文本（从中途恢复时为True）
+        """
+        self.rules = FORMAT_RULES if rules is None else rules
+        self.quote_pairs = QUOTE_PAIRS if quote_pairs is None else quote_pairs
+        self.formatting = formatting
+        self.window = window
+        self.max_window = window * 4
+        self.index = get_quote_index(self.quote_pairs)
+        # 能被右引号闭合的左引号（右引号本身也是左引号的，如 "，永远不会被闭合，不影响切开位置）
+        self._closable = frozenset(left for left, right in self.index.pairs.items()
+                                   if right not in self.index.openers)
+        self._buffer = ''
+        self._started = started  # 是否已经输出过窗口（之后的窗口开头不再是文本开头）
+        self.windows = 0  # 已准备的窗口数
+        self.unbalanced_cuts = 0  # 没能在引号已闭合处切开的次数
+        self.hard_cuts = 0  # 不在空白处切开的次数
+
+    def feed(self, text: str) -> list:
+        """
+        送入一段文本
+        :return: 已经可以输出的准备好的文本片段
+        """
+        return [window.text for window in self.feed_windows(text) if window.text]
+
+    def finish(self) -> list:
+        """输入结束，准备剩余的文本"""
+        return [window.text for window in self.finish_windows() if window.text]
+
+    def feed_windows(self, text: str) -> list:
+        """
+        送入一段文本
+        :return: 已经切开的窗口（Window），原文首尾相接即为已消耗的输入，准备好的文本可能为空
+        """
+        self._buffer += text
+        windows = []
+        while len(self._buffer) > self.window:
+            cut = self._cut(force=len(self._buffer) >= self.max_window)
+            if cut is None:
+                break
+            windows.extend(cut)
+        return windows
+
+    def finish_windows(self) -> list:
+        """输入结束，返回剩余文本的窗口"""
+        buffer, self._buffer = self._buffer, ''
+        if not buffer:
+            return []
+        self.windows += 1
+        return [self._window(buffer, self._started, False)]
+
+    def _window(self, source: str, lead: bool, trail: bool) -> Window:
+        """准备一个窗口"""
+        return Window(source, lead, trail, self.prepare_window(source, lead, trail))
+
+    def prepare_window(self, text: str, lead: bool, trail: bool) -> str:
+        """
+        准备一个窗口
+        :param lead: 前面是否还有文本（是则加哨兵，开头的空白不会被当作文本开头去掉）
+        :param trail: 后面是否还有文本
+        """
+        wrapped = (_SENTINEL if lead else '') + text + (_SENTINEL if trail else '')
+        result = prepare_text(wrapped, self.rules, self.quote_pairs, self.formatting)
+        if lead:
+            result = result[1:]
+        if trail:
+            result = result[:-1]
+        return result
+
+    def _cut(self, force: bool):
+        """在缓冲区中选一个位置切开，返回切出的窗口；没有合适的位置且不强制时返回None"""
+        buffer = self._buffer
+        lo = self.window // 4
+        hi = len(buffer) - 1  # 空白段必须在缓冲区末尾之前结束，才能确定它是完整的
+        span = self._choose(buffer, lo, hi, force)
+        if span is None:
+            if not force:
+                return None  # 等待更多文本，也许后面有更合适的位置
+            span = (self.window, self.window)
+        start, end = span
+        if start == end:
+            self.hard_cuts += 1
+
+        windows = []
+        if start:
+            windows.append(self._window(buffer[:start], self._started, True))
+        if end > start:
+            # 窗口之间的空白段：两侧都有文本（位于整个文本开头时除外）
+            windows.append(self._window(buffer[start:end], bool(start) or self._started, True))
+        self._started = True
+        self._buffer = buffer[end:]
+        self.windows += 1
+        return windows
+
+    def _choose(self, buffer: str, lo: int, hi: int, force: bool):
+        """
+        选择切开位置 (起点, 终点)：起点到终点是窗口之间的空白段，不在空白处切开时两者相同
+        按换行、其他空白、安全字符对的顺序找，只接受引号栈中没有可闭合的左引号的位置；
+        force为True（缓冲区已达到最大窗口）时才退而接受引号未闭合的位置
+        """
+        positions, depths = self._quote_depths(buffer)
+        openers = self.index.openers
+        fallback = None
+        for candidates in (self._newline_runs, self._space_runs, self._safe_pairs):
+            for start, end in candidates(buffer, lo, hi):
+                k = bisect.bisect_left(positions, start)
+                if (not k or depths[k - 1] == 0) and not (start and buffer[start - 1] in openers):
+                    return start, end
+                if fallback is None:
+                    fallback = (start, end)
+        if fallback is None or not force:
+            return None
+        self.unbalanced_cuts += 1
+        return fallback
+
+    @staticmethod
+    def _space_run(buffer: str, pos: int) -> tuple:
+        """包含位置pos的完整空白段 (起点, 终点)"""
+        start = pos
+        while start and buffer[start - 1].isspace():
+            start -= 1
+        end = pos + 1
+        while end < len(buffer) and buffer[end].isspace():
+            end += 1
+        return start, end
+
+    def _newline_runs(self, buffer: str, lo: int, hi: int, tries: int = 64):
+        """从后向前依次产生包含换行的空白段"""
+        pos = buffer.rfind('\n', lo, hi)
+        while pos >= 0 and tries:
+            tries -= 1
+            start, end = self._space_run(buffer, pos)
+            if end < len(buffer):
+                yield start, end
+            pos = buffer.rfind('\n', lo, start)
+
+    def _space_runs(self, buffer: str, lo: int, hi: int, tries: int = 64):
+        """从后向前依次产生空白段"""
+        while tries:
+            tries -= 1
+            match = _LAST_SPACE.match(buffer, lo, hi)
+            if match is None:
+                return
+            start, end = self._space_run(buffer, match.end() - 1)
+            if end < len(buffer):
+                yield start, end
+            hi = start
+
+    @staticmethod
+    def _safe_pairs(buffer: str, lo: int, hi: int, tries: int = 16):
+        """从后向前依次产生可以安全切开的字符之间的位置"""
+        while tries:
+            tries -= 1
+            match = _LAST_SAFE_PAIR.match(buffer, lo, hi)
+            if match is None:
+                return
+            point = match.end()
+            yield point, point
+            hi = point
+
+    def _quote_depths(self, buffer: str) -> tuple:
+        """每个引号之后仍可能被闭合的左引号数：(引号位置列表, 对应的数量列表)"""
+        openers = self.index.openers
+        closer_to_opener = self.index.closer_to_opener
+        closable = self._closable
+        positions = []
+        depths = []
+        stack = []
+        depth = 0
+        for pos, char in self.index.events(buffer):
+            if char in openers:
+                stack.append(char)
+                if char in closable:
+                    depth += 1
+            elif char in closer_to_opener and stack and stack[-1] == closer_to_opener[char]:
+                if stack.pop() in closable:
+                    depth -= 1
+            positions.append(pos)
+            depths.append(depth)
+        return positions, depths
+
+
+def prepare_stream(pieces, rules: dict = None, quote_pairs: dict = None, formatting: bool = True,
+                   window: int = WINDOW):
+    """
+    逐窗口准备字符串片段序列
+    :param pieces: 字符串片段（见 iter_decoded）
+    :return: 准备好的文本片段的生成器
+    """
+    preparer = StreamPreparer(rules, quote_pairs, formatting, window)
+    for piece in pieces:
+        yield from preparer.feed(piece)
+    yield from preparer.finish()
@@ -0,0 +1,132 @@
+"""
+时间线追踪
+
+InputSimulator.tracer 设为 Tracer 后，输入过程中的每一步都记录为一个时间段：
+格式化、引号检查、编码、每批 SendInput、每次焦点检查、每次等待，以及每次 type_string 整体。
+时间段写入预先分配的环形缓冲区（写满后覆盖最早的记录），可以导出为 Chrome trace JSON，
+用 Perfetto（https://ui.perfetto.dev）或 chrome://tracing 打开：
+
+    simulator.tracer = Tracer()
+    simulator.type_string(text, 0.05)
+    simulator.tracer.export('trace.json')
+
+tracer 为 None（默认）时，热路径上只多一次 is None 判断。
+"""
+import json
+import os
+import threading
+import time
+
+DEFAULT_CAPACITY = 65536
+
+
+class Tracer:
+    """记录时间段的环形缓冲区"""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        """
+        :param capacity: 最多保留的时间段数
+        """
+        self.capacity = capacity
+        self._names = [None] * capacity
+        self._starts = [0.0] * capacity
+        self._ends = [0.0] * capacity
+        self._threads = [0] * capacity
+        self._args = [None] * capacity
+        self.recorded = 0  # 记录过的时间段总数（包括已被覆盖的）
+        self.origin = time.perf_counter()  # 导出时的时间零点
+
+    def __len__(self):
+        return min(self.recorded, self.capacity)
+
+    @property
+    def dropped(self) -> int:
+        """因缓冲区写满而被覆盖的时间段数"""
+        return max(0, self.recorded - self.capacity)
+
+    def record(self, name: str, start: float, end: float, args: dict = None):
+        """
+        记录一个时间段
+        :param start: 开始时间（time.perf_counter）
+        :param end: 结束时间
+        :param args: 附加信息，导出到 Chrome trace 的 args
+        """
+        i = self.recorded % self.capacity
+        self._names[i] = name
+        self._starts[i] = start
+        self._ends[i] = end
+        self._threads[i] = threading.get_ident()
+        self._args[i] = args
+        self.recorded += 1
+
+    def span(self, name: str, args: dict = None) -> '_Span':
+        """with tracer.span(name): ... 记录代码块的时间段"""
+        return _Span(self, name, args)
+
+    def clear(self):
+        """清空缓冲区"""
+        self.recorded = 0
+        self._names = [None] * self.capacity
+        self._args = [None] * self.capacity
+
+    def spans(self) -> list:
+        """按记录顺序返回保留的时间段 (名称, 开始, 结束, 线程, 附加信息)"""
+        count = len(self)
+        first = self.recorded - count
+        result = []
+        for n in range(first, self.recorded):
+            i = n % self.capacity
+            result.append((self._names[i], self._starts[i], self._ends[i], self._threads[i], self._args[i]))
+        return result
+
+    def to_chrome(self) -> dict:
+        """转换为 Chrome trace 格式（完整事件 ph=X，时间单位为微秒）"""
+        pid = os.getpid()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        events = []
+        threads = set()
+        for name, start, end, thread, args in self.spans():
+            event = {
+                'name': name,
+                'cat': 'input',
+                'ph': 'X',
+                'ts': (start - self.origin) * 1e6,
+                'dur': (end - start) * 1e6,
+                'pid': pid,
+                'tid': thread,
+            }
+            if args:
+                event['args'] = args
+            events.append(event)
+            threads.add(thread)
+        for thread in threads:
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread,
+                           'args': {'name': names.get(thread, f'thread-{thread}')}})
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'recorded': self.recorded, 'dropped': self.dropped},
+        }
+
+    def export(self, path: str):
+        """导出为 Chrome trace JSON 文件"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_chrome(), f, ensure_ascii=False)
+
+
+class _Span:
+    """Tracer.span 返回的上下文管理器"""
+
+    __slots__ = ('tracer', 'name', 'args', 'start')
+
+    def __init__(self, tracer: Tracer, name: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.start, time.perf_counter(), self.args)
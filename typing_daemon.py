@@ -0,0 +1,518 @@
+"""
+常驻输入服务
+
+在本机 HTTP 端口上提供 InputSimulator，避免每输入一段文本都重新导入依赖、重新创建模拟器：
+- 输入、格式化、分析任务进入优先级队列（priority 越小越先执行，相同时先提交先执行）
+- 输入任务由一个线程按顺序执行（键盘只有一个），格式化/分析任务在另一个线程中执行，不必排在长输入任务之后
+- 模拟器、编码缓冲区、编译好的格式化流水线、引号索引在任务之间保持复用
+- 运行中的输入任务通过取消其 asyncio 任务停止（等待立即结束），排队中的任务直接丢弃
+
+接口（除 /metrics 外请求和响应都是JSON）：
+    POST /jobs               提交任务 {"kind": "type"|"format"|"analyze", "text": ..., "priority": 10, "options": {...}}
+    GET  /jobs               所有任务的状态
+    GET  /jobs/<id>          单个任务的状态和结果
+    POST /jobs/<id>/cancel   取消任务
+    GET  /status             服务状态
+    GET  /metrics            输入指标（Prometheus 文本格式）
+    GET  /output             记录型后端记录到的文本（只在 --backend recording 时可用）
+
+服务没有身份验证，因此只能监听本机回环地址（--host 为其他地址时拒绝启动），
+并且只接受 Host 头为 127.0.0.1:<端口> 或 localhost:<端口>（或 --host 指定的地址）的请求，
+其他请求返回 421。只检查 Content-Type 不够：DNS 重绑定的网页与服务同源，可以不经预检直接发出 JSON 请求，
+但它的 Host 头是攻击者的域名。POST 请求还必须是 application/json，服务不响应 CORS 预检。
+
+使用 --backend recording 时不发送任何按键，可以在 Linux 上端到端测试：
+    python typing_daemon.py --backend recording --port 8765
+"""
+import argparse
+import asyncio
+import ipaddress
+import itertools
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from colorama import Fore
+from input_simulator import InputSimulator
+from output_backends import RecordingBackend
+from text_analyzer import analyze_text
+from text_core import FORMAT_RULES
+from text_formatter import get_pipeline, pipeline_cache_info
+
+TYPE = 'type'
+FORMAT = 'format'
+ANALYZE = 'analyze'
+KINDS = (TYPE, FORMAT, ANALYZE)
+
+# 各类任务允许的选项
+OPTIONS = {
+    TYPE: {'interval', 'fast_mode', 'format_text', 'paste_mode', 'planned', 'format_rules'},
+    FORMAT: {'format_rules'},
+    ANALYZE: {'max_issues_per_type', 'sample_step'},
+}
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _check_interval(value):
+    """输入间隔：不小于0的数，或 [最小, 最大]"""
+    if _is_number(value) and value >= 0:
+        return value
+    if (isinstance(value, (list, tuple)) and len(value) == 2 and all(map(_is_number, value))
+            and 0 <= value[0] <= value[1]):
+        return tuple(value)
+    raise ValueError("interval 必须是不小于0的数或 [最小, 最大]")
+
+
+def _check_rules(value) -> dict:
+    """格式化规则的覆盖项：名称必须在 FORMAT_RULES 中，值的类型与默认值相同"""
+    if not isinstance(value, dict):
+        raise ValueError("format_rules 必须是JSON对象")
+    for name, setting in value.items():
+        if name not in FORMAT_RULES:
+            raise ValueError(f"未知的格式化规则: {name}")
+        if type(setting) is not type(FORMAT_RULES[name]):
+            raise ValueError(f"格式化规则 {name} 必须是 {type(FORMAT_RULES[name]).__name__}")
+    return dict(value)
+
+
+def _check_bool(name: str):
+    def check(value):
+        if not isinstance(value, bool):
+            raise ValueError(f"{name} 必须是 true 或 false")
+        return value
+    return check
+
+
+def _check_count(name: str, minimum: int, optional: bool = False):
+    def check(value):
+        if value is None and optional:
+            return value
+        if not isinstance(value, int) or isinstance(value, bool) or value < minimum:
+            raise ValueError(f"{name} 必须是不小于{minimum}的整数")
+        return value
+    return check
+
+
+# 选项的检查函数：返回规范化后的值，无效时抛出 ValueError
+CHECKS = {
+    'interval': _check_interval,
+    'fast_mode': _check_bool('fast_mode'),
+    'format_text': _check_bool('format_text'),
+    'paste_mode': _check_bool('paste_mode'),
+    'planned': _check_bool('planned'),
+    'format_rules': _check_rules,
+    'max_issues_per_type': _check_count('max_issues_per_type', 0, optional=True),
+    'sample_step': _check_count('sample_step', 1),
+}
+
+
+def is_loopback(host: str) -> bool:
+    """host 是否为本机回环地址"""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def check_options(kind: str, options) -> dict:
+    """
+    检查任务的选项（请求体中的 JSON，名称和值都不可信）
+    :return: 规范化后的选项
+    :raises ValueError: 选项不是对象、名称不支持或值无效
+    """
+    if options is None:
+        return {}
+    if not isinstance(options, dict):
+        raise ValueError("options 必须是JSON对象")
+    unknown = set(options) - OPTIONS[kind]
+    if unknown:
+        raise ValueError(f"{kind} 任务不支持的选项: {', '.join(sorted(unknown))}")
+    return {name: CHECKS[name](value) for name, value in options.items()}
+
+
+# 任务状态（输入任务结束时的状态与 TypingProgress.state 相同）
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class Job:
+    """一个排队的任务"""
+
+    def __init__(self, job_id: int, kind: str, text: str, priority: int = 10, options: dict = None):
+        self.id = job_id
+        self.kind = kind
+        self.text = text
+        self.priority = priority
+        self.options = options or {}
+        self.state = QUEUED
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.progress = None  # 输入任务的最新进度 TypingProgress
+        self.task = None  # 运行中的输入任务对应的 asyncio.Task
+        self.cancel_requested = False
+        self.result = None
+        self.error = None
+
+    @property
+    def finished_state(self) -> bool:
+        return self.state not in (QUEUED, RUNNING)
+
+    def to_dict(self, result: bool = True) -> dict:
+        """任务状态，result为False时不包含结果（用于任务列表）"""
+        info = {
+            'id': self.id,
+            'kind': self.kind,
+            'state': self.state,
+            'priority': self.priority,
+            'chars': len(self.text),
+            'submitted': self.submitted,
+            'started': self.started,
+            'finished': self.finished,
+            'error': self.error,
+        }
+        if self.progress is not None:
+            info['progress'] = {'typed': self.progress.typed, 'total': self.progress.total}
+        if result:
+            info['result'] = self.result
+        return info
+
+
+class TypingDaemon:
+    """输入服务：任务队列、执行线程和 HTTP 接口"""
+
+    def __init__(self, simulator: InputSimulator = None, host: str = '127.0.0.1',
+                 port: int = 8765, history: int = 1000):
+        """
+        :param simulator: 执行输入任务的模拟器，默认新建一个（使用Win32Backend）
+        :param host: 监听地址，必须是本机回环地址（127.0.0.0/8 或 localhost）
+        :param port: 监听端口，0表示由系统分配
+        :param history: 最多保留的已结束任务数
+        :raises ValueError: host 不是回环地址
+        """
+        if not is_loopback(host):
+            raise ValueError(f"输入服务没有身份验证，只能监听本机回环地址: {host}")
+        self.simulator = simulator if simulator is not None else InputSimulator()
+        # 启动时的格式化规则和引号配对：每个任务的规则都由它们合成后显式传入，
+        # 两个执行线程都不修改模拟器的设置
+        self.format_rules = dict(self.simulator.format_rules)
+        self.quote_pairs = dict(self.simulator.quote_pairs)
+        self.host = host
+        self.port = port
+        self.history = history
+        self.jobs = OrderedDict()  # {任务编号: Job}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._order = itertools.count()  # 相同优先级时按提交顺序执行
+        self._queues = {TYPE: queue.PriorityQueue(), FORMAT: queue.PriorityQueue()}
+        self._current = None  # 正在执行的输入任务
+        self._loop = None  # 输入任务线程的事件循环
+        self._threads = []
+        self._server = None
+        self.allowed_hosts = frozenset()  # 接受的 Host 头，启动后按实际端口设置
+        self.started = None
+        self.completed = 0
+
+    # ---------------------------------------------------------------- 任务
+
+    def submit(self, kind: str, text: str, priority: int = 10, options: dict = None) -> Job:
+        """
+        提交任务
+        :raises ValueError: 任务类型、文本或选项无效
+        """
+        if kind not in KINDS:
+            raise ValueError(f"未知的任务类型: {kind}")
+        if not isinstance(text, str):
+            raise ValueError("text 必须是字符串")
+        if not isinstance(priority, int):
+            raise ValueError("priority 必须是整数")
+        options = check_options(kind, options)
+
+        with self._lock:
+            job = Job(next(self._ids), kind, text, priority, options)
+            self.jobs[job.id] = job
+            self._trim()
+        lane = TYPE if kind == TYPE else FORMAT
+        self._queues[lane].put((priority, next(self._order), job))
+        return job
+
+    def _trim(self):
+        """丢弃最早的已结束任务，保留至多 history 个"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished_state]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self.jobs[job_id]
+
+    def job(self, job_id: int) -> Job:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        取消任务：排队中的任务不再执行，运行中的输入任务在下一批事件之前停止
+        :return: 任务是否存在且尚未结束
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.finished_state:
+                return False
+            if job.state == QUEUED:
+                job.state = CANCELLED
+                job.finished = time.time()
+                return True
+            job.cancel_requested = True
+            task = job.task
+        if task is not None:
+            # 任务在事件循环线程中取消，正在进行的等待立即结束
+            self._loop.call_soon_threadsafe(task.cancel)
+        return True
+
+    def status(self) -> dict:
+        """服务状态：运行时间、排队数、正在执行的任务、格式化流水线缓存和准备结果缓存"""
+        counts = {}
+        for job in list(self.jobs.values()):
+            counts[job.state] = counts.get(job.state, 0) + 1
+        return {
+            'uptime': time.time() - self.started if self.started else 0.0,
+            'queued': {lane: q.qsize() for lane, q in self._queues.items()},
+            'jobs': counts,
+            'completed': self.completed,
+            'current': self._current.id if self._current is not None else None,
+            'backend': self.simulator.backend.name,
+            'pipelines': pipeline_cache_info()._asdict(),
+            'plan_cache': self.simulator.plan_cache.info(),
+        }
+
+    # ---------------------------------------------------------------- 执行
+
+    def _take(self, lane: str) -> Job:
+        """取出下一个待执行的任务（跳过已取消的），服务停止时返回None"""
+        while True:
+            _, _, job = self._queues[lane].get()
+            if job is None:
+                return None
+            with self._lock:
+                if job.state != QUEUED:
+                    continue
+                job.state = RUNNING
+                job.started = time.time()
+                return job
+
+    def _finish(self, job: Job, state: str, result=None, error: str = None):
+        with self._lock:
+            job.state = state
+            job.result = result
+            job.error = error
+            job.finished = time.time()
+            self.completed += 1
+
+    def _rules(self, job: Job) -> dict:
+        """任务使用的格式化规则：服务启动时的规则加上任务指定的覆盖项"""
+        return {**self.format_rules, **job.options.get('format_rules', {})}
+
+    def _run_typing(self):
+        """输入任务线程：在常驻的事件循环中逐个执行输入任务"""
+        loop = self._loop = asyncio.new_event_loop()
+        simulator = self.simulator
+        try:
+            while True:
+                job = self._take(TYPE)
+                if job is None:
+                    return
+                self._current = job
+                try:
+                    options = dict(job.options)
+                    options['format_rules'] = self._rules(job)
+                    task = loop.create_task(simulator.type_string_async(
+                        job.text, progress=lambda p: setattr(job, 'progress', p), **options))
+                    with self._lock:
+                        job.task = task
+                        if job.cancel_requested:  # 在任务创建之前收到的取消请求
+                            task.cancel()
+                    progress = loop.run_until_complete(task)
+                    self._finish(job, progress.state, {
+                        'typed': progress.typed,
+                        'total': progress.total,
+                        'elapsed': progress.elapsed,
+                    })
+                except asyncio.CancelledError:
+                    progress = job.progress
+                    self._finish(job, CANCELLED, {'typed': progress.typed if progress else 0})
+                except Exception as e:
+                    self._finish(job, FAILED, error=str(e))
+                finally:
+                    job.task = None
+                    self._current = None
+        finally:
+            loop.close()
+
+    def _run_text(self):
+        """格式化/分析任务线程"""
+        quote_pairs = self.quote_pairs
+        while True:
+            job = self._take(FORMAT)
+            if job is None:
+                return
+            try:
+                if job.kind == FORMAT:
+                    result = {'text': get_pipeline(self._rules(job))(job.text, quote_pairs)}
+                else:
+                    result = analyze_text(job.text, quote_pairs,
+                                          job.options.get('max_issues_per_type'),
+                                          job.options.get('sample_step', 1))
+                self._finish(job, DONE, result)
+            except Exception as e:
+                self._finish(job, FAILED, error=str(e))
+
+    # ---------------------------------------------------------------- 服务
+
+    def start(self):
+        """启动执行线程和 HTTP 服务（在后台线程中）"""
+        self.started = time.time()
+        self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.typing_daemon = self
+        self.port = self._server.server_address[1]
+        self.allowed_hosts = frozenset(f'{host}:{self.port}'
+                                       for host in ('127.0.0.1', 'localhost', self.host))
+        for target, name in ((self._run_typing, 'daemon-typing'), (self._run_text, 'daemon-text'),
+                             (self._server.serve_forever, 'daemon-http')):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"{Fore.GREEN}输入服务已启动: http://{self.host}:{self.port}{Fore.RESET}")
+
+    def stop(self, timeout: float = 2.0):
+        """停止服务：停止正在进行的输入，结束执行线程"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        current = self._current
+        if current is not None:
+            self.cancel(current.id)
+        for lane in self._queues.values():
+            lane.put((float('-inf'), -1, None))
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        print(f"{Fore.YELLOW}输入服务已停止{Fore.RESET}")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """HTTP 请求处理：把请求转换为 TypingDaemon 的方法调用"""
+
+    def log_message(self, format, *args):
+        pass  # 不在控制台输出访问日志
+
+    @property
+    def daemon(self) -> TypingDaemon:
+        return self.server.typing_daemon
+
+    def _reply(self, status: int, body: dict):
+        self._send(status, json.dumps(body, ensure_ascii=False), 'application/json; charset=utf-8')
+
+    def _send(self, status: int, text: str, content_type: str):
+        data = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _host_allowed(self) -> bool:
+        """Host 头必须是本机地址加端口，拒绝 DNS 重绑定的网页发来的请求"""
+        if self.headers.get('Host', '').lower() in self.daemon.allowed_hosts:
+            return True
+        self._reply(421, {'error': 'Host 头不是本服务的地址'})
+        return False
+
+    def _job_id(self, part: str):
+        try:
+            return int(part)
+        except ValueError:
+            return None
+
+    def do_GET(self):
+        if not self._host_allowed():
+            return
+        parts = self.path.strip('/').split('/')
+        if parts == ['status']:
+            return self._reply(200, self.daemon.status())
+        if parts == ['metrics']:
+            return self._send(200, self.daemon.simulator.metrics.to_prometheus(),
+                              'text/plain; version=0.0.4; charset=utf-8')
+        if parts == ['jobs']:
+            return self._reply(200, {'jobs': [job.to_dict(False) for job in list(self.daemon.jobs.values())]})
+        if len(parts) == 2 and parts[0] == 'jobs':
+            job = self.daemon.job(self._job_id(parts[1]))
+            if job is None:
+                return self._reply(404, {'error': '任务不存在'})
+            return self._reply(200, job.to_dict())
+        if parts == ['output']:
+            backend = self.daemon.simulator.backend
+            if not isinstance(backend, RecordingBackend):
+                return self._reply(404, {'error': '只有记录型后端可以读取输出'})
+            return self._reply(200, {'text': backend.typed_text(), 'events': len(backend)})
+        self._reply(404, {'error': '未知的路径'})
+
+    def do_POST(self):
+        if not self._host_allowed():
+            return
+        if not self.headers.get('Content-Type', '').startswith('application/json'):
+            return self._reply(415, {'error': '请求必须是 application/json'})
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self._reply(400, {'error': '无效的JSON'})
+
+        parts = self.path.strip('/').split('/')
+        if parts == ['jobs']:
+            if not isinstance(body, dict):
+                return self._reply(400, {'error': '请求体必须是JSON对象'})
+            try:
+                job = self.daemon.submit(body.get('kind'), body.get('text'),
+                                         body.get('priority', 10), body.get('options'))
+            except ValueError as e:
+                return self._reply(400, {'error': str(e)})
+            return self._reply(202, job.to_dict(False))
+        if len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'cancel':
+            job_id = self._job_id(parts[1])
+            if self.daemon.job(job_id) is None:
+                return self._reply(404, {'error': '任务不存在'})
+            cancelled = self.daemon.cancel(job_id)
+            return self._reply(200, {'id': job_id, 'cancelled': cancelled})
+        self._reply(404, {'error': '未知的路径'})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='常驻输入服务')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址，只能是本机回环地址')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口')
+    parser.add_argument('--backend', choices=('win32', 'recording'), default='win32',
+                        help='输出后端，recording 只记录事件不发送按键')
+    args = parser.parse_args()
+
+    if not is_loopback(args.host):
+        parser.error(f'输入服务没有身份验证，只能监听本机回环地址: {args.host}')
+    backend = RecordingBackend() if args.backend == 'recording' else None
+    daemon = TypingDaemon(InputSimulator(backend), args.host, args.port)
+    daemon.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        daemon.stop()
+
+
+if __name__ == '__main__':
+    main()